@@ -1,16 +1,208 @@
+from contextlib import asynccontextmanager
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from config.pool import (
+    InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine, pool_snapshot,
+)
+from config.replicas import replicas, use_replica
+from config.settings import async_url, settings
+from utils import metrics
+from utils.profiling import instrument_queries
 
 Base = declarative_base()
 
-db_url = "postgresql://postgres:1@localhost:5432/mahaInventory"
-engine = create_engine(db_url)
-SessionLocal  = sessionmaker(autoflush=False, autocommit=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
+def _connect_args(url):
+    # Sessions of the sync fallback hop between threadpool threads
+    if make_url(url).get_backend_name() == "sqlite":
+        return {"check_same_thread": False}
+    return {}
+
+
+def _pool_options(url, poolclass):
+    # In-memory SQLite keeps its single-connection pool
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _sync_engine(url, name):
+    sync_engine = create_engine(url, connect_args=_connect_args(url), **_pool_options(url, InstrumentedQueuePool))
+    instrument_engine(sync_engine)
+    instrument_queries(sync_engine)
+    metrics.register(name, lambda: pool_snapshot(sync_engine))
+    return sync_engine
+
+
+def _async_engine(url, name):
+    url = async_url(url)
+    async_db_engine = create_async_engine(url, **_pool_options(url, InstrumentedAsyncAdaptedQueuePool))
+    instrument_engine(async_db_engine.sync_engine)
+    instrument_queries(async_db_engine.sync_engine)
+    metrics.register(name, lambda: pool_snapshot(async_db_engine.sync_engine))
+    return async_db_engine
+
+
+db_url = settings.database_url
+engine = _sync_engine(db_url, "pool.sync")
+SessionLocal  = sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
+
+# Async engine, only created when DB_ASYNC is enabled
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_async:
+    async_engine = _async_engine(db_url, "pool.async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas (DATABASE_REPLICA_URLS), each with its own pool; only the mode in use gets engines
+replica_engines = []
+ReplicaSessionLocals = []
+for index, replica_url in enumerate(settings.database_replica_urls):
+    if settings.db_async:
+        replica_engine = _async_engine(replica_url, f"pool.replica{index}.async")
+        ReplicaSessionLocals.append(async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False))
+    else:
+        replica_engine = _sync_engine(replica_url, f"pool.replica{index}.sync")
+        ReplicaSessionLocals.append(
+            sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=replica_engine)
+        )
+    replica_engines.append(replica_engine)
+if replicas:
+    metrics.register("replicas", replicas.snapshot)
+
+
+async def dispose_engines():
+    """Close every pooled connection (engines connect lazily, so there is nothing to open at startup)."""
+    engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+    for replica_engine in replica_engines:
+        if settings.db_async:
+            await replica_engine.dispose()
+        else:
+            replica_engine.dispose()
+
+
+class SyncSessionAdapter:
+    """AsyncSession-compatible facade over a blocking Session.
+
+    Used when DB_ASYNC is off: route handlers keep awaiting the same API and
+    every database call is pushed to the threadpool.
+    """
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def in_transaction(self):
+        return self.sync_session.in_transaction()
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        return _ThreadpoolStreamResult(await self.execute(*args, **kwargs))
+
+
+class _ThreadpoolStreamResult:
+    """Async iteration over a buffered-by-partition sync Result, one threadpool hop per partition."""
+
+    def __init__(self, result):
+        self._result = result
+
+    async def partitions(self, size=None):
+        partitions = self._result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                return
+            yield partition
+
+
+@asynccontextmanager
+async def open_session(read_only=False):
+    """Open a session for the configured mode (AsyncSession or the sync adapter).
+
+    `read_only` sessions are bound to a replica when any are configured.
+    """
+    index = replicas.acquire() if read_only and replicas else None
     try:
-        yield db
+        if AsyncSessionLocal is not None:
+            factory = AsyncSessionLocal if index is None else ReplicaSessionLocals[index]
+            async with factory() as db:
+                yield db
+            return
+
+        factory = SessionLocal if index is None else ReplicaSessionLocals[index]
+        db = SyncSessionAdapter(factory())
+        try:
+            yield db
+        finally:
+            await db.close()
     finally:
-        db.close()
\ No newline at end of file
+        if index is not None:
+            replicas.release(index)
+
+
+async def get_db():
+    async with open_session() as db:
+        yield db
+
+
+async def get_read_db(replica: bool = Depends(use_replica), db=Depends(get_db)):
+    """Session for read-only handlers: a replica, unless the client wrote within the read-your-writes window.
+
+    Otherwise it is the request's primary session, the one get_db dependants share.
+    """
+    if not replica:
+        yield db
+        return
+    async with open_session(read_only=True) as replica_db:
+        yield replica_db
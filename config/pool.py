@@ -0,0 +1,104 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from utils.metrics import Histogram
+
+
+class PoolMetrics:
+    """Counters and checkout-latency histogram for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.wait_seconds_total = 0.0
+        self.checkout_latency = Histogram()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+class _InstrumentedPoolMixin:
+    metrics = None
+
+    def _do_get(self):
+        # Time spent here is waiting for a free slot plus opening new connections
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()
+
+        metrics.incr("waiting")
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.incr("timeouts")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.incr("waiting", -1)
+            metrics.incr("wait_seconds_total", elapsed)
+            metrics.checkout_latency.observe(elapsed)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine):
+    """Attach PoolMetrics to a sync Engine (use `async_engine.sync_engine` for async ones)."""
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics
+
+    event.listen(engine, "connect", lambda *args: metrics.incr("connects"))
+    event.listen(engine, "checkout", lambda *args: metrics.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *args: metrics.incr("checkins"))
+    event.listen(engine, "invalidate", lambda *args: metrics.incr("invalidations"))
+    event.listen(engine, "soft_invalidate", lambda *args: metrics.incr("soft_invalidations"))
+    return metrics
+
+
+def pool_snapshot(engine):
+    """Current pool state plus the counters collected by instrument_engine()."""
+    pool = engine.pool
+    snapshot = {"pool": pool.status()}
+    if isinstance(pool, QueuePool):
+        snapshot.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        snapshot.update(
+            waiting=metrics.waiting,
+            checkouts=metrics.checkouts,
+            checkins=metrics.checkins,
+            connects=metrics.connects,
+            timeouts=metrics.timeouts,
+            invalidations=metrics.invalidations,
+            soft_invalidations=metrics.soft_invalidations,
+            wait_seconds_total=metrics.wait_seconds_total,
+            checkout_latency_seconds=metrics.checkout_latency.snapshot(),
+        )
+    return snapshot
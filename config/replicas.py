@@ -0,0 +1,121 @@
+"""Read/write routing: writes go to the primary, read-only handlers to a read replica.
+
+Replicas lag behind the primary, so a client that has just written keeps
+reading from the primary for `DB_READ_YOUR_WRITES` seconds: every successful
+POST/PUT/PATCH/DELETE sets the `db_last_write` cookie, and reads carrying a
+recent one are not routed to a replica.
+"""
+import itertools
+import threading
+import time
+
+from fastapi import Request
+
+from config.settings import settings
+
+READ_YOUR_WRITES_COOKIE = "db_last_write"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+REPLICA_STRATEGIES = ("round_robin", "least_connections")
+
+
+class ReplicaSelector:
+    """Picks the replica for each read-only session.
+
+    `round_robin` cycles through the replicas; `least_connections` takes the
+    one with the fewest sessions open through this worker.
+    """
+
+    def __init__(self, count, strategy):
+        if strategy not in REPLICA_STRATEGIES:
+            raise ValueError(f"Unknown replica strategy {strategy!r}, expected one of {', '.join(REPLICA_STRATEGIES)}")
+        self.count = count
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self.active = [0] * count
+        self.sessions = [0] * count
+        self.primary_reads = 0  # Read-only sessions kept on the primary by read-your-writes
+
+    def __bool__(self):
+        return self.count > 0
+
+    def acquire(self):
+        """Index of the replica to use; pair with release()."""
+        with self._lock:
+            start = next(self._turn) % self.count
+            index = start
+            if self.strategy == "least_connections":
+                # Ties go round-robin, so an idle set of replicas still shares the load
+                order = [(start + offset) % self.count for offset in range(self.count)]
+                index = min(order, key=self.active.__getitem__)
+            self.active[index] += 1
+            self.sessions[index] += 1
+            return index
+
+    def release(self, index):
+        with self._lock:
+            self.active[index] -= 1
+
+    def kept_on_primary(self):
+        with self._lock:
+            self.primary_reads += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "active": list(self.active),
+                "sessions": list(self.sessions),
+                "primary_reads": self.primary_reads,
+            }
+
+
+replicas = ReplicaSelector(len(settings.database_replica_urls), settings.db_replica_strategy)
+
+
+def wrote_recently(request):
+    """True if the client's last write (per its cookie) is within the read-your-writes window."""
+    if settings.db_read_your_writes <= 0:
+        return False
+    try:
+        last_write = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.db_read_your_writes
+
+
+def use_replica(request: Request):
+    """Dependency: whether this read-only request may be served by a replica."""
+    if not settings.database_replica_urls:
+        return False
+    if wrote_recently(request):
+        replicas.kept_on_primary()
+        return False
+    return True
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware setting the `db_last_write` cookie on successful writes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in WRITE_METHODS
+            or not settings.database_replica_urls
+            or settings.db_read_your_writes <= 0
+        ):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; Max-Age={int(settings.db_read_your_writes + 1)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,102 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from config.database import Base, engine
+
+
+def import_models():
+    """Register every model with Base.metadata."""
+    from models.category import Category
+    from models.product import Product
+    from models.supplier import Supplier
+    from models.stockEntry import StockEntry
+    from models.stockEntryArchive import StockEntryArchive
+    from models.stockEntrySnapshot import StockEntrySnapshot
+    from models.stockReservation import StockReservation
+    from models.stockIssue import StockIssue
+    from models.productStockLevel import ProductStockLevel
+    from models.productDailyMovement import ProductDailyMovement
+    from models.supplierStat import SupplierStat
+    from models.supplierProductStat import SupplierProductStat
+
+
+def add_missing_columns(connection):
+    """ALTER TABLE ... ADD COLUMN for every model column an existing table predates.
+
+    New columns must be nullable or carry a server default, so existing rows get a value.
+    """
+    inspector = inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                definition = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+
+
+def use_sqlite_autoincrement(connection):
+    """Rebuild SQLite tables created before their model asked for AUTOINCREMENT.
+
+    Without it SQLite gives the next row the highest id in use plus one, so
+    the id of a deleted (or archived) newest row is handed out again. The
+    rows are copied into a rebuilt table, and the id sequence starts above
+    every id the archive already holds.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    from models.stockEntryArchive import StockEntryArchive
+
+    archived_ids = {"stock_entries": StockEntryArchive.__table__}
+    for table in Base.metadata.sorted_tables:
+        if not table.dialect_options["sqlite"]["autoincrement"]:
+            continue
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+        old_name = f"_{table.name}_rebuild"
+        columns = ", ".join(connection.dialect.identifier_preparer.quote(column.name) for column in table.columns)
+        connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+        for index in inspect(connection).get_indexes(old_name):
+            connection.execute(text(f"DROP INDEX {index['name']}"))
+        table.create(connection)
+        connection.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name}"))
+        connection.execute(text(f"DROP TABLE {old_name}"))
+        archive = archived_ids.get(table.name)
+        if archive is not None and inspect(connection).has_table(archive.name):
+            highest = connection.execute(text(f"SELECT max(id) FROM {archive.name}")).scalar()
+            current = connection.execute(
+                text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": table.name}
+            ).scalar()
+            if highest is not None and (current is None or highest > current):
+                connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+                connection.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                    {"name": table.name, "seq": highest},
+                )
+
+
+def create_schema(bind=None):
+    """Create missing tables, columns and indexes. A one-off deploy step, never run per worker.
+
+    create_all only adds whole tables, so columns and indexes added to existing
+    tables are created separately, as are the backend-specific product search
+    indexes. SQLite tables that predate AUTOINCREMENT are rebuilt with it.
+    """
+    from services.search import create_search_indexes
+
+    bind = bind or engine
+    import_models()
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        add_missing_columns(connection)
+        use_sqlite_autoincrement(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    with bind.begin() as connection:
+        create_search_indexes(connection)
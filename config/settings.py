@@ -0,0 +1,143 @@
+import os
+from dataclasses import dataclass
+
+from sqlalchemy.engine import make_url
+
+# Async drivers used when DB_ASYNC is enabled, keyed by database backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_list(name, default=()):
+    # Comma-separated values; empty entries are dropped
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str = "postgresql://postgres:1@localhost:5432/mahaInventory"
+    db_async: bool = False  # Serve requests through AsyncSession instead of the threadpool
+
+    # Read replicas: read-only handlers use these instead of the primary
+    database_replica_urls: tuple = ()
+    db_replica_strategy: str = "round_robin"  # "round_robin" or "least_connections"
+    db_read_your_writes: float = 5.0  # Seconds a client's reads stay on the primary after its own write; 0 disables
+
+    # Connection pool (per engine, per worker process)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # Seconds to wait for a free connection
+    db_pool_recycle: int = -1  # Seconds before a connection is replaced; -1 disables
+    db_pool_pre_ping: bool = False  # Test connections on checkout
+
+    # Group commit of POST /stock_entries/: concurrent entries are inserted in one transaction
+    group_commit: bool = False
+    group_commit_interval_ms: float = 2.0  # How long the first entry waits for others to join
+    group_commit_max_rows: int = 500  # Entries per transaction
+
+    # Ledger compaction (python -m scripts.compact_ledger)
+    ledger_compaction_horizon_days: int = 365  # Stock entries older than this are archived
+    ledger_compaction_batch_size: int = 1000  # Entries per transaction
+    ledger_compaction_pause_ms: float = 100.0  # Between batches, so waiting writers get the database
+
+    # Change feed (GET /stock_entries/feed, Server-Sent Events)
+    change_feed_backend: str = "memory"  # "memory" (per worker) or "redis" (shared stream)
+    change_feed_url: str = "redis://localhost:6379/0"
+    change_feed_retention: int = 10000  # Latest events kept for Last-Event-ID resume
+    change_feed_queue_size: int = 1000  # Events a subscriber may fall behind before it is disconnected
+    change_feed_max_subscribers: int = 10000  # Per worker
+    change_feed_heartbeat: float = 15.0  # Seconds between keep-alive comments on an idle stream
+
+    # Catalog read cache
+    cache_backend: str = "memory"  # "memory" (per worker) or "redis" (shared)
+    cache_url: str = "redis://localhost:6379/0"
+    cache_ttl: float = 60.0
+    cache_max_entries: int = 10000
+
+    # Admission control (utils/admission.py): requests beyond their route's lane are queued briefly, then shed with a 503
+    admission_control: bool = True
+    admission_max_concurrency: int = 0  # Requests running at once, per worker; 0: db_pool_size + db_max_overflow
+    admission_reserved: int = 3  # Slots only high-priority lanes (lookups) may take
+    admission_retry_after: int = 1  # Seconds, sent as Retry-After with a 503
+
+    # Request profiling
+    server_timing: bool = True  # Send per-request Server-Timing headers
+    profile_sample_rate: float = 0.0  # Fraction of requests run under cProfile; 0 disables
+    profile_threshold: float = 0.5  # Seconds; sampled requests at least this slow are dumped
+    profile_dir: str = "profiles"
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            database_url=os.environ.get("DATABASE_URL", cls.database_url),
+            db_async=env_bool("DB_ASYNC", cls.db_async),
+            database_replica_urls=env_list("DATABASE_REPLICA_URLS", cls.database_replica_urls),
+            db_replica_strategy=os.environ.get("DB_REPLICA_STRATEGY", cls.db_replica_strategy),
+            db_read_your_writes=env_float("DB_READ_YOUR_WRITES", cls.db_read_your_writes),
+            db_pool_size=env_int("DB_POOL_SIZE", cls.db_pool_size),
+            db_max_overflow=env_int("DB_MAX_OVERFLOW", cls.db_max_overflow),
+            db_pool_timeout=env_float("DB_POOL_TIMEOUT", cls.db_pool_timeout),
+            db_pool_recycle=env_int("DB_POOL_RECYCLE", cls.db_pool_recycle),
+            db_pool_pre_ping=env_bool("DB_POOL_PRE_PING", cls.db_pool_pre_ping),
+            group_commit=env_bool("GROUP_COMMIT", cls.group_commit),
+            group_commit_interval_ms=env_float("GROUP_COMMIT_INTERVAL_MS", cls.group_commit_interval_ms),
+            group_commit_max_rows=env_int("GROUP_COMMIT_MAX_ROWS", cls.group_commit_max_rows),
+            ledger_compaction_horizon_days=env_int("LEDGER_COMPACTION_HORIZON_DAYS", cls.ledger_compaction_horizon_days),
+            ledger_compaction_batch_size=env_int("LEDGER_COMPACTION_BATCH_SIZE", cls.ledger_compaction_batch_size),
+            ledger_compaction_pause_ms=env_float("LEDGER_COMPACTION_PAUSE_MS", cls.ledger_compaction_pause_ms),
+            change_feed_backend=os.environ.get("CHANGE_FEED_BACKEND", cls.change_feed_backend),
+            change_feed_url=os.environ.get("CHANGE_FEED_URL", cls.change_feed_url),
+            change_feed_retention=env_int("CHANGE_FEED_RETENTION", cls.change_feed_retention),
+            change_feed_queue_size=env_int("CHANGE_FEED_QUEUE_SIZE", cls.change_feed_queue_size),
+            change_feed_max_subscribers=env_int("CHANGE_FEED_MAX_SUBSCRIBERS", cls.change_feed_max_subscribers),
+            change_feed_heartbeat=env_float("CHANGE_FEED_HEARTBEAT", cls.change_feed_heartbeat),
+            cache_backend=os.environ.get("CACHE_BACKEND", cls.cache_backend),
+            cache_url=os.environ.get("CACHE_URL", cls.cache_url),
+            cache_ttl=env_float("CACHE_TTL", cls.cache_ttl),
+            cache_max_entries=env_int("CACHE_MAX_ENTRIES", cls.cache_max_entries),
+            admission_control=env_bool("ADMISSION_CONTROL", cls.admission_control),
+            admission_max_concurrency=env_int("ADMISSION_MAX_CONCURRENCY", cls.admission_max_concurrency),
+            admission_reserved=env_int("ADMISSION_RESERVED", cls.admission_reserved),
+            admission_retry_after=env_int("ADMISSION_RETRY_AFTER", cls.admission_retry_after),
+            server_timing=env_bool("SERVER_TIMING", cls.server_timing),
+            profile_sample_rate=env_float("PROFILE_SAMPLE_RATE", cls.profile_sample_rate),
+            profile_threshold=env_float("PROFILE_THRESHOLD", cls.profile_threshold),
+            profile_dir=os.environ.get("PROFILE_DIR", cls.profile_dir),
+        )
+
+    @property
+    def async_database_url(self):
+        return async_url(self.database_url)
+
+
+def async_url(database_url):
+    """`database_url` with its backend's async driver."""
+    url = make_url(database_url)
+    if url.get_backend_name() not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+
+settings = Settings.from_env()
@@ -1,36 +1,73 @@
+import time
+_import_started = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from config.database import engine, Base
-from routes import category, product, supplier, stockEntry
-
-# Import models to ensure they're registered with base
-from models.category import Category
-from models.product import Product
-from models.supplier import Supplier
-from models.stockEntry import StockEntry
-
-# Create all tables in correct order (Base knows the dependencies)
-Base.metadata.create_all(bind=engine)
-
-# Rebuild models to resolve forward references
-from schemas.category import CategoryResponse
-from schemas.product import ProductResponse
-from schemas.supplier import SupplierResponse
-from schemas.stockEntry import StockEntryResponse
-CategoryResponse.model_rebuild()
-ProductResponse.model_rebuild()
-SupplierResponse.model_rebuild()
-StockEntryResponse.model_rebuild()
-
-#initilize FastAPI app
-app = FastAPI()
-
-#Test a text
-
-@app.get("/")
-def greet():
-    return "This is test text"
-
-app.include_router(category.router)
-app.include_router(product.router)
-app.include_router(supplier.router)
-app.include_router(stockEntry.router)
\ No newline at end of file
+from sqlalchemy.orm import configure_mappers
+
+# Resolve schema forward references before the routers build their response models
+import schemas.registry
+from config.database import dispose_engines
+from config.replicas import ReadYourWritesMiddleware
+from services.stockEntries import stock_entry_commits
+from routes import category, product, supplier, stockEntry, outbound, analytics, valuation, metrics as metrics_routes
+from utils import metrics
+from utils.changeFeed import change_feed
+from utils.profiling import ProfilingMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Schema creation is a one-off step (python -m scripts.init_db), not something every worker does on import
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.startup["ready_seconds"] = round(time.perf_counter() - _import_started, 4)
+    logger.info("Worker ready in %.3fs", app.state.startup["ready_seconds"])
+    yield
+    # Stock entries queued for a group commit are written before the connections close
+    await stock_entry_commits.drain()
+    await change_feed.close()
+    await dispose_engines()
+
+
+def create_app():
+    """Build the FastAPI application. No database IO happens here; engines connect on first use."""
+    factory_started = time.perf_counter()
+    # Resolve model relationships now instead of inside the first request
+    configure_mappers()
+
+    #initilize FastAPI app
+    app = FastAPI(lifespan=lifespan)
+    # Query counts, DB and serialization time per request: Server-Timing header and per-route histograms
+    app.add_middleware(ProfilingMiddleware)
+    # Keeps a client's reads on the primary for a few seconds after its own writes (read replicas only)
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    #Test a text
+
+    @app.get("/")
+    def greet():
+        return "This is test text"
+
+    app.include_router(category.router)
+    app.include_router(product.router)
+    app.include_router(supplier.router)
+    app.include_router(stockEntry.router)
+    app.include_router(outbound.router)
+    app.include_router(analytics.router)
+    app.include_router(valuation.router)
+    app.include_router(metrics_routes.router)
+
+    # Cold-start timings of this worker, reported on /internal/metrics/
+    app.state.startup = {
+        "import_seconds": round(factory_started - _import_started, 4),
+        "factory_seconds": round(time.perf_counter() - factory_started, 4),
+        "ready_seconds": None,
+    }
+    metrics.register("startup", lambda: dict(app.state.startup))
+    return app
+
+
+app = create_app()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, text
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -9,6 +9,7 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(198), unique=True, index=True, nullable=False)
     description = Column(Text, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))  # Bumped by every update (optimistic concurrency)
     
     # Relationship with Products
     products = relationship("Product", back_populates="category")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, text
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -12,7 +12,8 @@ class Product(Base):
     sku = Column(String, unique=True, nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Float, nullable=False)  # Standard/retail selling price
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))  # Bumped by every update (optimistic concurrency)
 
     # Relationship with Category
     category = relationship("Category", back_populates="products")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+# Initialize ProductDailyMovement class (stock received per product per day)
+class ProductDailyMovement(Base):
+    __tablename__ = "product_daily_movements"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC day of the stock entries' date_added
+    quantity = Column(Integer, nullable=False, default=0)  # Sum of stock entry quantities
+    spend = Column(Float, nullable=False, default=0.0)  # Sum of quantity * unit_price
+    entry_count = Column(Integer, nullable=False, default=0)  # Number of stock entries that day
+
+    # Relationship with Product
+    product = relationship("Product")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, ForeignKey, text
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+# Initialize ProductStockLevel class (running stock balance per product)
+class ProductStockLevel(Base):
+    __tablename__ = "product_stock_levels"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0, index=True)  # On hand: stock entry quantities minus units issued
+    reserved = Column(Integer, nullable=False, default=0, server_default=text("0"))  # Units held by open reservations
+    entry_count = Column(Integer, nullable=False, default=0)  # Number of stock entries behind the balance
+
+    # Relationship with Product
+    product = relationship("Product")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from config.database import Base
 from datetime import datetime
@@ -6,6 +6,21 @@ from datetime import datetime
 # Initialize StockEntry class
 class StockEntry(Base):
     __tablename__ = "stock_entries"
+    __table_args__ = (
+        # Keyset pagination: ledger order overall, per product and per supplier.
+        # Undated legacy entries page first; PostgreSQL needs that spelled out to keep the index order
+        Index("ix_stock_entries_date_added_id", "date_added", "id", postgresql_ops={"date_added": "NULLS FIRST"}),
+        Index(
+            "ix_stock_entries_product_date_added_id", "product_id", "date_added", "id",
+            postgresql_ops={"date_added": "NULLS FIRST"},
+        ),
+        Index(
+            "ix_stock_entries_supplier_date_added_id", "supplier_id", "date_added", "id",
+            postgresql_ops={"date_added": "NULLS FIRST"},
+        ),
+        # Ids are never handed out again, including those of entries moved to stock_entries_archive
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -13,6 +28,7 @@ class StockEntry(Base):
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)  # Price at time of purchase
     date_added = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))  # Bumped by every update (optimistic concurrency)
 
     # Relationships
     product = relationship("Product", back_populates="stock_entries")
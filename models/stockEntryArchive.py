@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from config.database import Base
+
+# Initialize StockEntryArchive class (stock entries moved out of the live ledger by compaction, unchanged)
+class StockEntryArchive(Base):
+    __tablename__ = "stock_entries_archive"
+    __table_args__ = (
+        # FIFO cost layers of a product, newest first
+        Index("ix_stock_entries_archive_product_date_added_id", "product_id", "date_added", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # The entry's id in stock_entries
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    date_added = Column(DateTime, nullable=False)
+    version = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
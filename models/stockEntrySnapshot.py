@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+# Initialize StockEntrySnapshot class (totals of the archived stock entries per product and supplier)
+class StockEntrySnapshot(Base):
+    __tablename__ = "stock_entry_snapshots"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), primary_key=True, index=True)
+    quantity = Column(Integer, nullable=False, default=0)  # Sum of the archived entries' quantities
+    cost = Column(Float, nullable=False, default=0.0)  # Sum of quantity * unit_price
+    entry_count = Column(Integer, nullable=False, default=0)  # Number of archived entries
+    first_date = Column(DateTime, nullable=False)  # date_added of the oldest and newest archived entry
+    last_date = Column(DateTime, nullable=False)
+
+    # Relationships
+    product = relationship("Product")
+    supplier = relationship("Supplier")
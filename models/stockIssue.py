@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from config.database import Base
+from datetime import datetime
+
+# Initialize StockIssue class (outbound ledger: units that left the stock)
+class StockIssue(Base):
+    __tablename__ = "stock_issues"
+    __table_args__ = (
+        Index("ix_stock_issues_product_date_issued_id", "product_id", "date_issued", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    reservation_id = Column(Integer, ForeignKey("stock_reservations.id"), nullable=True, unique=True)  # Set when a reservation was issued
+    reference = Column(String(100), nullable=True)  # Caller's order or request id
+    date_issued = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    product = relationship("Product")
+    reservation = relationship("StockReservation")
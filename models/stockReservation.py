@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from config.database import Base
+from datetime import datetime
+
+# Reservation statuses: held until it is issued or released
+RESERVATION_HELD = "held"
+RESERVATION_ISSUED = "issued"
+RESERVATION_RELEASED = "released"
+
+# Initialize StockReservation class (units of a product held for an order)
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default=RESERVATION_HELD)
+    reference = Column(String(100), nullable=True)  # Caller's order or request id
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationship with Product
+    product = relationship("Product")
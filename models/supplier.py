@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Integer, String, Text, text
 from sqlalchemy.orm import relationship
 from config.database import Base
 
@@ -10,6 +10,7 @@ class Supplier(Base):
     name = Column(String, nullable=False)
     phone = Column(String, unique=True, nullable=False)
     contact_info = Column(Text, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))  # Bumped by every update (optimistic concurrency)
     
     # Relationship with StockEntry
     stock_entries = relationship("StockEntry", back_populates="supplier")
\ No newline at end of file
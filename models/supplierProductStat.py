@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+# Initialize SupplierProductStat class (stock received per supplier and product, archived entries included)
+class SupplierProductStat(Base):
+    __tablename__ = "supplier_product_stats"
+
+    supplier_id = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    quantity = Column(Integer, nullable=False, default=0)  # Sum of stock entry quantities
+    spend = Column(Float, nullable=False, default=0.0)  # Sum of quantity * unit_price
+    entry_count = Column(Integer, nullable=False, default=0)  # Number of stock entries (deliveries)
+    price_sum = Column(Float, nullable=False, default=0.0)  # Sum of unit_price, for the mean per delivery
+    min_unit_price = Column(Float, nullable=True)  # NULL once the pair has no entries left
+    max_unit_price = Column(Float, nullable=True)
+
+    # Relationships
+    supplier = relationship("Supplier")
+    product = relationship("Product")
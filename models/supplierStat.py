@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy.orm import relationship
+from config.database import Base
+
+# Initialize SupplierStat class (stock received per supplier, archived entries included)
+class SupplierStat(Base):
+    __tablename__ = "supplier_stats"
+
+    supplier_id = Column(Integer, ForeignKey("suppliers.id", ondelete="CASCADE"), primary_key=True)
+    products = Column(Integer, nullable=False, default=0)  # Products with stock entries from the supplier
+    quantity = Column(Integer, nullable=False, default=0)  # Sum of stock entry quantities
+    spend = Column(Float, nullable=False, default=0.0)  # Sum of quantity * unit_price
+    entry_count = Column(Integer, nullable=False, default=0)  # Number of stock entries (deliveries)
+
+    # Relationship with Supplier
+    supplier = relationship("Supplier")
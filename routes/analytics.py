@@ -0,0 +1,122 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from datetime import date
+from typing import Optional
+from config.database import get_db, get_read_db
+from schemas.analytics import (
+    Bucket, ProductMovementsResponse, CategoryMovementsResponse, SupplierStats, SupplierProductStats,
+)
+from schemas.pagination import Page
+from models.product import Product as ProductModel
+from models.category import Category as CategoryModel
+from models.supplier import Supplier as SupplierModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.movements import product_movements, category_movements
+from services.supplierStats import (
+    STATS_NAMESPACE, cached_stats, supplier_namespace, supplier_product_stats_page, supplier_stats,
+    supplier_stats_page,
+)
+from utils.cache import cached_response
+from utils.pagination import decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.admission import AdmissionLane, AdmittedRoute, LOW
+
+# Admission: reports share a few low-priority slots
+router = APIRouter(
+    prefix="/analytics", tags=["Analytics"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("analytics", limit=4, queue=16, timeout=2.0, priority=LOW))],
+)
+
+def _check_window(date_from, date_to):
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from must be before date_to")
+
+@router.get("/products/{product_id}/movements", response_model=ProductMovementsResponse)
+async def get_product_movements(
+    product_id: int,
+    bucket: Bucket = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Quantity and spend received for a product per day, week or month in [date_from, date_to)"""
+    _check_window(date_from, date_to)
+    product = await db.get(ProductModel, product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # Read from the daily rollup: one row per product and day instead of every ledger entry
+    buckets = await db.run_sync(product_movements, product_id, bucket, date_from, date_to)
+    return {
+        "product_id": product_id,
+        "product_name": product.name,
+        "bucket": bucket,
+        "date_from": date_from,
+        "date_to": date_to,
+        "buckets": buckets,
+    }
+
+@router.get("/categories/{category_id}/movements", response_model=CategoryMovementsResponse)
+async def get_category_movements(
+    category_id: int,
+    bucket: Bucket = "day",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Quantity and spend received for all products of a category per day, week or month"""
+    _check_window(date_from, date_to)
+    category = await db.get(CategoryModel, category_id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+
+    buckets = await db.run_sync(category_movements, category_id, bucket, date_from, date_to)
+    return {
+        "category_id": category_id,
+        "category_name": category.name,
+        "bucket": bucket,
+        "date_from": date_from,
+        "date_to": date_to,
+        "buckets": buckets,
+    }
+
+@router.get("/suppliers", response_model=Page[SupplierStats])
+async def get_supplier_stats(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Spend, deliveries and quantity received per supplier, in supplier id order"""
+    # Read from the primary: the shared cache must never hold a replica's lagging rollup
+    after_id = decode_cursor(cursor, [SupplierModel.id])[0] if cursor is not None else None
+    # A range of the per-supplier rollup; cached until a stock entry write
+    entry = await cached_stats(db, STATS_NAMESPACE, f"{after_id}:{limit}", supplier_stats_page, after_id, limit)
+    return cached_response(request, entry)
+
+@router.get("/suppliers/{supplier_id}", response_model=SupplierStats)
+async def get_single_supplier_stats(supplier_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Spend, deliveries and quantity received from one supplier"""
+    # Cached until a write touches this supplier's stock entries
+    entry = await cached_stats(db, supplier_namespace(supplier_id), "totals", supplier_stats, supplier_id)
+    if entry["body"] is None:
+        if not await db.get(SupplierModel, supplier_id):
+            raise HTTPException(status_code=404, detail="Supplier not found")
+        raise HTTPException(status_code=404, detail="No stock entries for this supplier")
+    return cached_response(request, entry)
+
+@router.get("/suppliers/{supplier_id}/products", response_model=Page[SupplierProductStats])
+async def get_supplier_product_stats(
+    supplier_id: int,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Per product a supplier delivered: unit price mean/min/max against the current list price"""
+    after_id = decode_cursor(cursor, [ProductModel.id])[0] if cursor is not None else None
+    entry = await cached_stats(
+        db, supplier_namespace(supplier_id), f"products:{after_id}:{limit}",
+        supplier_product_stats_page, supplier_id, after_id, limit,
+    )
+    if not entry["body"]["items"] and after_id is None and not await db.get(SupplierModel, supplier_id):
+        raise HTTPException(status_code=404, detail="Supplier not found")
+    return cached_response(request, entry)
@@ -1,69 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException
-from config.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from config.database import get_db, get_read_db
+from config.replicas import use_replica
 from schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
 from models.category import Category as CategoryModel
-from sqlalchemy.orm import Session
+from models.product import Product as ProductModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from schemas.batch import Batch
+from schemas.pagination import Page
+from services.catalog import get_cached_category, get_loader, load_batch, serialize_written, CatalogLoader
+from utils.cache import cache, cached_response
+from utils.batch import batch_ids
+from utils.export import export_response
+from utils.fields import dump_sparse, field_selection, project_entry
+from utils.loading import select_for_response
+from utils.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.admission import AdmissionLane, AdmittedRoute, HIGH, LOW
+from utils.writes import delete_returning, insert_returning, rejected_write, update_returning
+from utils.profiling import ProfiledJSONResponse as JSONResponse
 
-router = APIRouter(prefix="/category", tags=["Categories"])
+# Admission lanes: lookups by id are served first, an export never holds more than one slot
+lookups = AdmissionLane("category.lookups", limit=15, queue=64, timeout=2.0, priority=HIGH)
+exports = AdmissionLane("category.exports", limit=1, queue=2, timeout=1.0, priority=LOW)
+router = APIRouter(
+    prefix="/category", tags=["Categories"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("category", limit=8, queue=32, timeout=2.0))],
+)
 
-@router.get("/", response_model=list[CategoryResponse])
-def get_all_category(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    db_category = db.query(CategoryModel).offset(skip).limit(limit).all()
+@router.get("/", response_model=Page[CategoryResponse])
+async def get_all_category(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(CategoryResponse)),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select_for_response(CategoryModel, CategoryResponse, fields)
+    db_category, next_cursor = await paginate(db, stmt, [CategoryModel.id], cursor, limit)
     if not db_category:
         raise HTTPException(status_code=404, detail="Categories not found")
-    return db_category
+    if fields is not None:
+        return JSONResponse({"items": dump_sparse(CategoryResponse, fields, db_category), "next_cursor": next_cursor})
+    return {"items": db_category, "next_cursor": next_cursor}
 
-@router.get("/{id}", response_model=CategoryResponse)
-def get_category_by_id(id: int, db: Session = Depends(get_db)):
-    db_category= db.query(CategoryModel).filter(CategoryModel.id == id).first()
-    if not db_category:
+@router.get("/export", dependencies=[Depends(exports)])
+async def export_categories(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    replica: bool = Depends(use_replica),
+):
+    """Stream the whole categories table as NDJSON or CSV"""
+    stmt = select(*CategoryModel.__table__.columns).order_by(CategoryModel.id)
+    return export_response(stmt, format, "categories", read_only=replica)
+
+@router.get("/batch", response_model=Batch[CategoryResponse], dependencies=[Depends(lookups)])
+async def get_categories_batch(
+    ids: list[int] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(CategoryResponse)),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Get many categories by id with one query, in request order; ids that do not exist are null and listed in `missing`"""
+    return JSONResponse(await load_batch(loader, "category", ids, fields))
+
+@router.get("/{id}", response_model=CategoryResponse, dependencies=[Depends(lookups)])
+async def get_category_by_id(
+    id: int,
+    request: Request,
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(CategoryResponse)),
+    db: AsyncSession = Depends(get_db),
+):
+    cached_category = await get_cached_category(db, id)
+    if not cached_category:
         raise HTTPException(status_code=404, detail="Categories not found")
-    return db_category
+    return cached_response(request, project_entry(cached_category, fields))
 
 @router.post("/", response_model=CategoryResponse)
-def add_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def add_category(
+    category: CategoryCreate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
     # Fetch category data from request body
     try:
-        db_category = CategoryModel(**category.model_dump())
-        db.add(db_category)
-        db.commit()
-        db.refresh(db_category)
-        return db_category
+        db_category = (await db.execute(insert_returning(CategoryModel, category.model_dump()))).one()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Category already exists")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Server error")
+    return JSONResponse(await serialize_written(loader, "category", db_category))
 
-@router.put("/{id}", response_model=CategoryUpdate)
-def update_category(id: int, category: CategoryUpdate, db: Session = Depends(get_db)):
-    # Fetch Catefory From DB
-    db_category = db.query(CategoryModel).filter(CategoryModel.id == id).first()
-    if not db_category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    #Update category
+@router.put("/{id}", response_model=CategoryResponse)
+async def update_category(
+    id: int,
+    category: CategoryUpdate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    # Only the fields sent are written
+    values = category.model_dump(exclude_unset=True, exclude={"version"})
     try:
-        for key, value in category.model_dump().items():
-            setattr(db_category, key, value)
-        db.commit()
-        db.refresh(db_category)
-        return db_category
+        db_category = (await db.execute(update_returning(CategoryModel, id, values, category.version))).first()
+        if db_category is not None:
+            await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Category already exists")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update category")
+    if db_category is None:
+        await db.rollback()
+        raise await rejected_write(db, CategoryModel, id, category.version, "Category not found")
+    # Products embed their category
+    cache.invalidate("category", id)
+    cache.invalidate_namespace("product")
+    return JSONResponse(await serialize_written(loader, "category", db_category))
 
 @router.delete("/{id}")
-def delete_category(id:int, db: Session = Depends(get_db)):
-    db_category = db.query(CategoryModel).filter(CategoryModel.id == id).first()
-    if not db_category:
-        raise HTTPException(status_code=404, detail="Category ot found")
+async def delete_category(
+    id: int,
+    version: Optional[int] = Query(None, description="Version last read; a newer one rejects the delete with 409"),
+    db: AsyncSession = Depends(get_db),
+):
+    # A category with products stays, like under an enforced foreign key
+    stmt = delete_returning(CategoryModel, id, version, referenced_by=[ProductModel.category_id])
     try:
-        db.delete(db_category)
-        db.commit()
-        return {"message": "Category deleted successfully"}
+        deleted = (await db.execute(stmt)).first()
+        if deleted is not None:
+            await db.commit()
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Failed to delete category")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete category")
+    if deleted is None:
+        await db.rollback()
+        raise await rejected_write(db, CategoryModel, id, version, "Category ot found", "Failed to delete category")
+    # Products embed their category
+    cache.invalidate("category", id)
+    cache.invalidate_namespace("product")
+    return {"message": "Category deleted successfully"}
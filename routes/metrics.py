@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from utils import metrics
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(prefix="/internal/metrics", tags=["Internal"], route_class=ProfiledRoute)
+
+@router.get("/")
+async def get_metrics():
+    """Process-local runtime metrics (connection pools, ...) for this worker"""
+    return metrics.collect()
\ No newline at end of file
@@ -0,0 +1,96 @@
+from fastapi import APIRouter, Depends, HTTPException
+from config.database import get_db, get_read_db
+from schemas.outbound import (
+    StockReservationCreate, StockReservationResponse, StockIssueCreate, StockIssueResponse, StockLevelResponse,
+)
+from models.stockReservation import StockReservation as StockReservationModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.outbound import (
+    get_availability, issue_reservation, issue_stock, outbound_rule_violation, release_reservation, reserve_stock,
+)
+from services.stockFeed import level_events
+from utils.cache import cache
+from utils.changeFeed import change_feed
+from utils.admission import AdmissionLane, AdmittedRoute, HIGH
+from utils.profiling import ProfiledJSONResponse as JSONResponse
+
+# Admission lanes: availability and reservation lookups are served before the writes
+lookups = AdmissionLane("stock.lookups", limit=15, queue=64, timeout=2.0, priority=HIGH)
+router = APIRouter(
+    prefix="/stock", tags=["Stock Outbound"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("stock", limit=8, queue=128, timeout=5.0))],
+)
+
+def _in_transaction(session, operation, *args):
+    try:
+        row = operation(session, *args)
+        session.commit()
+        return row
+    except BaseException:
+        session.rollback()
+        raise
+
+async def _write(db, operation, *args):
+    # Statements and commit (or rollback) run in one threadpool hop: a request holding the
+    # product's balance row never waits for a free thread to release it, which under load
+    # would leave every thread waiting on that row
+    try:
+        return await db.run_sync(_in_transaction, operation, *args)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Server error")
+
+@router.get("/levels/{product_id}", response_model=StockLevelResponse, dependencies=[Depends(lookups)])
+async def get_stock_availability(product_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Units on hand, held by open reservations and available to reserve or issue"""
+    availability = await db.run_sync(get_availability, product_id)
+    if availability is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    on_hand, reserved = availability
+    return {"product_id": product_id, "on_hand": on_hand, "reserved": reserved, "available": on_hand - reserved}
+
+@router.post("/reservations", response_model=StockReservationResponse)
+async def create_reservation(reservation: StockReservationCreate, db: AsyncSession = Depends(get_db)):
+    """Hold available units of a product for an order; 409 if not enough are available"""
+    violation = outbound_rule_violation(reservation.quantity)
+    if violation:
+        raise HTTPException(status_code=400, detail=violation)
+    row = await _write(db, reserve_stock, reservation.product_id, reservation.quantity, reservation.reference)
+    return JSONResponse(StockReservationResponse.model_validate(row).model_dump(mode="json"))
+
+@router.get("/reservations/{id}", response_model=StockReservationResponse, dependencies=[Depends(lookups)])
+async def get_reservation(id: int, db: AsyncSession = Depends(get_read_db)):
+    reservation = (await db.execute(
+        select(*StockReservationModel.__table__.columns).where(StockReservationModel.id == id)
+    )).first()
+    if reservation is None:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return JSONResponse(StockReservationResponse.model_validate(reservation).model_dump(mode="json"))
+
+@router.post("/reservations/{id}/release", response_model=StockReservationResponse)
+async def release_stock_reservation(id: int, db: AsyncSession = Depends(get_db)):
+    """Cancel a held reservation, returning its units to the available stock"""
+    row = await _write(db, release_reservation, id)
+    return JSONResponse(StockReservationResponse.model_validate(row).model_dump(mode="json"))
+
+@router.post("/reservations/{id}/issue", response_model=StockIssueResponse)
+async def issue_stock_reservation(id: int, db: AsyncSession = Depends(get_db)):
+    """Issue the units of a held reservation"""
+    row, levels = await _write(db, issue_reservation, id)
+    cache.invalidate_namespace("valuation")
+    # Issues lower the on-hand balance, so they can start a low-stock alert
+    await change_feed.publish(*level_events(levels))
+    return JSONResponse(StockIssueResponse.model_validate(row).model_dump(mode="json"))
+
+@router.post("/issues", response_model=StockIssueResponse)
+async def create_issue(issue: StockIssueCreate, db: AsyncSession = Depends(get_db)):
+    """Issue available units of a product without a reservation; 409 if not enough are available"""
+    violation = outbound_rule_violation(issue.quantity)
+    if violation:
+        raise HTTPException(status_code=400, detail=violation)
+    row, levels = await _write(db, issue_stock, issue.product_id, issue.quantity, issue.reference)
+    cache.invalidate_namespace("valuation")
+    await change_feed.publish(*level_events(levels))
+    return JSONResponse(StockIssueResponse.model_validate(row).model_dump(mode="json"))
@@ -1,68 +1,187 @@
-from fastapi import APIRouter, Depends, HTTPException
-from config.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from config.database import get_db, get_read_db
+from config.replicas import use_replica
 from schemas.product import ProductCreate, ProductUpdate, ProductResponse
 from models.product import Product as ProductModel
-from sqlalchemy.orm import Session
+from models.stockEntry import StockEntry as StockEntryModel
+from models.stockEntrySnapshot import StockEntrySnapshot as StockEntrySnapshotModel
+from models.stockIssue import StockIssue as StockIssueModel
+from models.stockReservation import StockReservation as StockReservationModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from schemas.batch import Batch
+from schemas.pagination import Page
+from services.search import search_product_ids
+from services.catalog import get_cached_product, get_loader, load_batch, serialize_written, CatalogLoader
+from services.supplierStats import invalidate_supplier_stats, product_supplier_ids
+from utils.cache import cache, cached_response
+from utils.loading import select_for_response
+from utils.batch import batch_ids
+from utils.export import export_response
+from utils.fields import dump_sparse, field_selection, project_entry
+from utils.pagination import decode_cursor, encode_cursor, paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.admission import AdmissionLane, AdmittedRoute, HIGH, LOW
+from utils.writes import delete_returning, insert_returning, rejected_write, update_returning
+from utils.profiling import ProfiledJSONResponse as JSONResponse
 
-router = APIRouter(prefix="/product", tags=["Products"])
+# Admission lanes: lookups by id are served first, an export never holds more than one slot
+lookups = AdmissionLane("product.lookups", limit=15, queue=64, timeout=2.0, priority=HIGH)
+exports = AdmissionLane("product.exports", limit=1, queue=2, timeout=1.0, priority=LOW)
+router = APIRouter(
+    prefix="/product", tags=["Products"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("product", limit=8, queue=32, timeout=2.0))],
+)
 
-@router.get("/", response_model=list[ProductResponse])
-def get_all_products(skip: int =0, limit: int =10, db: Session = Depends(get_db)):
-    db_products = db.query(ProductModel).offset(skip).limit(limit).all()
+@router.get("/", response_model=Page[ProductResponse])
+async def get_all_products(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductResponse)),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select_for_response(ProductModel, ProductResponse, fields)
+    db_products, next_cursor = await paginate(db, stmt, [ProductModel.id], cursor, limit)
     if not db_products:
         raise HTTPException(status_code=404, detail="Products not found")
-    return db_products
+    if fields is not None:
+        # Serialized through the narrowed schema; the full response_model would reject the missing fields
+        return JSONResponse({"items": dump_sparse(ProductResponse, fields, db_products), "next_cursor": next_cursor})
+    return {"items": db_products, "next_cursor": next_cursor}
 
-@router.get("/{id}", response_model=ProductResponse)
-def get_product_by_id(id: int, db: Session = Depends(get_db)):
-    db_products = db.query(ProductModel).filter(ProductModel.id == id).first()
-    if not db_products:
+@router.get("/search", response_model=Page[ProductResponse])
+async def search_products(
+    sku: Optional[str] = Query(None, description="Exact SKU"),
+    sku_prefix: Optional[str] = Query(None, description="SKU starts with"),
+    name: Optional[str] = Query(None, description="Case-insensitive name substring"),
+    q: Optional[str] = Query(None, description="Full-text search over the description (all words must match)"),
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductResponse)),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Search products by SKU, SKU prefix, name and description, filtered by category and price range"""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must not exceed max_price")
+    (after_id,) = decode_cursor(cursor, [ProductModel.id]) if cursor is not None else (None,)
+    ids, last_id = await db.run_sync(
+        search_product_ids, after_id, limit, sku=sku, sku_prefix=sku_prefix, name=name, q=q,
+        category_id=category_id, min_price=min_price, max_price=max_price,
+    )
+    db_products = []
+    if ids:
+        # Full rows (and their categories) only for the page that matched
+        stmt = select_for_response(ProductModel, ProductResponse, fields).where(ProductModel.id.in_(ids))
+        db_products = (await db.scalars(stmt.order_by(ProductModel.id))).all()
+    next_cursor = encode_cursor([last_id]) if last_id is not None else None
+    if fields is not None:
+        return JSONResponse({"items": dump_sparse(ProductResponse, fields, db_products), "next_cursor": next_cursor})
+    return {"items": db_products, "next_cursor": next_cursor}
+
+@router.get("/export", dependencies=[Depends(exports)])
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    replica: bool = Depends(use_replica),
+):
+    """Stream the whole products table as NDJSON or CSV"""
+    stmt = select(*ProductModel.__table__.columns).order_by(ProductModel.id)
+    return export_response(stmt, format, "products", read_only=replica)
+
+@router.get("/batch", response_model=Batch[ProductResponse], dependencies=[Depends(lookups)])
+async def get_products_batch(
+    ids: list[int] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductResponse)),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Get many products by id with one query, in request order; ids that do not exist are null and listed in `missing`"""
+    return JSONResponse(await load_batch(loader, "product", ids, fields))
+
+@router.get("/{id}", response_model=ProductResponse, dependencies=[Depends(lookups)])
+async def get_product_by_id(
+    id: int,
+    request: Request,
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductResponse)),
+    db: AsyncSession = Depends(get_db),
+):
+    cached_product = await get_cached_product(db, id)
+    if not cached_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return db_products
+    # The full body is cached once; a field set is projected from it without touching the database
+    return cached_response(request, project_entry(cached_product, fields))
 
 @router.post("/", response_model=ProductResponse)
-def add_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def add_product(
+    product: ProductCreate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
     # fetch product data from request body
     try:
-        db_products = ProductModel(**product.model_dump())
-        db.add(db_products)
-        db.commit()
-        db.refresh(db_products)
-        return db_products
+        db_product = (await db.execute(insert_returning(ProductModel, product.model_dump()))).one()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Product already exists")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Server error")
+    # The category comes from the cache rather than a reload of the new row
+    return JSONResponse(await serialize_written(loader, "product", db_product))
     
 @router.put('/{id}', response_model=ProductResponse)
-def update_product(id: int, product:ProductUpdate, db: Session = Depends(get_db)):
-    db_products = db.query(ProductModel).filter(ProductModel.id == id).first()
-    if not db_products:
-        raise HTTPException(status_code=404, detail="Product not found")
-    #Update Product
+async def update_product(
+    id: int,
+    product: ProductUpdate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    # Only the fields sent are written
+    values = product.model_dump(exclude_unset=True, exclude={"version"})
     try:
-        for key, value in product.model_dump().items():
-            setattr(db_products, key, value)
-        db.commit()
-        db.refresh(db_products)
-        return db_products
+        db_product = (await db.execute(update_returning(ProductModel, id, values, product.version))).first()
+        if db_product is not None:
+            await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Product with this SKU already exists or category not found")
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=404, detail="Failled to update product")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failled to update product")
+    if db_product is None:
+        await db.rollback()
+        raise await rejected_write(db, ProductModel, id, product.version, "Product not found")
+    cache.invalidate("product", id)
+    cache.invalidate_namespace("valuation")
+    if values.keys() & {"name", "price"}:
+        # Supplier analytics show the product's name and measure price variance against its current price
+        invalidate_supplier_stats(await db.run_sync(product_supplier_ids, id))
+    return JSONResponse(await serialize_written(loader, "product", db_product))
 
 @router.delete("/{id}")
-def delete_product(id: int, db: Session = Depends(get_db)):
-    db_product = db.query(ProductModel).filter(ProductModel.id == id).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
+async def delete_product(
+    id: int,
+    version: Optional[int] = Query(None, description="Version last read; a newer one rejects the delete with 409"),
+    db: AsyncSession = Depends(get_db),
+):
+    # A product with stock movements (archived ones included) stays, like under an enforced foreign key
+    stmt = delete_returning(ProductModel, id, version, referenced_by=[
+        StockEntryModel.product_id, StockEntrySnapshotModel.product_id,
+        StockReservationModel.product_id, StockIssueModel.product_id,
+    ])
     try:
-        db.delete(db_product)
-        db.commit()
-        return {"message": "Product deleted succefully"}
+        deleted = (await db.execute(stmt)).first()
+        if deleted is not None:
+            await db.commit()
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Failled to delete Product")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failled to delete Product")
+    if deleted is None:
+        await db.rollback()
+        raise await rejected_write(db, ProductModel, id, version, "Product not found", "Failled to delete Product")
+    cache.invalidate("product", id)
+    cache.invalidate_namespace("valuation")
+    return {"message": "Product deleted succefully"}
@@ -1,156 +1,385 @@
-from fastapi import APIRouter, Depends, HTTPException
-from config.database import get_db
-from schemas.stockEntry import StockEntryCreate, StockEntryUpdate, StockEntryResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+from config.database import get_db, get_read_db
+from config.replicas import use_replica
+from config.settings import settings
+from schemas.stockEntry import (
+    StockEntryCreate, StockEntryUpdate, StockEntryResponse,
+    StockByProductResponse, StockBySupplierResponse, StockEntryBulkResult,
+)
 from models.stockEntry import StockEntry as StockEntryModel
 from models.product import Product as ProductModel
-from models.supplier import Supplier as SupplierModel
-from sqlalchemy.orm import Session
+from models.productStockLevel import ProductStockLevel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import func
+from schemas.pagination import Page
+from services.catalog import get_loader, CatalogLoader
+from services.stockEntries import (
+    add_stock_entry_grouped, ingest_stock_entry_chunk, iter_bulk_chunks, stock_entry_rule_violation,
+    select_stock_entries, serialize_stock_entries,
+)
+from services.ledger import apply_ledger_changes, merge_level_changes, LEDGER_FIELDS
+from services.outbound import check_stock_covered
+from services.stockFeed import (
+    bulk_events, bulk_totals, count_bulk_rows, entry_event, entry_subscription, level_events, low_stock_subscription,
+)
+from services.stockLevels import get_stock_level
+from services.supplierStats import invalidate_supplier_stats
+from utils.cache import cache
+from utils.changeFeed import change_feed
+from utils.export import export_response
+from utils.fields import field_selection
+from utils.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.admission import UNMETERED, AdmissionLane, AdmittedRoute, HIGH, LOW
+from utils.writes import delete_returning, insert_returning, rejected_write, update_returning
+from utils.profiling import ProfiledJSONResponse as JSONResponse
 
-router = APIRouter(prefix="/stock_entries", tags=["Stock Entry"])
+# Admission lanes: ledger scans and uploads get a few slots of their own, so lookups and writes never queue behind them
+lookups = AdmissionLane("stock_entries.lookups", limit=15, queue=64, timeout=2.0, priority=HIGH)
+scans = AdmissionLane("stock_entries.scans", limit=2, queue=8, timeout=1.0, priority=LOW)
+uploads = AdmissionLane("stock_entries.bulk", limit=2, queue=4, timeout=5.0, priority=LOW)
+exports = AdmissionLane("stock_entries.exports", limit=1, queue=2, timeout=1.0, priority=LOW)
+router = APIRouter(
+    prefix="/stock_entries", tags=["Stock Entry"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("stock_entries", limit=8, queue=128, timeout=5.0))],
+)
 
-@router.get("/", response_model=list[StockEntryResponse])
-def get_all_stock_entries(skip: int=0, limit: int=10, db: Session = Depends(get_db)):
-    stock_entries = db.query(StockEntryModel).offset(skip).limit(limit).all()
+# Stock entries are paged in ledger order
+STOCK_ENTRY_KEYS = [StockEntryModel.date_added, StockEntryModel.id]
+HISTORY_PAGE_SIZE = 100
+
+async def _load_stock_entry(db, id, fields=None):
+    stmt = select_stock_entries(fields).where(StockEntryModel.id == id)
+    return (await db.scalars(stmt)).first()
+
+async def _stock_entry_response(loader, db_stock_entry):
+    # Products and suppliers the request already resolved (e.g. during validation) are not loaded again
+    return JSONResponse((await serialize_stock_entries(loader, [db_stock_entry]))[0])
+
+@router.get("/", response_model=Page[StockEntryResponse])
+async def get_all_stock_entries(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(StockEntryResponse)),
+    db: AsyncSession = Depends(get_read_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    # The cursor needs the sort keys even when they are not requested
+    stmt = select_stock_entries(fields, include=STOCK_ENTRY_KEYS)
+    stock_entries, next_cursor = await paginate(db, stmt, STOCK_ENTRY_KEYS, cursor, limit)
     if not stock_entries:
         raise HTTPException(status_code=404, detail="Stock entries not found")
-    return stock_entries
+    items = await serialize_stock_entries(loader, stock_entries, fields)
+    return JSONResponse({"items": items, "next_cursor": next_cursor})
+
+# Declared before "/{id}" so the path is not captured as an id
+@router.get("/low-stock", dependencies=[Depends(scans)])
+async def get_low_stock_products(threshold: int = 10, db: AsyncSession = Depends(get_read_db)):
+    """Get products with total stock below threshold"""
+    # Range scan over the maintained balances instead of aggregating the ledger
+    results = (await db.execute(
+        select(
+            ProductModel.id,
+            ProductModel.name,
+            ProductModel.price,
+            ProductModel.sku,
+            ProductStockLevel.quantity.label('total_stock')
+        ).join(
+            ProductStockLevel, ProductModel.id == ProductStockLevel.product_id
+        ).where(
+            ProductStockLevel.quantity <= threshold,
+            ProductStockLevel.entry_count > 0
+        )
+    )).all()
+    
+    # Plain dicts need no jsonable_encoder pass, which held the event loop for seconds on large results
+    return JSONResponse([
+        {
+            "product_id": result.id,
+            "product_name": result.name,
+            "sku": result.sku,
+            "price": result.price,
+            "current_stock": int(result.total_stock),
+            "threshold": threshold,
+            "status": "LOW_STOCK"
+        }
+        for result in results
+    ])
+
+@router.get("/feed", dependencies=[Depends(UNMETERED)])
+async def stock_entry_feed(
+    product_id: Optional[int] = None,
+    supplier_id: Optional[int] = None,
+    threshold: Optional[int] = Query(None, description="Stream low-stock transitions at this threshold instead of stock entry changes"),
+    last_event_id: Optional[str] = Header(None, description="Resume after this event (sent by EventSource on reconnect)"),
+    resume: Optional[str] = Query(None, alias="last_event_id", description="Same as the Last-Event-ID header"),
+):
+    """Server-Sent Events stream of committed stock entry changes, or of low-stock transitions"""
+    # Holds no database session: an idle subscriber only waits on its queue
+    if threshold is None:
+        key, render = entry_subscription(product_id, supplier_id)
+    elif supplier_id is not None:
+        raise HTTPException(status_code=400, detail="Low-stock alerts are per product, not per supplier")
+    else:
+        key, render = low_stock_subscription(threshold, product_id)
+    if change_feed.full():
+        raise HTTPException(status_code=503, detail="Too many change feed subscribers")
+    return StreamingResponse(
+        change_feed.stream(key, render, last_event_id or resume),
+        media_type="text/event-stream",
+        # No caching, and no buffering by reverse proxies such as nginx
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/export", dependencies=[Depends(exports)])
+async def export_stock_entries(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    replica: bool = Depends(use_replica),
+):
+    """Stream the stock_entries ledger as NDJSON or CSV, optionally limited to [date_from, date_to)"""
+    stmt = select(*StockEntryModel.__table__.columns).order_by(*STOCK_ENTRY_KEYS)
+    if date_from is not None:
+        stmt = stmt.where(StockEntryModel.date_added >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(StockEntryModel.date_added < date_to)
+    return export_response(stmt, format, "stock_entries", read_only=replica)
 
-@router.get("/{id}", response_model=StockEntryResponse)
-def get_single_stock_entries(id: int, db: Session = Depends(get_db)):
-    single_stock_entry = db.query(StockEntryModel).filter(StockEntryModel.id == id).first()
+@router.get("/{id}", response_model=StockEntryResponse, dependencies=[Depends(lookups)])
+async def get_single_stock_entries(
+    id: int,
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(StockEntryResponse)),
+    db: AsyncSession = Depends(get_read_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    single_stock_entry = await _load_stock_entry(db, id, fields=fields)
     if not single_stock_entry:
         raise HTTPException(status_code=404, detail="Stock entry not found")
-    return single_stock_entry
+    return JSONResponse((await serialize_stock_entries(loader, [single_stock_entry], fields))[0])
 
-@router.post("/", response_model=StockEntryResponse)
-def add_stock_entries(stock_entry: StockEntryCreate, db: Session = Depends(get_db)):
+# Grouped posts wait on the group commit, which bounds them itself, not on a connection of their own
+@router.post("/", response_model=StockEntryResponse, dependencies=[Depends(UNMETERED)] if settings.group_commit else [])
+async def add_stock_entries(
+    stock_entry: StockEntryCreate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
     # Validate that product exists
-    product = db.query(ProductModel).filter(ProductModel.id == stock_entry.product_id).first()
+    product = await loader.load("product", stock_entry.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     # Validate that supplier exists
-    supplier = db.query(SupplierModel).filter(SupplierModel.id == stock_entry.supplier_id).first()
+    supplier = await loader.load("supplier", stock_entry.supplier_id)
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
     # Backend validation and business rules
-    if stock_entry.quantity <= 0:
-        raise HTTPException(status_code=400, detail="Quantity must be positive")
-    if stock_entry.unit_price <= 0:
-        raise HTTPException(status_code=400, detail="Unit price must be positive")
+    violation = stock_entry_rule_violation(stock_entry)
+    if violation:
+        raise HTTPException(status_code=400, detail=violation)
     
     # Create stock entry - backend handles all calculations
+    values = stock_entry.model_dump()
+    values["date_added"] = values["date_added"] or datetime.utcnow()
+    if settings.group_commit:
+        # The validation reads' connection goes back to the pool first: the group needs one to commit
+        if db.in_transaction():
+            await db.rollback()
+        # Committed together with concurrent POSTs; this request still gets its own row or error.
+        # The group publishes the change feed events of all its entries.
+        db_stock_entry = await add_stock_entry_grouped(values)
+        cache.invalidate_namespace("valuation")
+        invalidate_supplier_stats([db_stock_entry.supplier_id])
+        return await _stock_entry_response(loader, db_stock_entry)
     try:
-        db_stock_entry = StockEntryModel(**stock_entry.model_dump())
-        db.add(db_stock_entry)
-        db.commit()
-        db.refresh(db_stock_entry)        
-        return db_stock_entry
+        db_stock_entry = (await db.execute(insert_returning(StockEntryModel, values))).one()
+        levels = await db.run_sync(apply_ledger_changes, added=[db_stock_entry])
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Stock entry validation failed")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Server error")
+    cache.invalidate_namespace("valuation")
+    invalidate_supplier_stats([db_stock_entry.supplier_id])
+    await change_feed.publish(entry_event("created", db_stock_entry), *level_events(levels))
+    return await _stock_entry_response(loader, db_stock_entry)
+
+@router.post("/bulk", response_model=StockEntryBulkResult, dependencies=[Depends(uploads)])
+async def bulk_add_stock_entries(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Insert many stock entries from a JSON array, NDJSON or CSV body in one transaction.
+
+    Rows that fail validation are reported individually and do not abort the batch.
+    """
+    inserted = 0
+    errors = []
+    totals = bulk_totals()
+    levels = {}
+    try:
+        async for chunk in iter_bulk_chunks(request):
+            chunk_rows, chunk_errors, chunk_levels = await db.run_sync(ingest_stock_entry_chunk, chunk, loader)
+            inserted += len(chunk_rows)
+            errors.extend(chunk_errors)
+            count_bulk_rows(totals, chunk_rows)
+            merge_level_changes(levels, chunk_levels)
+        await db.commit()
+        cache.invalidate_namespace("valuation")
+        invalidate_supplier_stats(supplier_id for _, supplier_id in totals)
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Server error")
+
+    await change_feed.publish(*bulk_events(totals), *level_events(levels))
+    return {"inserted": inserted, "errors": sorted(errors, key=lambda error: error["row"])}
 
 @router.put("/{id}", response_model=StockEntryResponse)
-def update_stock_entry(id: int, stock_entry: StockEntryUpdate, db: Session = Depends(get_db)):
-    db_stock_entry = db.query(StockEntryModel).filter(StockEntryModel.id == id).first()
-    if not db_stock_entry:
+async def update_stock_entry(
+    id: int,
+    stock_entry: StockEntryUpdate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    # Only the fields sent are written; an entry always stays on a day of the ledger
+    values = stock_entry.model_dump(exclude_unset=True, exclude={"version"})
+    if "date_added" in values and values["date_added"] is None:
+        del values["date_added"]
+    if "product_id" in values and not await loader.load("product", values["product_id"]):
+        raise HTTPException(status_code=404, detail="Product not found")
+    if "supplier_id" in values and not await loader.load("supplier", values["supplier_id"]):
+        raise HTTPException(status_code=404, detail="Supplier not found")
+
+    # The stored row, locked until the UPDATE: the business rules apply to it with
+    # the changes merged in, and the ledger moves the contribution it really had
+    old_values = (await db.execute(
+        select(*(getattr(StockEntryModel, key) for key in LEDGER_FIELDS))
+        .where(StockEntryModel.id == id)
+        .with_for_update()
+    )).first()
+    if old_values is None:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Stock entry not found")
-    
+    violation = stock_entry_rule_violation(StockEntryCreate(**{**old_values._mapping, **values}))
+    if violation:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=violation)
+
+    moved = bool(values.keys() & set(LEDGER_FIELDS))
     try:
-        for key, value in stock_entry.model_dump().items():
-            setattr(db_stock_entry, key, value)
-        db.commit()
-        db.refresh(db_stock_entry)
-        return db_stock_entry
+        db_stock_entry = (await db.execute(update_returning(StockEntryModel, id, values, stock_entry.version))).first()
+        levels = {}
+        if db_stock_entry is not None:
+            if moved:
+                levels = await db.run_sync(apply_ledger_changes, added=[db_stock_entry], removed=[old_values])
+                await db.run_sync(check_stock_covered, levels)
+            await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Stock entry validation failed")
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=404, detail="Stock entry not found")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to update stock entry")
+    if db_stock_entry is None:
+        await db.rollback()
+        raise await rejected_write(db, StockEntryModel, id, stock_entry.version, "Stock entry not found")
+    cache.invalidate_namespace("valuation")
+    if moved:
+        invalidate_supplier_stats([db_stock_entry.supplier_id, old_values.supplier_id])
+    await change_feed.publish(
+        entry_event("updated", db_stock_entry, previous=old_values if moved else None), *level_events(levels)
+    )
+    return await _stock_entry_response(loader, db_stock_entry)
     
-@router.get("/by-product/{product_id}")
-def get_stock_by_product(product_id: int, db: Session = Depends(get_db)):
-    """Get all stock entries for a specific product"""
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+@router.get("/by-product/{product_id}", response_model=StockByProductResponse, dependencies=[Depends(scans)])
+async def get_stock_by_product(
+    product_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(StockEntryResponse)),
+    db: AsyncSession = Depends(get_read_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Get one page of stock entries for a specific product"""
+    product = await loader.load("product", product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    stock_entries = db.query(StockEntryModel).filter(StockEntryModel.product_id == product_id).all()
+    stmt = select_stock_entries(fields, include=STOCK_ENTRY_KEYS).where(StockEntryModel.product_id == product_id)
+    stock_entries, next_cursor = await paginate(db, stmt, STOCK_ENTRY_KEYS, cursor, limit)
     
-    # Calculate total stock for this product
-    total_stock = db.query(func.sum(StockEntryModel.quantity)).filter(
-        StockEntryModel.product_id == product_id
-    ).scalar() or 0
+    # Total stock comes from the maintained balance
+    total_stock = await db.run_sync(get_stock_level, product_id)
     
-    return {
+    return JSONResponse({
         "product_id": product_id,
-        "product_name": product.name,
+        "product_name": product["body"]["name"],
         "total_stock": total_stock,
-        "stock_entries": stock_entries
-    }
+        "stock_entries": await serialize_stock_entries(loader, stock_entries, fields),
+        "next_cursor": next_cursor
+    })
 
-@router.get("/by-supplier/{supplier_id}")
-def get_stock_by_supplier(supplier_id: int, db: Session = Depends(get_db)):
-    """Get all stock entries for a specific supplier"""
-    supplier = db.query(SupplierModel).filter(SupplierModel.id == supplier_id).first()
+@router.get("/by-supplier/{supplier_id}", response_model=StockBySupplierResponse, dependencies=[Depends(scans)])
+async def get_stock_by_supplier(
+    supplier_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(StockEntryResponse)),
+    db: AsyncSession = Depends(get_read_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Get one page of stock entries for a specific supplier"""
+    supplier = await loader.load("supplier", supplier_id)
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
-    stock_entries = db.query(StockEntryModel).filter(StockEntryModel.supplier_id == supplier_id).all()
+    stmt = select_stock_entries(fields, include=STOCK_ENTRY_KEYS).where(StockEntryModel.supplier_id == supplier_id)
+    stock_entries, next_cursor = await paginate(db, stmt, STOCK_ENTRY_KEYS, cursor, limit)
     
-    return {
+    return JSONResponse({
         "supplier_id": supplier_id,
-        "supplier_name": supplier.name,
-        "stock_entries": stock_entries
-    }
-
-@router.get("/low-stock")
-def get_low_stock_products(threshold: int = 10, db: Session = Depends(get_db)):
-    """Get products with total stock below threshold"""
-    # Group by product and calculate total stock
-    results = db.query(
-        ProductModel.id,
-        ProductModel.name,
-        ProductModel.price,
-        ProductModel.sku,
-        func.sum(StockEntryModel.quantity).label('total_stock')
-    ).join(
-        StockEntryModel, ProductModel.id == StockEntryModel.product_id
-    ).group_by(
-        ProductModel.id, ProductModel.name, ProductModel.price, ProductModel.sku
-    ).having(
-        func.sum(StockEntryModel.quantity) <= threshold
-    ).all()
-    
-    return [
-        {
-            "product_id": result.id,
-            "product_name": result.name,
-            "sku": result.sku,
-            "price": result.price,
-            "current_stock": int(result.total_stock),
-            "threshold": threshold,
-            "status": "LOW_STOCK"
-        }
-        for result in results
-    ]
-
-
+        "supplier_name": supplier["body"]["name"],
+        "stock_entries": await serialize_stock_entries(loader, stock_entries, fields),
+        "next_cursor": next_cursor
+    })
 
 @router.delete("/{id}")
-def delete_stock_entry(id: int, db: Session = Depends(get_db)):
-    db_stock_entry = db.query(StockEntryModel).filter(StockEntryModel.id == id).first()
-    if not db_stock_entry:
-        raise HTTPException(status_code=404, detail="Stock entry not found")
-        
+async def delete_stock_entry(
+    id: int,
+    version: Optional[int] = Query(None, description="Version last read; a newer one rejects the delete with 409"),
+    db: AsyncSession = Depends(get_db),
+):
     try:
-        db.delete(db_stock_entry)
-        db.commit()
-        return {"message": "Stock entry deleted successfully"}
+        db_stock_entry = (await db.execute(delete_returning(StockEntryModel, id, version))).first()
+        if db_stock_entry is not None:
+            levels = await db.run_sync(apply_ledger_changes, removed=[db_stock_entry])
+            # Units already reserved or issued cannot be taken back out of the ledger
+            await db.run_sync(check_stock_covered, levels)
+            await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Failed to delete stock entry")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete stock entry")
+    if db_stock_entry is None:
+        await db.rollback()
+        raise await rejected_write(db, StockEntryModel, id, version, "Stock entry not found")
+    cache.invalidate_namespace("valuation")
+    invalidate_supplier_stats([db_stock_entry.supplier_id])
+    await change_feed.publish(entry_event("deleted", db_stock_entry), *level_events(levels))
+    return {"message": "Stock entry deleted successfully"}
@@ -1,69 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException
-from config.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import Optional
+from config.database import get_db, get_read_db
+from config.replicas import use_replica
 from schemas.supplier import SupplierCreate, SupplierUpdate, SupplierResponse
 from models.supplier import Supplier as SupplierModel
-from sqlalchemy.orm import Session
+from models.stockEntry import StockEntry as StockEntryModel
+from models.stockEntrySnapshot import StockEntrySnapshot as StockEntrySnapshotModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
+from schemas.batch import Batch
+from schemas.pagination import Page
+from services.catalog import get_cached_supplier, get_loader, load_batch, serialize_written, CatalogLoader
+from services.supplierStats import invalidate_supplier_stats
+from utils.cache import cache, cached_response
+from utils.batch import batch_ids
+from utils.export import export_response
+from utils.fields import dump_sparse, field_selection, project_entry
+from utils.loading import select_for_response
+from utils.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.admission import AdmissionLane, AdmittedRoute, HIGH, LOW
+from utils.writes import delete_returning, insert_returning, rejected_write, update_returning
+from utils.profiling import ProfiledJSONResponse as JSONResponse
 
-router = APIRouter(prefix="/supplier", tags=["Suppliers"])
+# Admission lanes: lookups by id are served first, an export never holds more than one slot
+lookups = AdmissionLane("supplier.lookups", limit=15, queue=64, timeout=2.0, priority=HIGH)
+exports = AdmissionLane("supplier.exports", limit=1, queue=2, timeout=1.0, priority=LOW)
+router = APIRouter(
+    prefix="/supplier", tags=["Suppliers"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("supplier", limit=8, queue=32, timeout=2.0))],
+)
 
-@router.get("/", response_model=list[SupplierResponse])
-def get_suppliers(skip: int=0, limit: int=10, db: Session = Depends(get_db)):
-    db_suppliers = db.query(SupplierModel).offset(skip).limit(limit).all()
+@router.get("/", response_model=Page[SupplierResponse])
+async def get_suppliers(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(SupplierResponse)),
+    db: AsyncSession = Depends(get_read_db),
+):
+    stmt = select_for_response(SupplierModel, SupplierResponse, fields)
+    db_suppliers, next_cursor = await paginate(db, stmt, [SupplierModel.id], cursor, limit)
     if not db_suppliers:
         raise HTTPException(status_code=404, detail="Suppliers not found")
-    return db_suppliers
+    if fields is not None:
+        return JSONResponse({"items": dump_sparse(SupplierResponse, fields, db_suppliers), "next_cursor": next_cursor})
+    return {"items": db_suppliers, "next_cursor": next_cursor}
 
-@router.get("/{id}", response_model=SupplierResponse)
-def get_suppliers_by_id(id: int, db: Session = Depends(get_db)):
-    db_supplier = db.query(SupplierModel).filter(SupplierModel.id == id).first()
-    if not db_supplier:
+@router.get("/export", dependencies=[Depends(exports)])
+async def export_suppliers(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    replica: bool = Depends(use_replica),
+):
+    """Stream the whole suppliers table as NDJSON or CSV"""
+    stmt = select(*SupplierModel.__table__.columns).order_by(SupplierModel.id)
+    return export_response(stmt, format, "suppliers", read_only=replica)
+
+@router.get("/batch", response_model=Batch[SupplierResponse], dependencies=[Depends(lookups)])
+async def get_suppliers_batch(
+    ids: list[int] = Depends(batch_ids),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(SupplierResponse)),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    """Get many suppliers by id with one query, in request order; ids that do not exist are null and listed in `missing`"""
+    return JSONResponse(await load_batch(loader, "supplier", ids, fields))
+
+@router.get("/{id}", response_model=SupplierResponse, dependencies=[Depends(lookups)])
+async def get_suppliers_by_id(
+    id: int,
+    request: Request,
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(SupplierResponse)),
+    db: AsyncSession = Depends(get_db),
+):
+    cached_supplier = await get_cached_supplier(db, id)
+    if not cached_supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
-    return db_supplier
+    return cached_response(request, project_entry(cached_supplier, fields))
 
 @router.post("/", response_model=SupplierResponse)
-def add_supplier(supplier: SupplierCreate, db: Session = Depends(get_db)):
+async def add_supplier(
+    supplier: SupplierCreate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
     # Fetch suppliers from response body
     try:
-        db_supplier = SupplierModel(**supplier.model_dump())
-        db.add(db_supplier)
-        db.commit()
-        db.refresh(db_supplier)
-        return db_supplier
+        db_supplier = (await db.execute(insert_returning(SupplierModel, supplier.model_dump()))).one()
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=409, detail="Supplier already exist")
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Server error")
+    return JSONResponse(await serialize_written(loader, "supplier", db_supplier))
 
 @router.put("/{id}", response_model=SupplierResponse)
-def update_supplier(id: int, supplier: SupplierUpdate, db: Session = Depends(get_db)):
-    db_supplier = db.query(SupplierModel).filter(SupplierModel.id == id).first()
-    if not db_supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
-    
-    #Update Supplier
+async def update_supplier(
+    id: int,
+    supplier: SupplierUpdate,
+    db: AsyncSession = Depends(get_db),
+    loader: CatalogLoader = Depends(get_loader),
+):
+    # Only the fields sent are written
+    values = supplier.model_dump(exclude_unset=True, exclude={"version"})
     try:
-        for key, value in supplier.model_dump().items():
-            setattr(db_supplier, key, value)
-        db.commit()
-        db.refresh(db_supplier)
-        return db_supplier
+        db_supplier = (await db.execute(update_returning(SupplierModel, id, values, supplier.version))).first()
+        if db_supplier is not None:
+            await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Supplier with this phone already exists")
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=404, detail="Failled to update supplier")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failled to update supplier")
+    if db_supplier is None:
+        await db.rollback()
+        raise await rejected_write(db, SupplierModel, id, supplier.version, "Supplier not found")
+    cache.invalidate("supplier", id)
+    invalidate_supplier_stats([id])  # The analytics carry the supplier's name
+    return JSONResponse(await serialize_written(loader, "supplier", db_supplier))
 
 @router.delete("/{id}")
-def delete_supplier(id: int, db: Session = Depends(get_db)):
-    db_supplier = db.query(SupplierModel).filter(SupplierModel.id == id).first()
-    if not db_supplier:
-        raise HTTPException(status_code=404, detail="Supplier not found")
-    
+async def delete_supplier(
+    id: int,
+    version: Optional[int] = Query(None, description="Version last read; a newer one rejects the delete with 409"),
+    db: AsyncSession = Depends(get_db),
+):
+    # A supplier with stock entries (archived ones included) stays, like under an enforced foreign key
+    stmt = delete_returning(
+        SupplierModel, id, version, referenced_by=[StockEntryModel.supplier_id, StockEntrySnapshotModel.supplier_id],
+    )
     try:
-        db.delete(db_supplier)
-        db.commit()
-        return {"message": "Supplier deleted successfully"}
+        deleted = (await db.execute(stmt)).first()
+        if deleted is not None:
+            await db.commit()
     except Exception:
-        db.rollback()
-        raise HTTPException(status_code=500, detail="Failled to delete supplier")
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failled to delete supplier")
+    if deleted is None:
+        await db.rollback()
+        raise await rejected_write(db, SupplierModel, id, version, "Supplier not found", "Failled to delete supplier")
+    cache.invalidate("supplier", id)
+    return {"message": "Supplier deleted successfully"}
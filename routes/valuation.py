@@ -0,0 +1,73 @@
+from bisect import bisect_right
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+from schemas.pagination import Page
+from schemas.valuation import ProductValuation, ValuationSummary
+from services.valuation import cached_valuation, compute_valuation
+from utils.cache import cached_response
+from utils.fields import field_selection, project
+from utils.pagination import decode_cursor, encode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from models.product import Product as ProductModel
+from utils.admission import AdmissionLane, AdmittedRoute, LOW
+from utils.profiling import ProfiledJSONResponse as JSONResponse
+
+# Admission: a cold valuation reads the whole ledger, so it gets a couple of low-priority slots
+router = APIRouter(
+    prefix="/valuation", tags=["Valuation"], route_class=AdmittedRoute,
+    dependencies=[Depends(AdmissionLane("valuation", limit=2, queue=8, timeout=2.0, priority=LOW))],
+)
+
+# Sorted product ids of the last valuation served, for bisecting into its product list
+_product_ids = {"etag": None, "ids": []}
+
+async def _valuation():
+    # The vectorized pass is CPU-bound and uses its own sync session, so it always runs off the event loop
+    return cached_valuation() or await run_in_threadpool(compute_valuation)
+
+def _product_index(entry):
+    if _product_ids["etag"] != entry["etag"]:
+        _product_ids["ids"] = [p["product_id"] for p in entry["body"]["products"]]
+        _product_ids["etag"] = entry["etag"]
+    return _product_ids["ids"]
+
+@router.get("/", response_model=ValuationSummary)
+async def get_inventory_valuation(request: Request):
+    """Inventory value on hand (FIFO, weighted-average cost, retail) and margin across all products"""
+    entry = await _valuation()
+    body = entry["body"]
+    return cached_response(request, {"etag": entry["etag"], "body": {"computed_at": body["computed_at"], "totals": body["totals"]}})
+
+@router.get("/products", response_model=Page[ProductValuation])
+async def get_product_valuations(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductValuation)),
+):
+    """Per-product valuations in product id order"""
+    entry = await _valuation()
+    products = entry["body"]["products"]
+    start = 0
+    if cursor is not None:
+        (after_id,) = decode_cursor(cursor, [ProductModel.id])
+        start = bisect_right(_product_index(entry), after_id)
+    items = products[start:start + limit]
+    next_cursor = encode_cursor([items[-1]["product_id"]]) if start + limit < len(products) else None
+    if fields is not None:
+        return JSONResponse({"items": [project(item, fields) for item in items], "next_cursor": next_cursor})
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/products/{product_id}", response_model=ProductValuation)
+async def get_product_valuation(
+    product_id: int,
+    fields: Optional[tuple[str, ...]] = Depends(field_selection(ProductValuation)),
+):
+    entry = await _valuation()
+    products = entry["body"]["products"]
+    index = bisect_right(_product_index(entry), product_id) - 1
+    if index < 0 or products[index]["product_id"] != product_id:
+        raise HTTPException(status_code=404, detail="Product valuation not found")
+    if fields is not None:
+        return JSONResponse(project(products[index], fields))
+    return products[index]
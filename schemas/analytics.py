@@ -0,0 +1,52 @@
+from pydantic import BaseModel
+from datetime import date
+from typing import Literal, Optional
+
+Bucket = Literal["day", "week", "month"]
+
+# -- One time bucket of received stock --
+class MovementBucket(BaseModel):
+    period_start: date  # First day of the day/week/month
+    quantity: int
+    spend: float  # Sum of quantity * unit_price
+    entry_count: int
+
+# -- Movement responses --
+class ProductMovementsResponse(BaseModel):
+    product_id: int
+    product_name: str
+    bucket: Bucket
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    buckets: list[MovementBucket]
+
+class CategoryMovementsResponse(BaseModel):
+    category_id: int
+    category_name: str
+    bucket: Bucket
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    buckets: list[MovementBucket]
+
+# -- Supplier spend, and unit prices per product against the current list price --
+class SupplierStats(BaseModel):
+    supplier_id: int
+    supplier_name: str
+    products: int  # Products delivered
+    deliveries: int  # Stock entries
+    quantity: int
+    spend: float  # Sum of quantity * unit_price
+
+class SupplierProductStats(BaseModel):
+    product_id: int
+    product_name: str
+    price: float  # Current list price
+    deliveries: int
+    quantity: int
+    spend: float
+    avg_unit_price: float  # Mean unit_price per delivery
+    min_unit_price: float
+    max_unit_price: float
+    list_value: float  # quantity * price
+    price_variance: float  # spend - list_value; negative when bought below list price
+    price_variance_pct: Optional[float] = None
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+# --- Batch lookup by ids ---
+class Batch(BaseModel, Generic[T]):
+    items: list[Optional[T]]  # In request order; null where the id does not exist
+    missing: list[int]  # Requested ids that do not exist
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
+from schemas.updates import not_null
 
 # --- Base Schema (common fields) ---
 class CategoryBase(BaseModel):
@@ -14,10 +15,14 @@ class CategoryCreate(CategoryBase):
 class CategoryUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
+    version: Optional[int] = None  # Version last read; a newer one rejects the update with 409
+
+    reject_nulls = not_null("name")
 
 # --- Response Schema ---
 class CategoryResponse(CategoryBase):
     id: int
+    version: int
 
     class Config:
         from_attributes = True # Enables ORM to dict conversion for SQLAlchemy models
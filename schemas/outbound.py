@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+# -- Reservation Schemas --
+class StockReservationCreate(BaseModel):
+    product_id: int
+    quantity: int
+    reference: Optional[str] = Field(None, max_length=100)  # Caller's order or request id
+
+class StockReservationResponse(StockReservationCreate):
+    id: int
+    status: str  # held, issued or released
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True # Enables ORM to dict conversion for SQLAlchemy models
+
+# -- Issue Schemas --
+class StockIssueCreate(BaseModel):
+    product_id: int
+    quantity: int
+    reference: Optional[str] = Field(None, max_length=100)  # Caller's order or request id
+
+class StockIssueResponse(StockIssueCreate):
+    id: int
+    reservation_id: Optional[int] = None
+    date_issued: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True # Enables ORM to dict conversion for SQLAlchemy models
+
+# -- Stock level response --
+class StockLevelResponse(BaseModel):
+    product_id: int
+    on_hand: int
+    reserved: int
+    available: int
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, TYPE_CHECKING 
+from schemas.updates import not_null
 
 if TYPE_CHECKING:
     from schemas.category import CategoryResponse
@@ -23,10 +24,14 @@ class ProductUpdate(BaseModel):
     description: Optional[str] = Field(None, max_length=1000)
     price: Optional[float] = None  # Standard/retail selling price
     category_id: Optional[int] = None
+    version: Optional[int] = None  # Version last read; a newer one rejects the update with 409
+
+    reject_nulls = not_null("name", "sku", "price", "category_id")
 
 # --- Response Schema ---
 class ProductResponse(ProductBase):
     id: int
+    version: int
     category: Optional["CategoryResponse"] = None  # forward reference
 
     class Config:
@@ -0,0 +1,23 @@
+"""Schema registry: resolve forward references between response schemas.
+
+Response schemas refer to each other by name (see the TYPE_CHECKING imports),
+so they are rebuilt here, once per process, with every schema in scope.
+Import this module before the routers so their response models are built
+from complete schemas at startup rather than on the first request.
+"""
+from schemas.category import CategoryResponse
+from schemas.product import ProductResponse
+from schemas.supplier import SupplierResponse
+from schemas.stockEntry import StockEntryResponse, StockByProductResponse, StockBySupplierResponse
+
+RESPONSE_SCHEMAS = (
+    CategoryResponse,
+    ProductResponse,
+    SupplierResponse,
+    StockEntryResponse,
+    StockByProductResponse,
+    StockBySupplierResponse,
+)
+
+for schema in RESPONSE_SCHEMAS:
+    schema.model_rebuild()
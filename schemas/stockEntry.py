@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
+from schemas.updates import not_null
 
 if TYPE_CHECKING:
     from schemas.product import ProductResponse
@@ -25,16 +26,43 @@ class StockEntryUpdate(BaseModel):
     quantity: Optional[int] = None
     unit_price: Optional[float] = None
     date_added: Optional[datetime] = None
+    version: Optional[int] = None  # Version last read; a newer one rejects the update with 409
+
+    reject_nulls = not_null("product_id", "supplier_id", "quantity", "unit_price")
 
 # Response Schema
 class StockEntryResponse(StockEntryBase):
     id: int
+    version: int
     product: Optional["ProductResponse"] = None
     supplier: Optional["SupplierResponse"] = None
 
     class Config:
         from_attributes = True # Enables ORM to dict conversion for SQLAlchemy models
 
+# -- Stock history responses --
+class StockByProductResponse(BaseModel):
+    product_id: int
+    product_name: str
+    total_stock: int
+    stock_entries: list[StockEntryResponse]
+    next_cursor: Optional[str] = None
+
+class StockBySupplierResponse(BaseModel):
+    supplier_id: int
+    supplier_name: str
+    stock_entries: list[StockEntryResponse]
+    next_cursor: Optional[str] = None
+
+# -- Bulk ingestion responses --
+class StockEntryBulkError(BaseModel):
+    row: int  # 1-based position of the row in the request body
+    error: str
+
+class StockEntryBulkResult(BaseModel):
+    inserted: int
+    errors: list[StockEntryBulkError]
+
 # -- Generic Message response
 class MessageResponse(BaseModel):
     message: str
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional
+from schemas.updates import not_null
 
 # --- Base Schema (common fields) ---
 class SupplierBase(BaseModel):
@@ -16,10 +17,14 @@ class SupplierUpdate(BaseModel):
     name: Optional[str] = None
     phone: Optional[str] = Field(None, pattern=r"^\+?\d{10,15}$")  # ✅ Optional validation
     contact_info: Optional[str] = None
+    version: Optional[int] = None  # Version last read; a newer one rejects the update with 409
+
+    reject_nulls = not_null("name", "phone", "contact_info")
 
 # --- Response Schema ---
 class SupplierResponse(SupplierBase):
     id: int
+    version: int
 
     class Config:
         from_attributes = True # Enables ORM to dict conversion for SQLAlchemy models
@@ -0,0 +1,14 @@
+from pydantic import field_validator
+
+
+def not_null(*fields):
+    """Validator for a partial-update schema: `fields` may be left out, but not sent as null.
+
+    Defaults are not validated, so only an explicit null reaches the check
+    and is rejected with 422 instead of failing on a NOT NULL column.
+    """
+    def check(cls, value):
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+    return field_validator(*fields)(classmethod(check))
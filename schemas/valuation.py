@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+
+# -- Valuation of one product's stock on hand --
+class ProductValuation(BaseModel):
+    product_id: int
+    received_quantity: int
+    on_hand_quantity: int
+    price: float  # Current selling price
+    wac_unit_cost: float  # Weighted-average cost of everything received
+    wac_value: float
+    fifo_unit_cost: float  # Average cost of the newest layers still on hand
+    fifo_value: float
+    retail_value: float
+    unit_margin: float  # price - wac_unit_cost
+    margin_pct: float
+
+# -- Whole-catalog totals --
+class ValuationTotals(BaseModel):
+    products: int
+    on_hand_quantity: int
+    wac_value: float
+    fifo_value: float
+    retail_value: float
+    margin_value: float  # retail_value - wac_value
+
+class ValuationSummary(BaseModel):
+    computed_at: str
+    totals: ValuationTotals
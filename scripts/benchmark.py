@@ -0,0 +1,284 @@
+"""Per-endpoint load benchmark for every route in routes/.
+
+Drives the app in-process (ASGI transport, no network) against the
+configured DATABASE_URL, one route at a time, with `--concurrency` clients.
+For each route it reports throughput, p50/p95/p99 latency and SQL
+statements per request, and writes the results as JSON so runs can be
+compared.
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.seed --entries 1000000
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.benchmark --concurrency 32 --requests 500 --output run.json
+    python -m scripts.benchmark ... --compare baseline.json   # exits 1 on regressions
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import event, func, select
+
+import config.database as database
+from config.settings import settings
+from main import app
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from models.stockEntry import StockEntry
+
+
+class Context:
+    """Ids sampled from the database plus counters for unique write payloads."""
+
+    def __init__(self, rng, max_ids):
+        self.rng = rng
+        self.max_ids = max_ids
+        self.sequence = int(time.time() * 1000)
+
+    def id(self, model):
+        return self.rng.randint(1, max(1, self.max_ids[model]))
+
+    def unique(self):
+        self.sequence += 1
+        return self.sequence
+
+
+async def _create(client, path, body):
+    response = await client.post(path, json=body)
+    return response.json().get("id") if response.status_code == 200 else None
+
+
+def _category_body(ctx):
+    return {"name": f"bench-category-{ctx.unique()}", "description": "benchmark"}
+
+
+def _product_body(ctx):
+    n = ctx.unique()
+    return {"name": f"bench-product-{n}", "sku": f"BENCH-{n}", "price": 9.99, "category_id": ctx.id(Category)}
+
+
+def _supplier_body(ctx):
+    return {"name": "bench-supplier", "phone": f"+{ctx.unique() % 10**14:014d}", "contact_info": "bench"}
+
+
+def _stock_entry_body(ctx):
+    return {"product_id": ctx.id(Product), "supplier_id": ctx.id(Supplier), "quantity": 5, "unit_price": 1.25}
+
+
+# name -> async callable(client, ctx) returning the response of the measured request.
+# Update/delete scenarios create their own row first (not measured) so they never touch seeded data.
+async def _measured_update(client, ctx, prefix, body_factory):
+    id = await _create(client, prefix, body_factory(ctx))
+    return lambda: client.put(f"{prefix}{id}", json=body_factory(ctx))
+
+
+async def _measured_delete(client, ctx, prefix, body_factory):
+    id = await _create(client, prefix, body_factory(ctx))
+    return lambda: client.delete(f"{prefix}{id}")
+
+
+def _get(path_factory):
+    async def prepare(client, ctx):
+        return lambda: client.get(path_factory(ctx))
+    return prepare
+
+
+def _post(path, body_factory):
+    async def prepare(client, ctx):
+        return lambda: client.post(path, json=body_factory(ctx))
+    return prepare
+
+
+def _put(prefix, body_factory):
+    async def prepare(client, ctx):
+        return await _measured_update(client, ctx, prefix, body_factory)
+    return prepare
+
+
+def _delete(prefix, body_factory):
+    async def prepare(client, ctx):
+        return await _measured_delete(client, ctx, prefix, body_factory)
+    return prepare
+
+
+def _export_window(ctx):
+    day = datetime.utcnow() - timedelta(days=ctx.rng.randint(1, 365))
+    return f"/stock_entries/export?date_from={day:%Y-%m-%dT00:00:00}&date_to={day + timedelta(days=1):%Y-%m-%dT00:00:00}"
+
+
+SCENARIOS = {
+    "category.list": _get(lambda ctx: "/category/?limit=50"),
+    "category.get": _get(lambda ctx: f"/category/{ctx.id(Category)}"),
+    "category.export": _get(lambda ctx: "/category/export"),
+    "category.create": _post("/category/", _category_body),
+    "category.update": _put("/category/", _category_body),
+    "category.delete": _delete("/category/", _category_body),
+    "product.list": _get(lambda ctx: "/product/?limit=50"),
+    "product.get": _get(lambda ctx: f"/product/{ctx.id(Product)}"),
+    "product.create": _post("/product/", _product_body),
+    "product.update": _put("/product/", _product_body),
+    "product.delete": _delete("/product/", _product_body),
+    "supplier.list": _get(lambda ctx: "/supplier/?limit=50"),
+    "supplier.get": _get(lambda ctx: f"/supplier/{ctx.id(Supplier)}"),
+    "supplier.create": _post("/supplier/", _supplier_body),
+    "supplier.update": _put("/supplier/", _supplier_body),
+    "supplier.delete": _delete("/supplier/", _supplier_body),
+    "stock_entries.list": _get(lambda ctx: "/stock_entries/?limit=50"),
+    "stock_entries.get": _get(lambda ctx: f"/stock_entries/{ctx.id(StockEntry)}"),
+    "stock_entries.low_stock": _get(lambda ctx: "/stock_entries/low-stock?threshold=10"),
+    "stock_entries.by_product": _get(lambda ctx: f"/stock_entries/by-product/{ctx.id(Product)}"),
+    "stock_entries.by_supplier": _get(lambda ctx: f"/stock_entries/by-supplier/{ctx.id(Supplier)}"),
+    "stock_entries.export_day": _get(_export_window),
+    "stock_entries.create": _post("/stock_entries/", _stock_entry_body),
+    "stock_entries.bulk_100": _post("/stock_entries/bulk", lambda ctx: [_stock_entry_body(ctx) for _ in range(100)]),
+    "stock_entries.update": _put("/stock_entries/", _stock_entry_body),
+    "stock_entries.delete": _delete("/stock_entries/", _stock_entry_body),
+    "analytics.product_weekly": _get(lambda ctx: f"/analytics/products/{ctx.id(Product)}/movements?bucket=week"),
+    "analytics.category_monthly": _get(lambda ctx: f"/analytics/categories/{ctx.id(Category)}/movements?bucket=month"),
+    "valuation.summary": _get(lambda ctx: "/valuation/"),
+    "valuation.product": _get(lambda ctx: f"/valuation/products/{ctx.id(Product)}"),
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# Statement counter of the request being measured; propagates into threadpool calls and greenlets
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _count_query(*args):
+    box = _request_queries.get()
+    if box is not None:
+        box[0] += 1
+
+
+async def run_scenario(client, ctx, prepare, concurrency, total_requests):
+    latencies, errors = [], 0
+    remaining = total_requests
+    measured_queries = 0
+
+    async def worker():
+        nonlocal remaining, errors, measured_queries
+        while remaining > 0:
+            remaining -= 1
+            send = await prepare(client, ctx)
+            box = [0]
+            token = _request_queries.set(box)
+            start = time.perf_counter()
+            try:
+                response = await send()
+            finally:
+                _request_queries.reset(token)
+            latencies.append(time.perf_counter() - start)
+            measured_queries += box[0]
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries_per_request": measured_queries / len(latencies) if latencies else None,
+    }
+
+
+async def run(args):
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    event.listen(engine, "before_cursor_execute", _count_query)
+
+    db = database.SessionLocal()
+    try:
+        max_ids = {model: db.scalar(select(func.max(model.id))) or 0 for model in (Category, Product, Supplier, StockEntry)}
+    finally:
+        db.close()
+    ctx = Context(random.Random(args.seed), max_ids)
+
+    selected = [name for name in SCENARIOS if not args.routes or any(name.startswith(prefix) for prefix in args.routes)]
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    # Run the app's lifespan like a server would (it also disposes the engines on the way out)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name in selected:
+                results[name] = await run_scenario(client, ctx, SCENARIOS[name], args.concurrency, args.requests)
+                r = results[name]
+                print(
+                    f"{name:<28} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  p95 {r['p95_ms']:>8.2f}  "
+                    f"p99 {r['p99_ms']:>8.2f} ms  {r['queries_per_request']:>6.2f} q/req  {r['errors']} errors"
+                )
+
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "database": database.engine.url.get_backend_name(),
+            "db_async": settings.db_async,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "row_counts": {model.__tablename__: count for model, count in max_ids.items()},
+        },
+        "routes": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Return human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    for name, result in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if not before:
+            continue
+        if before["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {before['p99_ms']:.2f} -> {result['p99_ms']:.2f} ms")
+        if before["rps"] and result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+        if before["queries_per_request"] is not None and result["queries_per_request"] > before["queries_per_request"] + 0.5:
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']:.2f} -> {result['queries_per_request']:.2f}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--routes", nargs="*", help="only run scenarios starting with these prefixes, e.g. stock_entries")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Compare the sync (threadpool) and async database paths under concurrent load.
+
+Starts one uvicorn worker per mode against the same DATABASE_URL, drives the
+read endpoints with N concurrent clients and prints requests/s and latency
+percentiles for each mode.
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.benchmark_async --clients 500 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PATHS = [
+    "/category/",
+    "/product/",
+    "/product/1",
+    "/supplier/",
+    "/stock_entries/",
+    "/stock_entries/by-product/1",
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def _client(client, deadline, latencies, statuses, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        except httpx.HTTPError:
+            statuses["error"] = statuses.get("error", 0) + 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def drive(base_url, clients, duration):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        latencies, statuses = [], {}
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(_client(client, deadline, latencies, statuses, n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "statuses": statuses,
+    }
+
+
+def _wait_ready(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(base_url + "/", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run_mode(db_async, port, clients, duration):
+    env = dict(os.environ, DB_ASYNC="1" if db_async else "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base_url)
+        return asyncio.run(drive(base_url, clients, duration))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<6} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for db_async in (False, True):
+        result = run_mode(db_async, args.port, args.clients, args.duration)
+        mode = "async" if db_async else "sync"
+        print(
+            f"{mode:<6} {result['requests']:>9} {result['rps']:>9.1f} "
+            f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}  {result['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare per-request commits with group commit for POST /stock_entries/.
+
+Runs the app once per mode (GROUP_COMMIT=0, then 1) in a child process
+against the same DATABASE_URL, in-process (ASGI transport, no network, so
+the HTTP client does not compete with the writes), and has `--concurrency`
+clients post `--requests` single stock entries. Every entry is one unit of a
+product created for the run, so the product's stock afterwards must equal
+the number of acknowledged posts; exits 1 if it does not.
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.benchmark_group_commit --requests 5000 --concurrency 100
+    python -m scripts.benchmark_group_commit --interval-ms 5 --max-rows 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from scripts.benchmark import percentile
+
+
+async def _create_product(client):
+    """A new category, product and supplier for one run; returns (product_id, supplier_id)."""
+    tag = int(time.time() * 1000)
+    category = (await client.post("/category/", json={"name": f"group-commit-{tag}"})).json()
+    product = (await client.post("/product/", json={
+        "name": f"group-commit-{tag}", "sku": f"GC-{tag}", "price": 10.0, "category_id": category["id"],
+    })).json()
+    supplier = (await client.post("/supplier/", json={
+        "name": "group-commit", "phone": f"+{tag % 10**14:014d}", "contact_info": "benchmark",
+    })).json()
+    return product["id"], supplier["id"]
+
+
+async def run(requests, concurrency):
+    """One mode, in this process: drive the app and check the ledger."""
+    from main import app
+    from services.stockEntries import stock_entry_commits
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            product_id, supplier_id = await _create_product(client)
+            # Warm the catalog cache so the run measures the writes
+            await client.get(f"/product/{product_id}")
+            await client.get(f"/supplier/{supplier_id}")
+            body = {"product_id": product_id, "supplier_id": supplier_id, "quantity": 1, "unit_price": 2.5}
+            latencies, statuses = [], Counter()
+            remaining = requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    response = await client.post("/stock_entries/", json=body)
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+            stock = (await client.get(f"/stock/levels/{product_id}")).json()["on_hand"]
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "statuses": dict(statuses),
+        "lost": statuses[200] - stock,
+        "mean_group_size": stock_entry_commits.snapshot()["mean_group_size"],
+    }
+
+
+def run_mode(group_commit, args):
+    env = dict(
+        os.environ,
+        GROUP_COMMIT="1" if group_commit else "0",
+        GROUP_COMMIT_INTERVAL_MS=str(args.interval_ms),
+        GROUP_COMMIT_MAX_ROWS=str(args.max_rows),
+    )
+    # The stock check reads back what was just written
+    env.pop("DATABASE_REPLICA_URLS", None)
+    output = subprocess.run(
+        [sys.executable, "-m", "scripts.benchmark_group_commit", "--child",
+         "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--interval-ms", type=float, default=2.0)
+    parser.add_argument("--max-rows", type=int, default=500)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(asyncio.run(run(args.requests, args.concurrency))))
+        return 0
+
+    print(f"{'mode':<13} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'group':>6}  statuses")
+    mismatched = False
+    for group_commit in (False, True):
+        result = run_mode(group_commit, args)
+        mode = "group commit" if group_commit else "per request"
+        group_size = f"{result['mean_group_size']:.1f}" if result["mean_group_size"] else "-"
+        print(
+            f"{mode:<13} {result['requests']:>9} {result['rps']:>9.1f} "
+            f"{result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {group_size:>6}  {result['statuses']}"
+        )
+        if result["lost"]:
+            mismatched = True
+            print(f"  stock differs from acknowledged posts by {result['lost']}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Overload test: latency of cheap lookups while heavy ledger scans saturate the worker.
+
+Runs the app in a child process per scenario against the same DATABASE_URL,
+in-process (ASGI transport, as in benchmark_group_commit). `--cheap`
+clients send lookups by id (product, supplier, stock level), `--rate` per
+second each, for `--duration` seconds:
+
+    baseline    lookups alone
+    no control  lookups plus `--heavy` clients looping over low-stock and
+                stock entry histories, ADMISSION_CONTROL=0
+    admission   the same mix with admission control on
+
+Prints requests, p50/p99 and status counts per class, plus the requests
+each lane shed. With admission control the lookups' p99 should stay close
+to the baseline while the scans are queued or shed with 503.
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.benchmark_overload --heavy 64 --cheap 8 --rate 20 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from scripts.benchmark import percentile
+
+SCENARIOS = [
+    ("baseline", False, True),
+    ("no control", True, False),
+    ("admission", True, True),
+]
+
+
+def _cheap_paths(product_ids, supplier_ids):
+    paths = [f"/product/{product_id}" for product_id in product_ids]
+    paths += [f"/stock/levels/{product_id}" for product_id in product_ids]
+    return paths + [f"/supplier/{supplier_id}" for supplier_id in supplier_ids]
+
+
+def _heavy_paths(product_ids, supplier_ids, threshold):
+    paths = [f"/stock_entries/low-stock?threshold={threshold}"]
+    paths += [f"/stock_entries/by-product/{product_id}?limit=1000" for product_id in product_ids[:10]]
+    paths += [f"/stock_entries/by-supplier/{supplier_id}?limit=1000" for supplier_id in supplier_ids[:10]]
+    return paths
+
+
+async def _client(client, paths, offset, deadline, latencies, statuses, rate=None):
+    i = offset
+    next_at = time.perf_counter()
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] += 1
+        if response.status_code == 503:
+            # A shed client backs off as told instead of retrying at once
+            await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        elif rate:
+            # Paced at a fixed rate, so the lookups measure latency rather than saturate the worker themselves
+            next_at += 1 / rate
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+def _summary(latencies, statuses):
+    return {
+        "requests": len(latencies),
+        "p50_ms": (percentile(latencies, 0.50) or 0.0) * 1000,
+        "p99_ms": (percentile(latencies, 0.99) or 0.0) * 1000,
+        "statuses": dict(statuses),
+    }
+
+
+async def run(heavy, cheap, rate, duration, threshold):
+    """One scenario, in this process."""
+    from main import app
+
+    # Unhandled errors (e.g. connection pool timeouts) count as the 500s a server would send
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            product_ids = [product["id"] for product in (await client.get("/product/?limit=100")).json()["items"]]
+            supplier_ids = [supplier["id"] for supplier in (await client.get("/supplier/?limit=100")).json()["items"]]
+            cheap_paths = _cheap_paths(product_ids, supplier_ids)
+            heavy_paths = _heavy_paths(product_ids, supplier_ids, threshold)
+            # Warm the catalog cache so the lookups measure admission, not cold misses
+            for path in cheap_paths:
+                await client.get(path)
+
+            results = {}
+            deadline = time.perf_counter() + duration
+            clients = []
+            for name, count, paths, pace in (("cheap", cheap, cheap_paths, rate), ("heavy", heavy, heavy_paths, None)):
+                latencies, statuses = [], Counter()
+                results[name] = (latencies, statuses)
+                clients += [_client(client, paths, n, deadline, latencies, statuses, pace) for n in range(count)]
+            await asyncio.gather(*clients)
+            lanes = (await client.get("/internal/metrics/")).json()["admission"]["lanes"]
+
+    return {
+        **{name: _summary(*result) for name, result in results.items()},
+        "shed": {
+            name: lane["shed_queue_full"] + lane["shed_timeout"]
+            for name, lane in lanes.items() if lane["shed_queue_full"] + lane["shed_timeout"]
+        },
+    }
+
+
+def run_scenario(heavy, admission_control, args):
+    env = dict(os.environ, ADMISSION_CONTROL="1" if admission_control else "0")
+    output = subprocess.run(
+        [sys.executable, "-m", "scripts.benchmark_overload", "--child",
+         "--heavy", str(heavy), "--cheap", str(args.cheap), "--rate", str(args.rate), "--duration", str(args.duration),
+         "--threshold", str(args.threshold)],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heavy", type=int, default=64, help="Clients looping over ledger scans")
+    parser.add_argument("--cheap", type=int, default=8, help="Clients sending lookups by id")
+    parser.add_argument("--rate", type=float, default=20.0, help="Lookups per second per cheap client; 0: back to back")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--threshold", type=int, default=1000, help="Low-stock threshold of the heavy clients")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(asyncio.run(run(args.heavy, args.cheap, args.rate, args.duration, args.threshold))))
+        return 0
+
+    print(f"{'scenario':<11} {'class':<6} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9}  statuses")
+    for name, with_heavy, admission_control in SCENARIOS:
+        result = run_scenario(args.heavy if with_heavy else 0, admission_control, args)
+        for kind in ("cheap", "heavy"):
+            stats = result[kind]
+            if stats["requests"]:
+                print(
+                    f"{name:<11} {kind:<6} {stats['requests']:>9} "
+                    f"{stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}  {stats['statuses']}"
+                )
+        if result["shed"]:
+            print(f"{'':<11} shed by lane: {result['shed']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
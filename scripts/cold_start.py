@@ -0,0 +1,69 @@
+"""Measure worker cold-start time: process spawn until the first request is answered.
+
+Starts a fresh uvicorn worker `--runs` times against DATABASE_URL and reports
+the wall-clock time to the first 200 response, together with the worker's own
+import/factory/ready timings from /internal/metrics/.
+
+Usage:
+    python -m scripts.init_db
+    python -m scripts.cold_start --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def cold_start(port, timeout=60):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                    first_response = time.perf_counter() - started
+                    startup = httpx.get(base_url + "/internal/metrics/", timeout=5).json().get("startup", {})
+                    return first_response, startup
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("server did not start")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args(argv)
+
+    timings = []
+    for run in range(args.runs):
+        first_response, startup = cold_start(args.port)
+        timings.append(first_response)
+        print(
+            f"run {run + 1}: first response after {first_response * 1000:.0f} ms "
+            f"(import {startup.get('import_seconds', 0) * 1000:.0f} ms, "
+            f"factory {startup.get('factory_seconds', 0) * 1000:.0f} ms, "
+            f"ready {startup.get('ready_seconds', 0) * 1000:.0f} ms)"
+        )
+    print(
+        f"cold start: min {min(timings) * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, "
+        f"max {max(timings) * 1000:.0f} ms over {len(timings)} runs"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
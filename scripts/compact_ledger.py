@@ -0,0 +1,68 @@
+"""Archive stock entries older than the compaction horizon (see services/compaction.py).
+
+Moves them from stock_entries to stock_entries_archive in batches of
+`--batch-size` entries, one short transaction each, and adds them to the
+per-product/per-supplier stock_entry_snapshots. Balances, rollups,
+valuation and analytics totals are unchanged; `--verify` checks the
+derived tables against the ledger (live entries plus snapshots) afterwards.
+Safe to interrupt and to re-run.
+
+Usage:
+    python -m scripts.compact_ledger --horizon-days 365
+    python -m scripts.compact_ledger --batch-size 500 --pause 0.2 --verify
+"""
+import argparse
+import sys
+
+from config.database import SessionLocal
+from config.schema import create_schema
+from config.settings import settings
+from services.compaction import compact_ledger, compaction_horizon
+from services.movements import find_movement_drift
+from services.stockLevels import find_stock_level_drift
+from services.supplierStats import find_supplier_stat_drift
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--horizon-days", type=int, default=settings.ledger_compaction_horizon_days,
+                        help="archive entries added more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=settings.ledger_compaction_batch_size)
+    # SQLite has one writer at a time and its busy handler retries every 100 ms:
+    # back-to-back batches would keep the API's writes waiting until they time out
+    parser.add_argument("--pause", type=float, default=settings.ledger_compaction_pause_ms / 1000,
+                        help="seconds to wait between batches")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    parser.add_argument("--verify", action="store_true", help="check balances and rollups afterwards")
+    args = parser.parse_args(argv)
+
+    # The archive and snapshot tables are created on first use
+    create_schema()
+    horizon = compaction_horizon(args.horizon_days)
+    print(f"Archiving stock entries added before {horizon:%Y-%m-%d %H:%M:%S}")
+
+    def progress(stats):
+        if stats["batches"] % 100 == 0:
+            print(f"  {stats['archived']} archived in {stats['batches']} batches ({stats['seconds']:.1f}s)", flush=True)
+
+    stats = compact_ledger(SessionLocal, horizon, args.batch_size, args.pause, args.max_batches, progress)
+    rate = stats["archived"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"{stats['archived']} entries archived in {stats['batches']} batches, {stats['seconds']:.1f}s ({rate:.0f}/s)")
+
+    if not args.verify:
+        return 0
+    db = SessionLocal()
+    try:
+        drift, movement_drift = find_stock_level_drift(db), find_movement_drift(db)
+        supplier_drift = find_supplier_stat_drift(db)
+    finally:
+        db.close()
+    print(
+        f"{len(drift)} product(s), {len(movement_drift)} product-day(s) and "
+        f"{len(supplier_drift)} supplier row(s) out of sync"
+    )
+    return 1 if drift or movement_drift or supplier_drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
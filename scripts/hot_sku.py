@@ -0,0 +1,187 @@
+"""Concurrency benchmark for outbound stock on a single hot product.
+
+Creates a fresh product with `--stock` units on hand, then has `--concurrency`
+clients fire `--requests` outbound operations at it, in-process (ASGI
+transport, no network) against the configured DATABASE_URL. Reports
+throughput and latency, then checks that nothing was oversold:
+
+- units issued plus units still reserved never exceed the stock received,
+- the balance row agrees with the issue and reservation ledgers,
+- with more demand than stock, every unit was sold (no lost updates).
+
+Modes:
+    issue    each request issues `--quantity` units directly
+    reserve  each request reserves `--quantity` units, then issues the
+             reservation or (with probability `--release-rate`) releases it
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.hot_sku --stock 1000 --requests 2000 --concurrency 200
+    python -m scripts.hot_sku --mode reserve --release-rate 0.3 --output hot.json
+Exits 1 if an invariant is violated.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import httpx
+from sqlalchemy import func, select
+
+import config.database as database
+from config.settings import settings
+from main import app
+from models.productStockLevel import ProductStockLevel
+from models.stockIssue import StockIssue
+from models.stockReservation import StockReservation, RESERVATION_HELD
+from scripts.benchmark import percentile
+
+
+async def _create_hot_product(client, stock):
+    """A new category, product and supplier, with one stock entry of `stock` units."""
+    tag = int(time.time() * 1000)
+    category = (await client.post("/category/", json={"name": f"hot-sku-{tag}"})).json()
+    product = (await client.post("/product/", json={
+        "name": f"hot-sku-{tag}", "sku": f"HOT-{tag}", "price": 10.0, "category_id": category["id"],
+    })).json()
+    supplier = (await client.post("/supplier/", json={
+        "name": "hot-sku", "phone": f"+{tag % 10**14:014d}", "contact_info": "benchmark",
+    })).json()
+    response = await client.post("/stock_entries/", json={
+        "product_id": product["id"], "supplier_id": supplier["id"], "quantity": stock, "unit_price": 4.0,
+    })
+    response.raise_for_status()
+    return product["id"]
+
+
+async def _issue(client, product_id, args, rng):
+    response = await client.post("/stock/issues", json={"product_id": product_id, "quantity": args.quantity})
+    return [("issue", response.status_code)]
+
+
+async def _reserve(client, product_id, args, rng):
+    response = await client.post("/stock/reservations", json={"product_id": product_id, "quantity": args.quantity})
+    outcomes = [("reserve", response.status_code)]
+    if response.status_code == 200:
+        action = "release" if rng.random() < args.release_rate else "issue"
+        followup = await client.post(f"/stock/reservations/{response.json()['id']}/{action}")
+        outcomes.append((action, followup.status_code))
+    return outcomes
+
+
+MODES = {"issue": _issue, "reserve": _reserve}
+
+
+def _ledger_state(product_id):
+    db = database.SessionLocal()
+    try:
+        level = db.execute(
+            select(ProductStockLevel.quantity, ProductStockLevel.reserved).where(ProductStockLevel.product_id == product_id)
+        ).one()
+        issued = db.scalar(select(func.coalesce(func.sum(StockIssue.quantity), 0)).where(StockIssue.product_id == product_id))
+        held = db.scalar(select(func.coalesce(func.sum(StockReservation.quantity), 0)).where(
+            StockReservation.product_id == product_id, StockReservation.status == RESERVATION_HELD
+        ))
+        return {"on_hand": level.quantity, "reserved": level.reserved, "issued": issued, "held": held}
+    finally:
+        db.close()
+
+
+def check_invariants(args, counts, state):
+    """Human-readable violations of the no-oversell invariants."""
+    violations = []
+    issued_ok = counts[("issue", 200)] * args.quantity
+    if state["issued"] + state["held"] > args.stock:
+        violations.append(f"oversold: {state['issued']} issued + {state['held']} reserved > {args.stock} received")
+    if state["on_hand"] != args.stock - state["issued"]:
+        violations.append(f"on hand {state['on_hand']} != {args.stock} received - {state['issued']} issued")
+    if state["reserved"] != state["held"]:
+        violations.append(f"reserved {state['reserved']} != {state['held']} held by open reservations")
+    if state["issued"] != issued_ok:
+        violations.append(f"ledger has {state['issued']} units issued but {issued_ok} were acknowledged")
+    if args.mode == "issue" and args.requests * args.quantity >= args.stock and args.stock - state["issued"] >= args.quantity:
+        violations.append(f"undersold: {state['on_hand']} units left although demand exceeded stock")
+    return violations
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    operation = MODES[args.mode]
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            product_id = await _create_hot_product(client, args.stock)
+            latencies, counts = [], Counter()
+            remaining = args.requests
+
+            async def worker():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    start = time.perf_counter()
+                    outcomes = await operation(client, product_id, args, rng)
+                    latencies.append(time.perf_counter() - start)
+                    counts.update(outcomes)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    state = _ledger_state(product_id)
+    operations = sum(counts.values())
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "database": database.engine.url.get_backend_name(),
+            "db_async": settings.db_async,
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "stock": args.stock,
+            "quantity": args.quantity,
+            "product_id": product_id,
+        },
+        "seconds": elapsed,
+        "operations_per_second": operations / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "responses": {f"{name} {status}": count for (name, status), count in sorted(counts.items())},
+        "ledger": state,
+        "violations": check_invariants(args, counts, state),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=sorted(MODES), default="issue")
+    parser.add_argument("--stock", type=int, default=1000, help="units received before the run")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--quantity", type=int, default=1, help="units per reservation or issue")
+    parser.add_argument("--release-rate", type=float, default=0.3, help="share of reservations released (reserve mode)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print(
+        f"{args.mode}: {results['operations_per_second']:.1f} ops/s  p50 {results['p50_ms']:.2f}  "
+        f"p95 {results['p95_ms']:.2f}  p99 {results['p99_ms']:.2f} ms"
+    )
+    for outcome, count in results["responses"].items():
+        print(f"  {outcome}: {count}")
+    print(f"  ledger: {results['ledger']}")
+    for violation in results["violations"]:
+        print("VIOLATION", violation)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if results["violations"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+"""Create the database schema (missing tables and indexes).
+
+Run once per deploy, before starting workers; the app itself never creates
+tables.
+
+Usage:
+    python -m scripts.init_db
+"""
+import argparse
+import sys
+
+from config.schema import create_schema
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args(argv)
+    create_schema()
+    print("Database schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Generate realistic synthetic inventory data in the configured database.
+
+Product popularity and supplier volume are skewed (a few hot SKUs get most
+deliveries), quantities and purchase prices vary around each product's
+price, and deliveries are spread over the last `--days` days. Rows are
+inserted in multi-row batches, then derived tables are rebuilt.
+
+Usage:
+    DATABASE_URL=sqlite:///./inventory.db python -m scripts.seed --products 100000 --entries 10000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from config.database import SessionLocal
+from config.schema import create_schema
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from models.stockEntry import StockEntry
+from models.productStockLevel import ProductStockLevel
+from models.productDailyMovement import ProductDailyMovement
+from services.ledger import rebuild_derived_tables
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(db, model, rows, batch_size, label):
+    started = time.perf_counter()
+    count = 0
+    for batch in _batches(rows, batch_size):
+        db.execute(insert(model), batch)
+        db.commit()
+        count += len(batch)
+        print(f"\r{label}: {count:,}", end="", flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"\r{label}: {count:,} in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def _next_id(db, model):
+    return (db.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _skewed_ids(rng, first_id, count, n, skew):
+    """Draw `n` ids in [first_id, first_id + count); higher `skew` concentrates draws on low ids."""
+    for _ in range(n):
+        yield first_id + int(count * rng.random() ** skew)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--suppliers", type=int, default=10_000)
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=730, help="spread deliveries over this many past days")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    create_schema()
+    db = SessionLocal()
+    try:
+        first_category = _next_id(db, Category)
+        _insert(db, Category, (
+            {"name": f"Category {first_category + i}", "description": f"Synthetic category {first_category + i}"}
+            for i in range(args.categories)
+        ), args.batch_size, "categories")
+
+        first_supplier = _next_id(db, Supplier)
+        _insert(db, Supplier, (
+            {
+                "name": f"Supplier {first_supplier + i}",
+                "phone": f"+1{5550000000 + first_supplier + i}",
+                "contact_info": f"orders@supplier{first_supplier + i}.example",
+            }
+            for i in range(args.suppliers)
+        ), args.batch_size, "suppliers")
+
+        first_product = _next_id(db, Product)
+        prices = [round(rng.lognormvariate(3, 1), 2) + 0.5 for _ in range(args.products)]
+        _insert(db, Product, (
+            {
+                "name": f"Product {first_product + i}",
+                "sku": f"SKU-{first_product + i:08d}",
+                "description": f"Synthetic product {first_product + i} " + "lorem ipsum " * rng.randint(0, 20),
+                "price": prices[i],
+                "category_id": first_category + rng.randrange(args.categories),
+            }
+            for i in range(args.products)
+        ), args.batch_size, "products")
+
+        now = datetime.utcnow()
+        horizon = args.days * 86400
+        product_ids = _skewed_ids(rng, first_product, args.products, args.entries, skew=3)
+        supplier_ids = _skewed_ids(rng, first_supplier, args.suppliers, args.entries, skew=2)
+        _insert(db, StockEntry, (
+            {
+                "product_id": product_id,
+                "supplier_id": supplier_id,
+                "quantity": max(1, int(rng.lognormvariate(3, 1))),
+                "unit_price": round(prices[product_id - first_product] * rng.uniform(0.4, 0.8), 2),
+                "date_added": now - timedelta(seconds=rng.randrange(horizon)),
+            }
+            for product_id, supplier_id in zip(product_ids, supplier_ids)
+        ), args.batch_size, "stock entries")
+
+        started = time.perf_counter()
+        rebuild_derived_tables(db)
+        db.commit()
+        print(f"derived tables rebuilt in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
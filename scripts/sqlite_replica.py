@@ -0,0 +1,50 @@
+"""Local stand-in for a read replica: keep a copy of a SQLite database file.
+
+Copies the primary file into the replica file with SQLite's online backup
+API, once or every `--interval` seconds. Between copies the replica lags
+behind the primary the way a real one does, which makes read-your-writes
+routing observable locally.
+
+Usage:
+    python -m scripts.sqlite_replica --primary inventory.db --replica inventory_replica.db --interval 2
+    python -m scripts.sqlite_replica --primary inventory.db --replica inventory_replica.db --once
+then serve with
+    DATABASE_URL=sqlite:///./inventory.db DATABASE_REPLICA_URLS=sqlite:///./inventory_replica.db uvicorn main:app
+"""
+import argparse
+import sqlite3
+import sys
+import time
+
+
+def copy_database(primary, replica):
+    """Copy the whole primary database into the replica file in one step."""
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica)
+    try:
+        # pages=-1 copies everything at once, so readers never see a half-copied replica
+        source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--primary", required=True, help="primary database file")
+    parser.add_argument("--replica", required=True, help="replica database file (created if missing)")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args(argv)
+
+    while True:
+        started = time.perf_counter()
+        copy_database(args.primary, args.replica)
+        print(f"copied {args.primary} -> {args.replica} in {time.perf_counter() - started:.2f}s", flush=True)
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Rebuild or verify the ledger-derived tables (product_stock_levels balances,
+product_daily_movements, supplier_product_stats and supplier_stats rollups)
+against the stock_entries ledger, plus the stock_issues and held
+stock_reservations behind the balances.
+
+Usage:
+    python -m scripts.stock_levels verify
+    python -m scripts.stock_levels rebuild
+"""
+import argparse
+import sys
+
+from config.database import SessionLocal
+from config.schema import create_schema
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from models.stockEntry import StockEntry
+from models.stockReservation import StockReservation
+from models.stockIssue import StockIssue
+from models.productStockLevel import ProductStockLevel
+from models.productDailyMovement import ProductDailyMovement
+from services.ledger import rebuild_derived_tables
+from services.movements import find_movement_drift
+from services.stockLevels import find_stock_level_drift
+from services.supplierStats import find_supplier_stat_drift
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    # Derived tables added since the database was created are created empty here
+    create_schema()
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            rebuild_derived_tables(db)
+            db.commit()
+            print("Stock levels, daily movements and supplier stats rebuilt from ledger")
+
+        drift = find_stock_level_drift(db)
+        for row in drift:
+            print(f"product {row['product_id']}: ledger (quantity, entries, reserved)={row['expected']} balance={row['actual']}")
+        print(f"{len(drift)} product(s) out of sync")
+
+        movement_drift = find_movement_drift(db)
+        for row in movement_drift:
+            print(
+                f"product {row['product_id']} on {row['day']}: "
+                f"ledger (quantity, spend, entries)={row['expected']} rollup={row['actual']}"
+            )
+        print(f"{len(movement_drift)} product-day(s) out of sync")
+
+        supplier_drift = find_supplier_stat_drift(db)
+        for row in supplier_drift:
+            if row["product_id"] is None:
+                print(f"supplier {row['supplier_id']}: ledger (products, quantity, spend, entries)={row['expected']} rollup={row['actual']}")
+            else:
+                print(
+                    f"supplier {row['supplier_id']} product {row['product_id']}: ledger (quantity, spend, entries, "
+                    f"price sum, min, max)={row['expected']} rollup={row['actual']}"
+                )
+        print(f"{len(supplier_drift)} supplier row(s) out of sync")
+        return 1 if drift or movement_drift or supplier_drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Value the inventory on hand (FIFO, weighted-average cost, retail) from the stock_entries ledger.
+
+Prints catalog totals and how long the pass took; `--csv` also writes one row per product.
+
+Usage:
+    python -m scripts.valuation
+    python -m scripts.valuation --csv valuation.csv
+"""
+import argparse
+import csv
+import sys
+import time
+
+from config.database import SessionLocal
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from models.stockEntry import StockEntry
+from models.productStockLevel import ProductStockLevel
+from services.valuation import value_inventory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="write per-product valuations to this file")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        valuation = value_inventory(db)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+
+    for name, value in valuation["totals"].items():
+        print(f"{name:<18} {value:>20,}")
+    print(f"valued in {elapsed:.2f}s")
+
+    if args.csv and valuation["products"]:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(valuation["products"][0]))
+            writer.writeheader()
+            writer.writerows(valuation["products"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
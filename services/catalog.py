@@ -0,0 +1,152 @@
+from fastapi import Depends
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.database import get_db
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from schemas.category import CategoryResponse
+from schemas.product import ProductResponse
+from schemas.supplier import SupplierResponse
+from utils.cache import cache
+from utils.fields import dump_sparse, project
+from utils.loading import select_for_response
+from utils.profiling import serializing
+
+# Cache namespace -> (model, response schema) of the catalog tables
+CATALOG = {
+    "category": (Category, CategoryResponse),
+    "product": (Product, ProductResponse),
+    "supplier": (Supplier, SupplierResponse),
+}
+# Catalog rows nested in a catalog response -> the column that references them
+CATALOG_NESTED = {"category": {}, "product": {"category": "category_id"}, "supplier": {}}
+
+
+async def get_cached(db, namespace, model, schema, id):
+    """Cached response body and ETag of one catalog row, loaded on a miss; None if it does not exist."""
+    # Read before the SELECT, so a namespace invalidated while it runs does not get the old row back
+    generation = cache.generation(namespace)
+    entry = cache.get(namespace, id)
+    if entry is not None:
+        return entry
+
+    # Likewise for an update or delete of this row
+    mark = cache.mark(namespace, id)
+    row = (await db.scalars(select_for_response(model, schema).where(model.id == id))).first()
+    if row is None:
+        return None
+    with serializing():
+        body = schema.model_validate(row).model_dump(mode="json")
+    return cache.set(namespace, id, body, generation=generation, mark=mark)
+
+
+async def get_cached_many(db, namespace, ids):
+    """Cached entries of the catalog rows `ids` as {id: entry}; every miss is loaded with one IN query.
+
+    Ids that do not exist are left out.
+    """
+    model, schema = CATALOG[namespace]
+    generation = cache.generation(namespace)
+    entries = cache.get_many(namespace, ids)
+    misses = [id for id in ids if id not in entries]
+    if misses:
+        marks = cache.marks(namespace, misses)
+        rows = await db.scalars(select_for_response(model, schema).where(model.id.in_(misses)))
+        for row in rows:
+            with serializing():
+                body = schema.model_validate(row).model_dump(mode="json")
+            entries[row.id] = cache.set(namespace, row.id, body, generation=generation, mark=marks[row.id])
+    return entries
+
+
+async def get_cached_category(db, id):
+    return await get_cached(db, "category", Category, CategoryResponse, id)
+
+
+async def get_cached_product(db, id):
+    return await get_cached(db, "product", Product, ProductResponse, id)
+
+
+async def get_cached_supplier(db, id):
+    return await get_cached(db, "supplier", Supplier, SupplierResponse, id)
+
+
+class CatalogLoader:
+    """Request-scoped loader of catalog rows.
+
+    Every id is resolved at most once per request, and ids asked for together
+    are resolved together: cache first, then one IN query for the misses.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._entries = {namespace: {} for namespace in CATALOG}  # id -> cache entry, or None if missing
+        self._exists = {namespace: {} for namespace in CATALOG}  # id -> bool, from existence-only checks
+
+    async def load_many(self, namespace, ids):
+        """{id: cache entry or None} for `ids`."""
+        loaded = self._entries[namespace]
+        pending = list(dict.fromkeys(id for id in ids if id not in loaded))
+        if pending:
+            found = await get_cached_many(self.db, namespace, pending)
+            for id in pending:
+                loaded[id] = found.get(id)
+        return {id: loaded[id] for id in ids}
+
+    async def load(self, namespace, id):
+        return (await self.load_many(namespace, [id]))[id]
+
+    def existing_ids(self, sync_db, namespace, ids):
+        """The subset of `ids` that exist, for sync code running under `run_sync`.
+
+        Only ids this request has not seen yet are queried, and only for their primary key.
+        """
+        model, _ = CATALOG[namespace]
+        loaded = self._entries[namespace]
+        exists = self._exists[namespace]
+        pending = [id for id in set(ids) if id not in loaded and id not in exists]
+        if pending:
+            found = set(sync_db.scalars(select(model.id).where(model.id.in_(pending))))
+            for id in pending:
+                exists[id] = id in found
+        return {id for id in ids if (loaded[id] is not None if id in loaded else exists[id])}
+
+
+async def load_batch(loader, namespace, ids, fields=None):
+    """Batch response body: the rows of `ids` in request order (None where missing) and the missing ids."""
+    found = await loader.load_many(namespace, ids)
+    return {
+        "items": [project(found[id]["body"], fields) if found[id] is not None else None for id in ids],
+        "missing": list(dict.fromkeys(id for id in ids if found[id] is None)),
+    }
+
+
+async def serialize_rows(loader, schema, nested, rows, fields=None):
+    """`schema` bodies of `rows` (only `fields` of them, if given).
+
+    `nested` maps response fields holding a catalog row to the column that
+    references it. Those rows come from the request's catalog `loader`, so each
+    distinct one is read from the cache or loaded once per request instead of
+    being joined into every row.
+    """
+    names = fields or tuple(schema.model_fields)
+    bodies = dump_sparse(schema, tuple(name for name in names if name not in nested), rows)
+    for name in (name for name in names if name in nested):
+        references = [getattr(row, nested[name]) for row in rows]
+        found = await loader.load_many(name, references)
+        for body, reference in zip(bodies, references):
+            body[name] = found[reference]["body"] if found[reference] is not None else None
+    return bodies
+
+
+async def serialize_written(loader, namespace, row):
+    """Response body of a catalog row returned by an INSERT or UPDATE ... RETURNING."""
+    _, schema = CATALOG[namespace]
+    return (await serialize_rows(loader, schema, CATALOG_NESTED[namespace], [row]))[0]
+
+
+def get_loader(db: AsyncSession = Depends(get_db)):
+    """Dependency: one CatalogLoader per request, shared by every dependant of the request."""
+    return CatalogLoader(db)
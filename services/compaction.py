@@ -0,0 +1,156 @@
+"""Ledger compaction: stock entries older than a horizon leave the live stock_entries table.
+
+Each batch is one short transaction over at most `batch_size` of the oldest
+entries: a single DELETE ... RETURNING takes them out of stock_entries, the
+returned rows go into stock_entries_archive unchanged, and their totals are
+added to the per-product/per-supplier stock_entry_snapshots. Only those
+rows (plus a few snapshot rows) are locked, and only until the batch
+commits; on PostgreSQL rows locked by a concurrent write are skipped and
+picked up by a later run.
+
+The balances (product_stock_levels) and daily rollups already count the
+archived entries and are not touched, so every total the API serves stays
+the same. Archived entries drop out of the stock entry listings and can no
+longer be updated or deleted. Undated legacy entries are never archived.
+"""
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, case, delete, insert, select, update
+
+from models.stockEntry import StockEntry
+from models.stockEntryArchive import StockEntryArchive
+from models.stockEntrySnapshot import StockEntrySnapshot
+from services.stockLevels import _dialect_insert
+
+entries = StockEntry.__table__
+snapshots = StockEntrySnapshot.__table__
+
+
+def compaction_horizon(days, now=None):
+    """Entries added before this moment are archived."""
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def snapshot_deltas(rows):
+    """{(product_id, supplier_id): (quantity, cost, entry_count, first_date, last_date)} of archived rows."""
+    deltas = {}
+    for row in rows:
+        key = (row.product_id, row.supplier_id)
+        quantity, cost, count, first, last = deltas.get(key, (0, 0.0, 0, row.date_added, row.date_added))
+        deltas[key] = (
+            quantity + row.quantity, cost + row.quantity * row.unit_price, count + 1,
+            min(first, row.date_added), max(last, row.date_added),
+        )
+    return deltas
+
+
+def apply_snapshot_deltas(db, deltas):
+    """Add archived totals to stock_entry_snapshots inside the caller's transaction."""
+    params = [
+        {
+            "p_product": product_id, "p_supplier": supplier_id, "p_quantity": quantity, "p_cost": cost,
+            "p_count": count, "p_first": first, "p_last": last,
+        }
+        for (product_id, supplier_id), (quantity, cost, count, first, last) in sorted(deltas.items())
+    ]
+    if not params:
+        return
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(snapshots).values(
+            product_id=bindparam("p_product"),
+            supplier_id=bindparam("p_supplier"),
+            quantity=bindparam("p_quantity"),
+            cost=bindparam("p_cost"),
+            entry_count=bindparam("p_count"),
+            first_date=bindparam("p_first"),
+            last_date=bindparam("p_last"),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[snapshots.c.product_id, snapshots.c.supplier_id],
+            set_={
+                "quantity": snapshots.c.quantity + stmt.excluded.quantity,
+                "cost": snapshots.c.cost + stmt.excluded.cost,
+                "entry_count": snapshots.c.entry_count + stmt.excluded.entry_count,
+                "first_date": case(
+                    (stmt.excluded.first_date < snapshots.c.first_date, stmt.excluded.first_date),
+                    else_=snapshots.c.first_date,
+                ),
+                "last_date": case(
+                    (stmt.excluded.last_date > snapshots.c.last_date, stmt.excluded.last_date),
+                    else_=snapshots.c.last_date,
+                ),
+            },
+        )
+        db.execute(stmt, params)
+        return
+
+    for row in params:
+        result = db.execute(
+            update(snapshots)
+            .where(snapshots.c.product_id == row["p_product"], snapshots.c.supplier_id == row["p_supplier"])
+            .values(
+                quantity=snapshots.c.quantity + row["p_quantity"],
+                cost=snapshots.c.cost + row["p_cost"],
+                entry_count=snapshots.c.entry_count + row["p_count"],
+                first_date=case((snapshots.c.first_date > row["p_first"], row["p_first"]), else_=snapshots.c.first_date),
+                last_date=case((snapshots.c.last_date < row["p_last"], row["p_last"]), else_=snapshots.c.last_date),
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(snapshots).values(
+                product_id=row["p_product"], supplier_id=row["p_supplier"], quantity=row["p_quantity"],
+                cost=row["p_cost"], entry_count=row["p_count"], first_date=row["p_first"], last_date=row["p_last"],
+            ))
+
+
+def compact_batch(db, horizon, batch_size):
+    """Archive up to `batch_size` of the oldest entries added before `horizon`. Caller commits.
+
+    Returns the number of entries archived (0 once nothing is left).
+    """
+    oldest = (
+        select(entries.c.id)
+        .where(entries.c.date_added < horizon)
+        .order_by(entries.c.date_added, entries.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(delete(entries).where(entries.c.id.in_(oldest)).returning(*entries.c)).all()
+    if not rows:
+        return 0
+    archived_at = datetime.utcnow()
+    db.execute(insert(StockEntryArchive), [{**row._mapping, "archived_at": archived_at} for row in rows])
+    apply_snapshot_deltas(db, snapshot_deltas(rows))
+    return len(rows)
+
+
+def compact_ledger(session_factory, horizon, batch_size=1000, pause=0.0, max_batches=None, progress=None):
+    """Archive every entry added before `horizon`, one committed batch at a time.
+
+    `pause` seconds between batches leave room for other writers; `progress(stats)`
+    is called after each batch. Returns {"batches", "archived", "seconds"}.
+    """
+    stats = {"batches": 0, "archived": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    while max_batches is None or stats["batches"] < max_batches:
+        with session_factory() as db:
+            try:
+                archived = compact_batch(db, horizon, batch_size)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        if not archived:
+            break
+        stats["batches"] += 1
+        stats["archived"] += archived
+        stats["seconds"] = time.perf_counter() - started
+        if progress is not None:
+            progress(stats)
+        if pause:
+            time.sleep(pause)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
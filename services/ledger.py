@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from services.movements import apply_movement_deltas, movement_deltas, rebuild_daily_movements
+from services.stockLevels import apply_stock_deltas, rebuild_stock_levels
+from services.supplierStats import apply_supplier_stat_changes, rebuild_supplier_stats
+
+# Stock entry fields the derived tables depend on
+LEDGER_FIELDS = ("product_id", "supplier_id", "quantity", "unit_price", "date_added")
+
+
+def _merge(target, deltas):
+    for key, values in deltas.items():
+        target[key] = tuple(a + b for a, b in zip(target[key], values))
+
+
+def stock_deltas(entries, sign=1):
+    """Balance deltas {product_id: (quantity, entry_count)} for stock entries (ORM objects, rows or dicts)."""
+    deltas = defaultdict(lambda: (0, 0))
+    for entry in entries:
+        product_id, quantity = (
+            (entry["product_id"], entry["quantity"]) if isinstance(entry, dict) else (entry.product_id, entry.quantity)
+        )
+        total, count = deltas[product_id]
+        deltas[product_id] = (total + sign * quantity, count + sign)
+    return deltas
+
+
+def apply_ledger_changes(db, added=(), removed=()):
+    """Keep every table derived from the stock_entries ledger in step with a write.
+
+    `added` and `removed` are stock entries (ORM objects, rows or dicts with
+    the LEDGER_FIELDS); an update is the old values removed plus the new
+    values added. Runs inside the caller's
+    transaction.
+
+    Returns how each touched balance moved, {product_id: ((quantity, entry_count)
+    before, (quantity, entry_count) after)}, for the change feed.
+    """
+    balances = stock_deltas(added)
+    _merge(balances, stock_deltas(removed, sign=-1))
+    written = apply_stock_deltas(db, balances)
+
+    movements = movement_deltas(added)
+    _merge(movements, movement_deltas(removed, sign=-1))
+    apply_movement_deltas(db, movements)
+
+    apply_supplier_stat_changes(db, added, removed)
+
+    return {
+        product_id: (tuple(after - delta for after, delta in zip(balance, balances[product_id])), balance)
+        for product_id, balance in written.items()
+    }
+
+
+def merge_level_changes(target, changes):
+    """Fold later balance changes of the same transaction into `target`: first before, last after."""
+    for product_id, (before, after) in changes.items():
+        target[product_id] = (target[product_id][0] if product_id in target else before, after)
+    return target
+
+
+def rebuild_derived_tables(db):
+    """Recompute every ledger-derived table from scratch. Caller commits."""
+    rebuild_stock_levels(db)
+    rebuild_daily_movements(db)
+    rebuild_supplier_stats(db)
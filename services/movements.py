@@ -0,0 +1,189 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, delete, func, insert, select, union_all, update
+
+from models.product import Product
+from models.productDailyMovement import ProductDailyMovement
+from models.stockEntry import StockEntry
+from models.stockEntryArchive import StockEntryArchive
+from services.stockLevels import _dialect_insert
+
+def apply_movement_deltas(db, deltas):
+    """Add {(product_id, day): (quantity, spend, entry_count)} to the daily rollup.
+
+    Runs inside the caller's transaction, like apply_stock_deltas.
+    """
+    params = [
+        {"p_id": product_id, "p_day": day, "p_quantity": quantity, "p_spend": spend, "p_count": count}
+        for (product_id, day), (quantity, spend, count) in sorted(deltas.items())  # stable lock order
+        if quantity or spend or count
+    ]
+    if not params:
+        return
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(ProductDailyMovement).values(
+            product_id=bindparam("p_id"),
+            day=bindparam("p_day"),
+            quantity=bindparam("p_quantity"),
+            spend=bindparam("p_spend"),
+            entry_count=bindparam("p_count"),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductDailyMovement.product_id, ProductDailyMovement.day],
+            set_={
+                "quantity": ProductDailyMovement.quantity + stmt.excluded.quantity,
+                "spend": ProductDailyMovement.spend + stmt.excluded.spend,
+                "entry_count": ProductDailyMovement.entry_count + stmt.excluded.entry_count,
+            },
+        )
+        db.execute(stmt, params)
+        return
+
+    for row in params:
+        result = db.execute(
+            update(ProductDailyMovement)
+            .where(ProductDailyMovement.product_id == row["p_id"], ProductDailyMovement.day == row["p_day"])
+            .values(
+                quantity=ProductDailyMovement.quantity + row["p_quantity"],
+                spend=ProductDailyMovement.spend + row["p_spend"],
+                entry_count=ProductDailyMovement.entry_count + row["p_count"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(ProductDailyMovement).values(
+                product_id=row["p_id"], day=row["p_day"],
+                quantity=row["p_quantity"], spend=row["p_spend"], entry_count=row["p_count"],
+            ))
+
+
+def movement_deltas(entries, sign=1):
+    """Rollup deltas for stock entries (ORM objects, rows or dicts) being added (sign=1) or removed (sign=-1)."""
+    deltas = defaultdict(lambda: (0, 0.0, 0))
+    for entry in entries:
+        if isinstance(entry, dict):
+            product_id, date_added = entry["product_id"], entry["date_added"]
+            quantity, unit_price = entry["quantity"], entry["unit_price"]
+        else:
+            product_id, date_added = entry.product_id, entry.date_added
+            quantity, unit_price = entry.quantity, entry.unit_price
+        if date_added is None:
+            continue  # Undated legacy entries cannot be placed on a day
+        key = (product_id, date_added.date())
+        total_quantity, spend, count = deltas[key]
+        deltas[key] = (total_quantity + sign * quantity, spend + sign * quantity * unit_price, count + sign)
+    return deltas
+
+
+# -- Rebuild / verification --
+
+def _ledger_days():
+    # Entries archived by ledger compaction still count on their days
+    ledger = union_all(*(
+        select(table.product_id, table.date_added, table.quantity, table.unit_price, table.id)
+        .where(table.date_added.isnot(None))
+        for table in (StockEntry, StockEntryArchive)
+    )).subquery()
+    day = func.date(ledger.c.date_added)
+    return select(
+        ledger.c.product_id,
+        day.label("day"),
+        func.sum(ledger.c.quantity).label("quantity"),
+        func.sum(ledger.c.quantity * ledger.c.unit_price).label("spend"),
+        func.count(ledger.c.id).label("entry_count"),
+    ).group_by(ledger.c.product_id, day)
+
+
+def _as_date(value):
+    # SQLite's date() returns text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rebuild_daily_movements(db):
+    """Recompute the whole daily rollup from the ledger. Caller commits."""
+    db.execute(delete(ProductDailyMovement))
+    db.execute(
+        insert(ProductDailyMovement).from_select(
+            ["product_id", "day", "quantity", "spend", "entry_count"], _ledger_days()
+        )
+    )
+
+
+def find_movement_drift(db, tolerance=0.01):
+    """Compare the daily rollup with the raw ledger; return the (product, day) rows that disagree."""
+    ledger = {
+        (row.product_id, _as_date(row.day)): (int(row.quantity), float(row.spend), row.entry_count)
+        for row in db.execute(_ledger_days())
+    }
+    rollup = {
+        (row.product_id, row.day): (row.quantity, row.spend, row.entry_count)
+        for row in db.scalars(select(ProductDailyMovement))
+    }
+
+    drift = []
+    for key in sorted(set(ledger) | set(rollup)):
+        expected = ledger.get(key, (0, 0.0, 0))
+        actual = rollup.get(key, (0, 0.0, 0))
+        if expected[0] != actual[0] or expected[2] != actual[2] or abs(expected[1] - actual[1]) > tolerance:
+            drift.append({"product_id": key[0], "day": key[1].isoformat(), "expected": expected, "actual": actual})
+    return drift
+
+
+# -- Queries --
+
+def bucket_start(day, bucket):
+    """First day of the day/week (ISO, Monday)/month bucket containing `day`."""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucketed(rows, bucket):
+    buckets = {}
+    for day, quantity, spend, count in rows:
+        start = bucket_start(_as_date(day), bucket)
+        total_quantity, total_spend, total_count = buckets.get(start, (0, 0.0, 0))
+        buckets[start] = (total_quantity + quantity, total_spend + spend, total_count + count)
+    return [
+        {"period_start": start, "quantity": int(quantity), "spend": round(spend, 2), "entry_count": count}
+        for start, (quantity, spend, count) in sorted(buckets.items())
+        if count
+    ]
+
+
+def _in_window(stmt, date_from, date_to):
+    if date_from is not None:
+        stmt = stmt.where(ProductDailyMovement.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(ProductDailyMovement.day < date_to)
+    return stmt
+
+
+def product_movements(db, product_id, bucket="day", date_from=None, date_to=None):
+    """Quantity and spend received for one product per bucket in [date_from, date_to)."""
+    stmt = select(
+        ProductDailyMovement.day,
+        ProductDailyMovement.quantity,
+        ProductDailyMovement.spend,
+        ProductDailyMovement.entry_count,
+    ).where(ProductDailyMovement.product_id == product_id).order_by(ProductDailyMovement.day)
+    return _bucketed(db.execute(_in_window(stmt, date_from, date_to)), bucket)
+
+
+def category_movements(db, category_id, bucket="day", date_from=None, date_to=None):
+    """Quantity and spend received for the products currently in a category, per bucket."""
+    stmt = select(
+        ProductDailyMovement.day,
+        func.sum(ProductDailyMovement.quantity),
+        func.sum(ProductDailyMovement.spend),
+        func.sum(ProductDailyMovement.entry_count),
+    ).join(
+        Product, Product.id == ProductDailyMovement.product_id
+    ).where(
+        Product.category_id == category_id
+    ).group_by(ProductDailyMovement.day).order_by(ProductDailyMovement.day)
+    return _bucketed(db.execute(_in_window(stmt, date_from, date_to)), bucket)
@@ -0,0 +1,166 @@
+"""Outbound stock: reservations and issues against the product_stock_levels balances.
+
+Every operation takes stock with a single conditional UPDATE of the
+product's balance row (`... WHERE quantity - reserved >= :n`), never a read
+followed by a write. Concurrent requests for the same product queue on that
+row only for the UPDATE and the commit: the database re-checks the condition
+against the latest committed balance (PostgreSQL re-evaluates it after the
+row lock is granted; SQLite runs one writer at a time), so stock can never
+be oversold. The ledger row (reservation or issue) is written first, so the
+balance row is the last thing the transaction touches before it commits.
+
+Stock entry updates and deletes lower the on-hand balance the other way;
+check_stock_covered keeps them from taking back units that are reserved or
+already issued.
+"""
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from models.product import Product
+from models.productStockLevel import ProductStockLevel
+from models.stockIssue import StockIssue
+from models.stockReservation import StockReservation, RESERVATION_HELD, RESERVATION_ISSUED, RESERVATION_RELEASED
+from utils.writes import insert_returning
+
+levels = ProductStockLevel.__table__
+reservations = StockReservation.__table__
+
+
+def outbound_rule_violation(quantity):
+    """Business rules for a reservation or issue; returns the error message or None."""
+    if quantity <= 0:
+        return "Quantity must be positive"
+    return None
+
+
+def get_availability(db, product_id):
+    """(on hand, reserved) units of a product; None if it does not exist."""
+    row = db.execute(
+        select(Product.id, ProductStockLevel.quantity, ProductStockLevel.reserved)
+        .outerjoin(ProductStockLevel, ProductStockLevel.product_id == Product.id)
+        .where(Product.id == product_id)
+    ).first()
+    if row is None:
+        return None
+    return row.quantity or 0, row.reserved or 0
+
+
+def _take(db, product_id, quantity, reserve):
+    """Move `quantity` available units into `reserved` (reserve) or out of stock (issue), if available.
+
+    Returns the balance as written, (quantity, entry_count).
+    """
+    values = {"reserved": levels.c.reserved + quantity} if reserve else {"quantity": levels.c.quantity - quantity}
+    balance = db.execute(
+        update(levels)
+        .where(levels.c.product_id == product_id, levels.c.quantity - levels.c.reserved >= quantity)
+        .values(**values)
+        .returning(levels.c.quantity, levels.c.entry_count)
+    ).first()
+    if balance is None:
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    return tuple(balance)
+
+
+def _require_product(db, product_id):
+    # Before the ledger row is written: where the foreign key is enforced, an
+    # unknown product would otherwise fail the INSERT instead of getting a 404
+    if db.scalar(select(Product.id).where(Product.id == product_id)) is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+
+def _close_reservation(db, reservation_id, status):
+    """Move a held reservation to `status`; returns the reservation row as it now is."""
+    reservation = db.execute(
+        update(reservations)
+        .where(reservations.c.id == reservation_id, reservations.c.status == RESERVATION_HELD)
+        .values(status=status)
+        .returning(*reservations.c)
+    ).first()
+    if reservation is not None:
+        return reservation
+    current = db.scalar(select(reservations.c.status).where(reservations.c.id == reservation_id))
+    if current is None:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    raise HTTPException(status_code=409, detail=f"Reservation is already {current}")
+
+
+def reserve_stock(db, product_id, quantity, reference=None):
+    """Hold `quantity` available units of a product; returns the reservation row. Caller commits."""
+    _require_product(db, product_id)
+    reservation = db.execute(insert_returning(StockReservation, {
+        "product_id": product_id, "quantity": quantity, "status": RESERVATION_HELD, "reference": reference,
+    })).one()
+    _take(db, product_id, quantity, reserve=True)
+    return reservation
+
+
+def release_reservation(db, reservation_id):
+    """Return a held reservation's units to the available stock; returns the reservation row. Caller commits."""
+    reservation = _close_reservation(db, reservation_id, RESERVATION_RELEASED)
+    db.execute(
+        update(levels)
+        .where(levels.c.product_id == reservation.product_id)
+        .values(reserved=levels.c.reserved - reservation.quantity)
+    )
+    return reservation
+
+
+def _issued(product_id, quantity, balance):
+    # Balance change of an issue, in the form apply_ledger_changes returns (for the change feed)
+    after = tuple(balance)
+    return {product_id: ((after[0] + quantity, after[1]), after)}
+
+
+def issue_reservation(db, reservation_id):
+    """Issue a held reservation's units; returns the issue row and the balance change. Caller commits.
+
+    The units were taken when they were reserved, so no availability check is needed.
+    """
+    reservation = _close_reservation(db, reservation_id, RESERVATION_ISSUED)
+    issue = db.execute(insert_returning(StockIssue, {
+        "product_id": reservation.product_id,
+        "quantity": reservation.quantity,
+        "reservation_id": reservation.id,
+        "reference": reservation.reference,
+    })).one()
+    balance = db.execute(
+        update(levels)
+        .where(levels.c.product_id == reservation.product_id)
+        .values(quantity=levels.c.quantity - reservation.quantity, reserved=levels.c.reserved - reservation.quantity)
+        .returning(levels.c.quantity, levels.c.entry_count)
+    ).one()
+    return issue, _issued(reservation.product_id, reservation.quantity, balance)
+
+
+def issue_stock(db, product_id, quantity, reference=None):
+    """Issue `quantity` available units of a product without a reservation.
+
+    Returns the issue row and the balance change. Caller commits.
+    """
+    _require_product(db, product_id)
+    issue = db.execute(insert_returning(StockIssue, {
+        "product_id": product_id, "quantity": quantity, "reference": reference,
+    })).one()
+    balance = _take(db, product_id, quantity, reserve=False)
+    return issue, _issued(product_id, quantity, balance)
+
+
+def check_stock_covered(db, changes):
+    """Raise 409 if a ledger change left a product with fewer units on hand than reserved.
+
+    `changes` is the balance change apply_ledger_changes returned; only
+    products whose on-hand quantity went down are checked. Runs in the
+    caller's transaction after the balances are written, so their rows are
+    locked and a concurrent reservation sees the lowered balance.
+    """
+    product_ids = [product_id for product_id, (before, after) in changes.items() if after[0] < before[0]]
+    if not product_ids:
+        return
+    short = db.scalar(
+        select(levels.c.product_id)
+        .where(levels.c.product_id.in_(product_ids), levels.c.quantity < levels.c.reserved)
+        .limit(1)
+    )
+    if short is not None:
+        raise HTTPException(status_code=409, detail=f"Insufficient stock: product {short} has units reserved or issued")
@@ -0,0 +1,173 @@
+"""Product search: exact SKU, SKU prefix, name substring and description full text.
+
+Each criterion is backed by an index, per backend:
+
+- PostgreSQL: a text_pattern_ops b-tree for SKU prefixes (LIKE 'abc%'), a
+  pg_trgm GIN index for case-insensitive name substrings (ILIKE '%abc%') and
+  a GIN index over to_tsvector(description) for full-text search.
+- SQLite: the SKU unique index answers prefixes as a range, and two FTS5
+  external-content tables, kept in sync by triggers, stand in for the
+  trigram and tsvector indexes.
+"""
+from sqlalchemy import and_, column, func, select, table, text
+
+from models.product import Product
+
+TEXT_SEARCH_CONFIG = "english"
+MIN_TRIGRAM_LENGTH = 3  # Shorter name fragments cannot use a trigram index
+
+POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_sku_pattern ON products (sku text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_products_description_tsv ON products "
+    f"USING gin (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')))",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_name_fts "
+    "USING fts5(name, content='products', content_rowid='id', tokenize='trigram')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_description_fts "
+    "USING fts5(description, content='products', content_rowid='id', tokenize='porter unicode61')",
+    """CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_name_fts(rowid, name) VALUES (new.id, new.name);
+        INSERT INTO products_description_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_name_fts(products_name_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO products_description_fts(products_description_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO products_name_fts(products_name_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO products_description_fts(products_description_fts, rowid, description)
+            VALUES ('delete', old.id, old.description);
+        INSERT INTO products_name_fts(rowid, name) VALUES (new.id, new.name);
+        INSERT INTO products_description_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+)
+
+products_name_fts = table("products_name_fts", column("rowid"), column("name"))
+products_description_fts = table("products_description_fts", column("rowid"), column("description"))
+
+
+def create_search_indexes(connection):
+    """Create the search indexes of the connection's backend if they are missing."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+    elif dialect == "sqlite":
+        existing = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE name = 'products_name_fts'")
+        ).scalar()
+        for statement in SQLITE_DDL:
+            connection.execute(text(statement))
+        if existing is None:
+            # Index the products that predate the FTS tables
+            rebuild_search_indexes(connection)
+
+
+def rebuild_search_indexes(connection):
+    """Re-index every product (SQLite FTS5 only; PostgreSQL indexes are maintained by the database)."""
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("INSERT INTO products_name_fts(products_name_fts) VALUES ('rebuild')"))
+        connection.execute(text("INSERT INTO products_description_fts(products_description_fts) VALUES ('rebuild')"))
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _prefix_upper_bound(prefix):
+    # Smallest string above every string starting with `prefix` (binary collation)
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _fts_match(fts, query):
+    return text(f"{fts.name} MATCH :{fts.name}_query").bindparams(**{f"{fts.name}_query": query})
+
+
+def _fts_phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _fts_text_matches(dialect, name, terms):
+    """(FTS table, MATCH clause) pairs of the text criteria SQLite can answer from its FTS5 tables."""
+    matches = []
+    if dialect == "sqlite" and name and len(name) >= MIN_TRIGRAM_LENGTH:
+        # A trigram phrase matches the fragment anywhere in the name, case-insensitively
+        matches.append((products_name_fts, _fts_match(products_name_fts, _fts_phrase(name))))
+    if dialect == "sqlite" and terms:
+        # Every term must occur, like plainto_tsquery; quoting keeps FTS5 syntax out of user input
+        query = " ".join(_fts_phrase(term) for term in terms)
+        matches.append((products_description_fts, _fts_match(products_description_fts, query)))
+    return matches
+
+
+def _filters(dialect, sku, sku_prefix, name, terms, category_id, min_price, max_price, name_indexed):
+    """WHERE clauses on products for every criterion that is not answered by an FTS5 table."""
+    filters = []
+    if sku is not None:
+        filters.append(Product.sku == sku)
+    if sku_prefix:
+        if dialect == "postgresql":
+            filters.append(Product.sku.like(_escape_like(sku_prefix) + "%", escape="\\"))
+        else:
+            filters.append(and_(Product.sku >= sku_prefix, Product.sku < _prefix_upper_bound(sku_prefix)))
+    if name:
+        if dialect == "postgresql":
+            filters.append(Product.name.ilike("%" + _escape_like(name) + "%", escape="\\"))
+        elif not name_indexed:
+            filters.append(func.lower(Product.name).contains(name.lower(), autoescape=True))
+    if terms and dialect == "postgresql":
+        document = func.to_tsvector(TEXT_SEARCH_CONFIG, func.coalesce(Product.description, ""))
+        filters.append(document.op("@@")(func.plainto_tsquery(TEXT_SEARCH_CONFIG, " ".join(terms))))
+    elif terms and dialect != "sqlite":
+        filters.extend(func.lower(Product.description).contains(term.lower(), autoescape=True) for term in terms)
+    if category_id is not None:
+        filters.append(Product.category_id == category_id)
+    if min_price is not None:
+        filters.append(Product.price >= min_price)
+    if max_price is not None:
+        filters.append(Product.price <= max_price)
+    return filters
+
+
+def search_product_ids(db, after_id=None, limit=10, sku=None, sku_prefix=None, name=None, q=None,
+                       category_id=None, min_price=None, max_price=None):
+    """One keyset page of matching product ids in id order, plus the id to continue after (or None).
+
+    Only ids are selected, so the page is found from the indexes alone and
+    the caller loads full rows for just those ids. On SQLite, when no SKU or
+    category narrows the search, the FTS5 match drives it: its rowids come in
+    id order, so the scan stops at the end of the page instead of collecting
+    every match first. Otherwise the narrowed rows are checked against the
+    description index one by one, and their names directly.
+    """
+    dialect = db.get_bind().dialect.name
+    terms = q.split() if q else []
+    matches = _fts_text_matches(dialect, name, terms)
+    drive = bool(matches) and sku is None and category_id is None
+    if not drive:
+        # Names are short, so checking them on the narrowed rows beats an FTS probe per row
+        matches = [(fts, match) for fts, match in matches if fts is not products_name_fts]
+    name_indexed = any(fts is products_name_fts for fts, _ in matches)
+    filters = _filters(dialect, sku, sku_prefix, name, terms, category_id, min_price, max_price, name_indexed)
+
+    if drive:
+        (fts, match), probes = matches[0], matches[1:]
+        key = fts.c.rowid
+        stmt = select(key).join(Product, Product.id == key).where(match)
+    else:
+        key, probes = Product.id, matches
+        stmt = select(key)
+    for fts, match in probes:
+        stmt = stmt.where(select(fts.c.rowid).where(match, fts.c.rowid == Product.id).exists())
+    if after_id is not None:
+        stmt = stmt.where(key > after_id)
+
+    ids = db.scalars(stmt.where(*filters).order_by(key).limit(limit + 1)).all()
+    if len(ids) > limit:
+        return ids[:limit], ids[limit - 1]
+    return ids, None
@@ -0,0 +1,281 @@
+import csv
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from config.database import open_session
+from config.settings import settings
+from models.stockEntry import StockEntry
+from schemas.stockEntry import StockEntryCreate, StockEntryResponse
+from services.catalog import serialize_rows
+from services.ledger import apply_ledger_changes, merge_level_changes
+from services.stockFeed import entry_event, level_events
+from utils import metrics
+from utils.changeFeed import change_feed
+from utils.groupCommit import GroupCommit
+from utils.loading import select_for_response
+from utils.writes import insert_returning
+
+BULK_CHUNK_SIZE = 1000
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+# Catalog rows nested in a stock entry response -> the column that references them
+NESTED_CATALOG = {"product": "product_id", "supplier": "supplier_id"}
+
+
+def stock_entry_rule_violation(stock_entry):
+    """Backend business rules for a new stock entry; returns the error message or None."""
+    if stock_entry.quantity <= 0:
+        return "Quantity must be positive"
+    if stock_entry.unit_price <= 0:
+        return "Unit price must be positive"
+    return None
+
+
+# -- Response serialization --
+
+def _split_fields(fields):
+    names = fields or tuple(StockEntryResponse.model_fields)
+    return tuple(name for name in names if name not in NESTED_CATALOG), [name for name in names if name in NESTED_CATALOG]
+
+
+def select_stock_entries(fields=None, include=()):
+    """SELECT the stock entry columns `fields` needs; nested products and suppliers are not joined."""
+    columns, nested = _split_fields(fields)
+    references = [getattr(StockEntry, NESTED_CATALOG[name]) for name in nested]
+    return select_for_response(StockEntry, StockEntryResponse, columns, include=[*include, *references])
+
+
+async def serialize_stock_entries(loader, entries, fields=None):
+    """StockEntryResponse bodies of `entries` (ORM objects or rows; only `fields` of them, if given).
+
+    Products and suppliers come from the request's catalog loader rather than
+    being joined into every row.
+    """
+    return await serialize_rows(loader, StockEntryResponse, NESTED_CATALOG, entries, fields)
+
+
+# -- Request body parsing --
+
+async def _iter_lines(request):
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode().rstrip("\r")
+    if buffer.strip():
+        yield buffer.decode().rstrip("\r")
+
+
+async def _iter_raw_rows(request):
+    """Yield (row_number, raw_row_or_error) pairs from a JSON, NDJSON or CSV body."""
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+
+    if content_type == "application/json":
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of stock entries")
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row
+
+    elif content_type in NDJSON_CONTENT_TYPES:
+        row_number = 0
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except ValueError:
+                yield row_number, ValueError("Invalid JSON line")
+
+    elif content_type == "text/csv":
+        header = None
+        row_number = 0
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row_number += 1
+            if len(values) != len(header):
+                yield row_number, ValueError("Column count does not match header")
+                continue
+            # Empty CSV cells mean "not provided"
+            yield row_number, {name: (value if value != "" else None) for name, value in zip(header, values)}
+
+    else:
+        raise HTTPException(status_code=415, detail="Unsupported content type")
+
+
+async def iter_bulk_chunks(request, chunk_size=BULK_CHUNK_SIZE):
+    """Group the parsed request rows into chunks of at most `chunk_size`."""
+    chunk = []
+    async for row in _iter_raw_rows(request):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -- Chunk ingestion --
+
+def _validation_message(error):
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def _insert_rows(db, rows):
+    values = [values for _, values in rows]
+    db.execute(insert(StockEntry), values)
+    return apply_ledger_changes(db, added=values)
+
+
+def ingest_stock_entry_chunk(db, chunk, loader):
+    """Validate and insert one chunk of bulk rows inside the caller's transaction.
+
+    Product and supplier ids are checked with one IN query each (ids already
+    seen by the request's catalog `loader` are not queried again), valid rows are
+    inserted with a single multi-row INSERT, and the stock balances and daily
+    rollups are updated once per product (and day). Returns (inserted rows as
+    dicts, errors, balance changes as from apply_ledger_changes).
+    """
+    errors = []
+    candidates = []
+    for row_number, raw in chunk:
+        if isinstance(raw, Exception):
+            errors.append({"row": row_number, "error": str(raw)})
+            continue
+        try:
+            stock_entry = StockEntryCreate.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"row": row_number, "error": _validation_message(e)})
+            continue
+        violation = stock_entry_rule_violation(stock_entry)
+        if violation:
+            errors.append({"row": row_number, "error": violation})
+            continue
+        candidates.append((row_number, stock_entry))
+
+    product_ids = {stock_entry.product_id for _, stock_entry in candidates}
+    supplier_ids = {stock_entry.supplier_id for _, stock_entry in candidates}
+    known_products = loader.existing_ids(db, "product", product_ids)
+    known_suppliers = loader.existing_ids(db, "supplier", supplier_ids)
+
+    rows = []
+    now = datetime.utcnow()
+    for row_number, stock_entry in candidates:
+        if stock_entry.product_id not in known_products:
+            errors.append({"row": row_number, "error": "Product not found"})
+        elif stock_entry.supplier_id not in known_suppliers:
+            errors.append({"row": row_number, "error": "Supplier not found"})
+        else:
+            values = stock_entry.model_dump()
+            values["date_added"] = values["date_added"] or now
+            rows.append((row_number, values))
+
+    if not rows:
+        return [], errors, {}
+
+    try:
+        with db.begin_nested():
+            levels = _insert_rows(db, rows)
+        return [values for _, values in rows], errors, levels
+    except SQLAlchemyError:
+        pass
+
+    # The multi-row insert failed (e.g. a row deleted concurrently); isolate the bad rows
+    inserted, levels = [], {}
+    for row in rows:
+        try:
+            with db.begin_nested():
+                changes = _insert_rows(db, [row])
+            merge_level_changes(levels, changes)
+            inserted.append(row[1])
+        except SQLAlchemyError:
+            errors.append({"row": row[0], "error": "Stock entry validation failed"})
+    return inserted, errors, levels
+
+
+# -- Group commit --
+
+def commit_stock_entry_group(db, group):
+    """Insert a group of validated stock entries in one transaction and commit it.
+
+    One INSERT ... RETURNING and one ledger update for the whole group (one
+    statement per product for the balances and daily rollups). The rows come
+    back in the group's order (sort_by_parameter_order), so each caller gets
+    its own row whatever the database did to the values it sent; SQLite can
+    not order a multi-row RETURNING and gets one INSERT per entry instead,
+    still in the group's single transaction and commit.
+    If that fails, each entry is retried in its own savepoint so only the
+    bad ones fail. Returns one result per entry, in order (the inserted row
+    or the HTTPException for that caller), and the group's balance changes.
+    Commits (or rolls back) in the same threadpool hop as the inserts.
+    """
+    table = StockEntry.__table__
+    try:
+        try:
+            rows = db.execute(insert(table).returning(*table.columns, sort_by_parameter_order=True), group).all()
+            levels = apply_ledger_changes(db, added=rows)
+            results = list(rows)
+        except SQLAlchemyError:
+            # The group is all the transaction holds, so a rollback undoes exactly the failed attempt
+            db.rollback()
+            results, levels = [], {}
+            for values in group:
+                try:
+                    with db.begin_nested():
+                        row = db.execute(insert_returning(StockEntry, values)).one()
+                        changes = apply_ledger_changes(db, added=[row])
+                    merge_level_changes(levels, changes)
+                    results.append(row)
+                except IntegrityError:
+                    results.append(HTTPException(status_code=409, detail="Stock entry validation failed"))
+                except SQLAlchemyError:
+                    results.append(HTTPException(status_code=500, detail="Server error"))
+        db.commit()
+        return results, levels
+    except BaseException:
+        db.rollback()
+        raise
+
+
+async def _commit_stock_entries(group):
+    async with open_session() as db:
+        results, levels = await db.run_sync(commit_stock_entry_group, group)
+    # One publish for the group: its entries, then the balances it moved (once per product)
+    await change_feed.publish(
+        *(entry_event("created", row) for row in results if not isinstance(row, BaseException)),
+        *level_events(levels),
+    )
+    return results
+
+
+stock_entry_commits = GroupCommit(
+    _commit_stock_entries, settings.group_commit_interval_ms / 1000, settings.group_commit_max_rows,
+)
+if settings.group_commit:
+    metrics.register("group_commit.stock_entries", stock_entry_commits.snapshot)
+
+
+async def add_stock_entry_grouped(values):
+    """Insert one validated stock entry through the group commit; returns its row."""
+    try:
+        return await stock_entry_commits.submit(values)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Server error")
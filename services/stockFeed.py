@@ -0,0 +1,130 @@
+"""Stock change feed: stock entry writes and low-stock transitions.
+
+Every committed stock entry create, update and delete is published as a
+`stock_entry.created`, `.updated` or `.deleted` event carrying the row (a
+bulk upload as one `stock_entry.bulk_created` summary per product and
+supplier), and every balance a write moved as a `stock_level` event.
+Subscribers follow either the stock entry events, optionally of one product
+and/or supplier, or the low-stock transitions at their own threshold.
+"""
+import json
+from collections import defaultdict
+
+from fastapi.encoders import jsonable_encoder
+
+from services.ledger import LEDGER_FIELDS
+
+ENTRY_EVENTS = frozenset({
+    "stock_entry.created", "stock_entry.updated", "stock_entry.deleted", "stock_entry.bulk_created",
+})
+LEVEL_EVENT = "stock_level"
+
+
+def _keys(product_ids, supplier_ids):
+    return [("product", id) for id in sorted(set(product_ids))] + [("supplier", id) for id in sorted(set(supplier_ids))]
+
+
+# -- Events --
+
+def entry_event(action, row, previous=None):
+    """Event for a written stock entry row; `previous` holds its old LEDGER_FIELDS when an update moved them."""
+    data = jsonable_encoder(dict(row._mapping))
+    product_ids, supplier_ids = [data["product_id"]], [data["supplier_id"]]
+    if previous is not None:
+        data["previous"] = jsonable_encoder({field: getattr(previous, field) for field in LEDGER_FIELDS})
+        # Moved to another product or supplier: the subscribers of both see it
+        product_ids.append(data["previous"]["product_id"])
+        supplier_ids.append(data["previous"]["supplier_id"])
+    return f"stock_entry.{action}", data, _keys(product_ids, supplier_ids)
+
+
+def count_bulk_rows(totals, rows):
+    """Add inserted bulk rows (dicts) to `totals`, {(product_id, supplier_id): [entries, quantity]}."""
+    for values in rows:
+        total = totals[values["product_id"], values["supplier_id"]]
+        total[0] += 1
+        total[1] += values["quantity"]
+    return totals
+
+
+def bulk_totals():
+    return defaultdict(lambda: [0, 0])
+
+
+def bulk_events(totals):
+    """One summary event per product and supplier of a bulk upload, instead of one per row."""
+    return [
+        (
+            "stock_entry.bulk_created",
+            {"product_id": product_id, "supplier_id": supplier_id, "entries": entries, "quantity": quantity},
+            _keys([product_id], [supplier_id]),
+        )
+        for (product_id, supplier_id), (entries, quantity) in sorted(totals.items())
+    ]
+
+
+def level_events(changes):
+    """Events for balance changes {product_id: ((quantity, entry_count) before, after)} (see apply_ledger_changes)."""
+    return [
+        (
+            LEVEL_EVENT,
+            {
+                "product_id": product_id,
+                "quantity": after[0],
+                "entry_count": after[1],
+                "previous_quantity": before[0],
+                "previous_entry_count": before[1],
+            },
+            _keys([product_id], []),
+        )
+        for product_id, (before, after) in sorted(changes.items())
+        if before != after
+    ]
+
+
+# -- Subscriptions: (filter key, render) pairs for ChangeFeed.stream --
+
+def entry_subscription(product_id=None, supplier_id=None):
+    """Stock entry events, of one product and/or supplier if given."""
+    def render(event):
+        if event.type not in ENTRY_EVENTS:
+            return None
+        if product_id is not None and ("product", product_id) not in event.keys:
+            return None
+        if supplier_id is not None and ("supplier", supplier_id) not in event.keys:
+            return None
+        return event.type, event.encoded()
+
+    if product_id is not None:
+        return ("product", product_id), render
+    if supplier_id is not None:
+        return ("supplier", supplier_id), render
+    return None, render
+
+
+def _is_low(quantity, entry_count, threshold):
+    # Same condition as GET /stock_entries/low-stock
+    return entry_count > 0 and quantity <= threshold
+
+
+def low_stock_subscription(threshold, product_id=None):
+    """`low_stock` when a product's balance drops to `threshold` or below, `low_stock_cleared` when it leaves."""
+    def render(event):
+        if event.type != LEVEL_EVENT:
+            return None
+        data = event.data
+        if product_id is not None and data["product_id"] != product_id:
+            return None
+        was_low = _is_low(data["previous_quantity"], data["previous_entry_count"], threshold)
+        is_low = _is_low(data["quantity"], data["entry_count"], threshold)
+        if was_low == is_low:
+            return None
+        return ("low_stock" if is_low else "low_stock_cleared"), json.dumps({
+            "product_id": data["product_id"],
+            "current_stock": data["quantity"],
+            "previous_stock": data["previous_quantity"],
+            "threshold": threshold,
+            "status": "LOW_STOCK" if is_low else "IN_STOCK",
+        })
+
+    return (("product", product_id) if product_id is not None else None), render
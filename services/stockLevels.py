@@ -0,0 +1,143 @@
+from sqlalchemy import bindparam, delete, func, insert, literal, select, union_all, update
+from models.productStockLevel import ProductStockLevel
+from models.stockEntry import StockEntry
+from models.stockEntrySnapshot import StockEntrySnapshot
+from models.stockIssue import StockIssue
+from models.stockReservation import StockReservation, RESERVATION_HELD
+
+
+def _dialect_insert(db):
+    """Return the dialect's INSERT construct if it supports ON CONFLICT upserts."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def apply_stock_deltas(db, deltas):
+    """Add {product_id: (quantity_delta, entry_count_delta)} to the balance table.
+
+    Runs inside the caller's transaction, so the balances commit or roll back
+    together with the stock entries that caused them. Returns the new
+    balances, {product_id: (quantity, entry_count)}, as this transaction wrote them.
+    """
+    params = [
+        {"p_id": product_id, "p_quantity": quantity, "p_count": count}
+        for product_id, (quantity, count) in sorted(deltas.items())  # stable lock order
+        if quantity or count
+    ]
+    if not params:
+        return {}
+    balance = (ProductStockLevel.product_id, ProductStockLevel.quantity, ProductStockLevel.entry_count)
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(ProductStockLevel).values(
+            product_id=bindparam("p_id"),
+            quantity=bindparam("p_quantity"),
+            entry_count=bindparam("p_count"),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductStockLevel.product_id],
+            set_={
+                "quantity": ProductStockLevel.quantity + stmt.excluded.quantity,
+                "entry_count": ProductStockLevel.entry_count + stmt.excluded.entry_count,
+            },
+        )
+        # The upsert returns the balances it wrote, so no second read is needed
+        return {row.product_id: (row.quantity, row.entry_count) for row in db.execute(stmt.returning(*balance), params)}
+
+    for row in params:
+        result = db.execute(
+            update(ProductStockLevel)
+            .where(ProductStockLevel.product_id == row["p_id"])
+            .values(
+                quantity=ProductStockLevel.quantity + row["p_quantity"],
+                entry_count=ProductStockLevel.entry_count + row["p_count"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(ProductStockLevel).values(
+                product_id=row["p_id"], quantity=row["p_quantity"], entry_count=row["p_count"],
+            ))
+    product_ids = [row["p_id"] for row in params]
+    return {
+        row.product_id: (row.quantity, row.entry_count)
+        for row in db.execute(select(*balance).where(ProductStockLevel.product_id.in_(product_ids)))
+    }
+
+
+def get_stock_level(db, product_id):
+    """Current stock balance of one product (0 if it has no stock entries)."""
+    return db.query(ProductStockLevel.quantity).filter(
+        ProductStockLevel.product_id == product_id
+    ).scalar() or 0
+
+
+def _ledger_totals():
+    """Per product: units on hand (received minus issued), stock entry count and units held by open reservations.
+
+    Entries archived by ledger compaction count through their snapshot totals.
+    """
+    # Each ledger is aggregated on its own (by index), then the few per-product rows are added up
+    per_ledger = union_all(
+        select(
+            StockEntry.product_id,
+            func.sum(StockEntry.quantity).label("quantity"),
+            func.count(StockEntry.id).label("entry_count"),
+            literal(0).label("reserved"),
+        ).group_by(StockEntry.product_id),
+        select(
+            StockEntrySnapshot.product_id, func.sum(StockEntrySnapshot.quantity),
+            func.sum(StockEntrySnapshot.entry_count), literal(0),
+        ).group_by(StockEntrySnapshot.product_id),
+        select(StockIssue.product_id, -func.sum(StockIssue.quantity), literal(0), literal(0)).group_by(
+            StockIssue.product_id
+        ),
+        select(StockReservation.product_id, literal(0), literal(0), func.sum(StockReservation.quantity)).where(
+            StockReservation.status == RESERVATION_HELD
+        ).group_by(StockReservation.product_id),
+    ).subquery()
+    return select(
+        per_ledger.c.product_id,
+        func.sum(per_ledger.c.quantity).label("quantity"),
+        func.sum(per_ledger.c.entry_count).label("entry_count"),
+        func.sum(per_ledger.c.reserved).label("reserved"),
+    ).group_by(per_ledger.c.product_id)
+
+
+def find_stock_level_drift(db):
+    """Compare the balance table with the raw ledgers; return the rows that disagree."""
+    ledger = {
+        row.product_id: (int(row.quantity), int(row.entry_count), int(row.reserved))
+        for row in db.execute(_ledger_totals())
+    }
+    balances = {
+        row.product_id: (row.quantity, row.entry_count, row.reserved)
+        for row in db.query(
+            ProductStockLevel.product_id, ProductStockLevel.quantity,
+            ProductStockLevel.entry_count, ProductStockLevel.reserved,
+        )
+    }
+
+    drift = []
+    for product_id in sorted(set(ledger) | set(balances)):
+        expected = ledger.get(product_id, (0, 0, 0))
+        actual = balances.get(product_id, (0, 0, 0))
+        if expected != actual:
+            drift.append({"product_id": product_id, "expected": expected, "actual": actual})
+    return drift
+
+
+def rebuild_stock_levels(db):
+    """Recompute every balance from the ledgers. Caller commits."""
+    db.execute(delete(ProductStockLevel))
+    db.execute(
+        insert(ProductStockLevel).from_select(
+            ["product_id", "quantity", "entry_count", "reserved"], _ledger_totals()
+        )
+    )
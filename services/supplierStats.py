@@ -0,0 +1,437 @@
+"""Supplier spend and unit price analytics from the supplier rollups.
+
+supplier_product_stats holds one row per supplier and product (stock
+received, spend, deliveries, sum/min/max of unit_price) and supplier_stats
+one row per supplier (its products, deliveries, quantity and spend). Both
+are kept in step with every stock entry write by apply_ledger_changes, so
+the analytics read a few rollup rows instead of aggregating the ledger.
+Price variance compares what was paid for a product with its current list
+price: spend - quantity * Product.price.
+
+Responses are cached per supplier (plus the supplier list pages) and only
+the suppliers a write touched are invalidated.
+"""
+from collections import defaultdict
+
+from sqlalchemy import and_, bindparam, case, delete, func, insert, or_, select, tuple_, union_all, update
+
+from models.product import Product
+from models.stockEntry import StockEntry
+from models.stockEntryArchive import StockEntryArchive
+from models.supplier import Supplier
+from models.supplierProductStat import SupplierProductStat
+from models.supplierStat import SupplierStat
+from services.stockLevels import _dialect_insert
+from utils.cache import cache
+from utils.pagination import encode_cursor
+
+STATS_NAMESPACE = "supplier_stats"  # Supplier list pages; one namespace per supplier below it
+
+stats = SupplierProductStat.__table__
+totals = SupplierStat.__table__
+
+
+def supplier_namespace(supplier_id):
+    return f"{STATS_NAMESPACE}:{supplier_id}"
+
+
+def invalidate_supplier_stats(supplier_ids):
+    """Drop the cached analytics of these suppliers (and the list pages, which show every supplier)."""
+    for supplier_id in set(supplier_ids):
+        cache.invalidate_namespace(supplier_namespace(supplier_id))
+    cache.invalidate_namespace(STATS_NAMESPACE)
+
+
+async def cached_stats(db, namespace, key, compute, *args):
+    """Cache entry of `compute(db, *args)` (run in the session's sync context) under `namespace`/`key`."""
+    entry = cache.get(namespace, key)
+    if entry is None:
+        generation = cache.generation(namespace)
+        entry = cache.set(namespace, key, await db.run_sync(compute, *args), generation=generation)
+    return entry
+
+
+# -- Maintenance (inside the caller's transaction, from apply_ledger_changes) --
+
+def _ledger_values(entry):
+    if isinstance(entry, dict):
+        return entry["supplier_id"], entry["product_id"], entry["quantity"], entry["unit_price"]
+    return entry.supplier_id, entry.product_id, entry.quantity, entry.unit_price
+
+
+def apply_supplier_stat_changes(db, added=(), removed=()):
+    """Add stock entries to, and remove them from, their supplier's rollup rows.
+
+    Sums move by the entries' values and added prices widen a pair's
+    min/max. Only a removed price on one of the pair's bounds (and not
+    brought back by an added entry) makes its bounds be re-read from the
+    ledger, live and archived entries.
+    """
+    pair_deltas = defaultdict(lambda: (0, 0.0, 0, 0.0))
+    bounds = {}
+    unmatched = defaultdict(lambda: defaultdict(int))  # Removed minus added entries per unit price
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            supplier_id, product_id, quantity, unit_price = _ledger_values(entry)
+            key = (supplier_id, product_id)
+            total_quantity, spend, count, price_sum = pair_deltas[key]
+            pair_deltas[key] = (
+                total_quantity + sign * quantity, spend + sign * quantity * unit_price,
+                count + sign, price_sum + sign * unit_price,
+            )
+            unmatched[key][unit_price] -= sign
+            if sign > 0:
+                low, high = bounds.get(key, (unit_price, unit_price))
+                bounds[key] = (min(low, unit_price), max(high, unit_price))
+
+    params = [
+        {
+            "p_supplier": supplier_id, "p_product": product_id, "p_quantity": quantity, "p_spend": spend,
+            "p_count": count, "p_price_sum": price_sum,
+            "p_min": bounds.get((supplier_id, product_id), (None, None))[0],
+            "p_max": bounds.get((supplier_id, product_id), (None, None))[1],
+        }
+        for (supplier_id, product_id), (quantity, spend, count, price_sum) in sorted(pair_deltas.items())  # stable lock order
+        if quantity or spend or count or price_sum
+    ]
+    if not params:
+        return
+    written = _upsert_pairs(db, params)
+
+    stale, emptied = [], []
+    for key, prices in sorted(unmatched.items()):
+        removed_prices = [price for price, count in prices.items() if count > 0]
+        if not removed_prices or key not in written:
+            continue
+        count, low, high = written[key]
+        if count == 0:
+            emptied.append(key)
+        elif low is None or any(price <= low or price >= high for price in removed_prices):
+            stale.append(key)
+    if stale or emptied:
+        _refresh_bounds(db, stale, emptied)
+
+    # A product counts for its supplier while the pair has entries
+    supplier_deltas = defaultdict(lambda: (0, 0, 0.0, 0))
+    for row in params:
+        count = written[row["p_supplier"], row["p_product"]][0]
+        products = (count > 0) - (count - row["p_count"] > 0)
+        delta = supplier_deltas[row["p_supplier"]]
+        supplier_deltas[row["p_supplier"]] = (
+            delta[0] + products, delta[1] + row["p_quantity"], delta[2] + row["p_spend"], delta[3] + row["p_count"],
+        )
+    _upsert_suppliers(db, supplier_deltas)
+
+
+def _upsert_pairs(db, params):
+    """Apply the pair deltas; returns {(supplier_id, product_id): (entry_count, min, max)} as written."""
+    written = (stats.c.supplier_id, stats.c.product_id, stats.c.entry_count, stats.c.min_unit_price, stats.c.max_unit_price)
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(stats).values(
+            supplier_id=bindparam("p_supplier"),
+            product_id=bindparam("p_product"),
+            quantity=bindparam("p_quantity"),
+            spend=bindparam("p_spend"),
+            entry_count=bindparam("p_count"),
+            price_sum=bindparam("p_price_sum"),
+            min_unit_price=bindparam("p_min"),
+            max_unit_price=bindparam("p_max"),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[stats.c.supplier_id, stats.c.product_id],
+            set_={
+                "quantity": stats.c.quantity + stmt.excluded.quantity,
+                "spend": stats.c.spend + stmt.excluded.spend,
+                "entry_count": stats.c.entry_count + stmt.excluded.entry_count,
+                "price_sum": stats.c.price_sum + stmt.excluded.price_sum,
+                "min_unit_price": case(
+                    (or_(stats.c.min_unit_price.is_(None), stmt.excluded.min_unit_price < stats.c.min_unit_price),
+                     stmt.excluded.min_unit_price),
+                    else_=stats.c.min_unit_price,
+                ),
+                "max_unit_price": case(
+                    (or_(stats.c.max_unit_price.is_(None), stmt.excluded.max_unit_price > stats.c.max_unit_price),
+                     stmt.excluded.max_unit_price),
+                    else_=stats.c.max_unit_price,
+                ),
+            },
+        )
+        # The rows as written show whether a removed price was on a bound and whether the pair emptied
+        return {(row[0], row[1]): tuple(row[2:]) for row in db.execute(stmt.returning(*written), params)}
+
+    for row in params:
+        values = {
+            "quantity": stats.c.quantity + row["p_quantity"],
+            "spend": stats.c.spend + row["p_spend"],
+            "entry_count": stats.c.entry_count + row["p_count"],
+            "price_sum": stats.c.price_sum + row["p_price_sum"],
+        }
+        if row["p_min"] is not None:
+            values["min_unit_price"] = case(
+                (or_(stats.c.min_unit_price.is_(None), stats.c.min_unit_price > row["p_min"]), row["p_min"]),
+                else_=stats.c.min_unit_price,
+            )
+            values["max_unit_price"] = case(
+                (or_(stats.c.max_unit_price.is_(None), stats.c.max_unit_price < row["p_max"]), row["p_max"]),
+                else_=stats.c.max_unit_price,
+            )
+        result = db.execute(
+            update(stats)
+            .where(stats.c.supplier_id == row["p_supplier"], stats.c.product_id == row["p_product"])
+            .values(**values)
+        )
+        if result.rowcount == 0:
+            db.execute(insert(stats).values(
+                supplier_id=row["p_supplier"], product_id=row["p_product"], quantity=row["p_quantity"],
+                spend=row["p_spend"], entry_count=row["p_count"], price_sum=row["p_price_sum"],
+                min_unit_price=row["p_min"], max_unit_price=row["p_max"],
+            ))
+    keys = [(row["p_supplier"], row["p_product"]) for row in params]
+    return {
+        (row[0], row[1]): tuple(row[2:])
+        for row in db.execute(select(*written).where(tuple_(stats.c.supplier_id, stats.c.product_id).in_(keys)))
+    }
+
+
+def _upsert_suppliers(db, deltas):
+    """Add {supplier_id: (products, quantity, spend, entry_count)} to supplier_stats."""
+    params = [
+        {"p_supplier": supplier_id, "p_products": products, "p_quantity": quantity, "p_spend": spend, "p_count": count}
+        for supplier_id, (products, quantity, spend, count) in sorted(deltas.items())  # stable lock order
+        if products or quantity or spend or count
+    ]
+    if not params:
+        return
+
+    dialect_insert = _dialect_insert(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(totals).values(
+            supplier_id=bindparam("p_supplier"),
+            products=bindparam("p_products"),
+            quantity=bindparam("p_quantity"),
+            spend=bindparam("p_spend"),
+            entry_count=bindparam("p_count"),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[totals.c.supplier_id],
+            set_={
+                "products": totals.c.products + stmt.excluded.products,
+                "quantity": totals.c.quantity + stmt.excluded.quantity,
+                "spend": totals.c.spend + stmt.excluded.spend,
+                "entry_count": totals.c.entry_count + stmt.excluded.entry_count,
+            },
+        )
+        db.execute(stmt, params)
+        return
+
+    for row in params:
+        result = db.execute(
+            update(totals)
+            .where(totals.c.supplier_id == row["p_supplier"])
+            .values(
+                products=totals.c.products + row["p_products"],
+                quantity=totals.c.quantity + row["p_quantity"],
+                spend=totals.c.spend + row["p_spend"],
+                entry_count=totals.c.entry_count + row["p_count"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(totals).values(
+                supplier_id=row["p_supplier"], products=row["p_products"], quantity=row["p_quantity"],
+                spend=row["p_spend"], entry_count=row["p_count"],
+            ))
+
+
+def _refresh_bounds(db, keys, emptied=()):
+    """Re-read min/max unit_price of these (supplier_id, product_id) pairs from the ledger; clear the emptied ones."""
+    found = dict.fromkeys(emptied, (None, None))
+    if keys:
+        found.update(_ledger_bounds(db, keys))
+    db.execute(
+        update(stats)
+        .where(stats.c.supplier_id == bindparam("p_supplier"), stats.c.product_id == bindparam("p_product"))
+        .values(min_unit_price=bindparam("p_min"), max_unit_price=bindparam("p_max")),
+        [
+            {"p_supplier": supplier_id, "p_product": product_id, "p_min": low, "p_max": high}
+            for (supplier_id, product_id), (low, high) in sorted(found.items())
+        ],
+    )
+
+
+def _ledger_bounds(db, keys):
+    """{(supplier_id, product_id): (min, max) unit_price} of these pairs' live and archived entries."""
+    ledger = union_all(*(
+        select(table.supplier_id, table.product_id, table.unit_price).where(or_(*(
+            and_(table.supplier_id == supplier_id, table.product_id == product_id) for supplier_id, product_id in keys
+        )))
+        for table in (StockEntry, StockEntryArchive)
+    )).subquery()
+    found = {
+        (row.supplier_id, row.product_id): (row.low, row.high)
+        for row in db.execute(
+            select(
+                ledger.c.supplier_id, ledger.c.product_id,
+                func.min(ledger.c.unit_price).label("low"), func.max(ledger.c.unit_price).label("high"),
+            ).group_by(ledger.c.supplier_id, ledger.c.product_id)
+        )
+    }
+    return {key: found.get(key, (None, None)) for key in keys}
+
+
+# -- Rebuild / verification --
+
+def _ledger_stats():
+    # Entries archived by ledger compaction still count
+    ledger = union_all(*(
+        select(table.supplier_id, table.product_id, table.quantity, table.unit_price, table.id)
+        for table in (StockEntry, StockEntryArchive)
+    )).subquery()
+    return select(
+        ledger.c.supplier_id,
+        ledger.c.product_id,
+        func.sum(ledger.c.quantity).label("quantity"),
+        func.sum(ledger.c.quantity * ledger.c.unit_price).label("spend"),
+        func.count(ledger.c.id).label("entry_count"),
+        func.sum(ledger.c.unit_price).label("price_sum"),
+        func.min(ledger.c.unit_price).label("min_unit_price"),
+        func.max(ledger.c.unit_price).label("max_unit_price"),
+    ).group_by(ledger.c.supplier_id, ledger.c.product_id)
+
+
+def rebuild_supplier_stats(db):
+    """Recompute both supplier rollups from the ledger. Caller commits."""
+    db.execute(delete(SupplierProductStat))
+    db.execute(delete(SupplierStat))
+    db.execute(
+        insert(SupplierProductStat).from_select(
+            ["supplier_id", "product_id", "quantity", "spend", "entry_count", "price_sum",
+             "min_unit_price", "max_unit_price"],
+            _ledger_stats(),
+        )
+    )
+    db.execute(
+        insert(SupplierStat).from_select(
+            ["supplier_id", "products", "quantity", "spend", "entry_count"],
+            select(
+                stats.c.supplier_id, func.count(stats.c.product_id), func.sum(stats.c.quantity),
+                func.sum(stats.c.spend), func.sum(stats.c.entry_count),
+            ).group_by(stats.c.supplier_id),
+        )
+    )
+
+
+def _differs(expected, actual, tolerance):
+    for a, b in zip(expected, actual):
+        if (a is None) != (b is None):
+            return True
+        if a is not None and (a != b if isinstance(a, int) else abs(a - b) > tolerance):
+            return True
+    return False
+
+
+def find_supplier_stat_drift(db, tolerance=0.01):
+    """Compare both supplier rollups with the raw ledger; return the rows that disagree.
+
+    Per supplier and product rows carry a product_id, per supplier totals a product_id of None.
+    """
+    columns = ("quantity", "spend", "entry_count", "price_sum", "min_unit_price", "max_unit_price")
+    ledger, ledger_totals = {}, defaultdict(lambda: (0, 0, 0.0, 0))
+    for row in db.execute(_ledger_stats()):
+        ledger[row.supplier_id, row.product_id] = tuple(getattr(row, column) for column in columns)
+        products, quantity, spend, count = ledger_totals[row.supplier_id]
+        ledger_totals[row.supplier_id] = (products + 1, quantity + row.quantity, spend + row.spend, count + row.entry_count)
+    rollup = {
+        (row.supplier_id, row.product_id): tuple(getattr(row, column) for column in columns)
+        for row in db.execute(select(stats)) if row.entry_count
+    }
+    rollup_totals = {
+        row.supplier_id: (row.products, row.quantity, row.spend, row.entry_count)
+        for row in db.execute(select(totals)) if row.entry_count
+    }
+
+    drift = []
+    empty = (0, 0.0, 0, 0.0, None, None)
+    for key in sorted(set(ledger) | set(rollup)):
+        expected, actual = ledger.get(key, empty), rollup.get(key, empty)
+        if _differs(expected, actual, tolerance):
+            drift.append({"supplier_id": key[0], "product_id": key[1], "expected": expected, "actual": actual})
+    empty = (0, 0, 0.0, 0)
+    for supplier_id in sorted(set(ledger_totals) | set(rollup_totals)):
+        expected, actual = ledger_totals.get(supplier_id, empty), rollup_totals.get(supplier_id, empty)
+        if _differs(expected, actual, tolerance):
+            drift.append({"supplier_id": supplier_id, "product_id": None, "expected": expected, "actual": actual})
+    return drift
+
+
+# -- Queries --
+
+def _select_suppliers():
+    return select(totals, Supplier.name.label("supplier_name")).join(
+        Supplier, Supplier.id == totals.c.supplier_id
+    ).where(totals.c.entry_count > 0)
+
+
+def _summary(row):
+    return {
+        "supplier_id": row.supplier_id,
+        "supplier_name": row.supplier_name,
+        "products": row.products,
+        "deliveries": row.entry_count,
+        "quantity": row.quantity,
+        "spend": round(row.spend, 2),
+    }
+
+
+def supplier_stats_page(db, after_id=None, limit=100):
+    """One page of supplier totals after `after_id`, in supplier id order: {"items", "next_cursor"}."""
+    stmt = _select_suppliers()
+    if after_id is not None:
+        stmt = stmt.where(totals.c.supplier_id > after_id)
+    rows = db.execute(stmt.order_by(totals.c.supplier_id).limit(limit + 1)).all()
+    items = [_summary(row) for row in rows[:limit]]
+    return {"items": items, "next_cursor": encode_cursor([items[-1]["supplier_id"]]) if len(rows) > limit else None}
+
+
+def supplier_stats(db, supplier_id):
+    """Totals of one supplier, or None if it has not delivered anything."""
+    row = db.execute(_select_suppliers().where(totals.c.supplier_id == supplier_id)).first()
+    return _summary(row) if row is not None else None
+
+
+def supplier_product_stats_page(db, supplier_id, after_id=None, limit=100):
+    """One page of a supplier's per-product unit prices and variance, in product id order."""
+    stmt = select(
+        stats, Product.name.label("product_name"), Product.price.label("price"),
+    ).join(
+        Product, Product.id == stats.c.product_id
+    ).where(
+        stats.c.supplier_id == supplier_id, stats.c.entry_count > 0
+    )
+    if after_id is not None:
+        stmt = stmt.where(stats.c.product_id > after_id)
+    rows = db.execute(stmt.order_by(stats.c.product_id).limit(limit + 1)).all()
+    items = []
+    for row in rows[:limit]:
+        list_value = row.quantity * row.price
+        variance = row.spend - list_value
+        items.append({
+            "product_id": row.product_id,
+            "product_name": row.product_name,
+            "price": row.price,
+            "deliveries": row.entry_count,
+            "quantity": row.quantity,
+            "spend": round(row.spend, 2),
+            "avg_unit_price": round(row.price_sum / row.entry_count, 2),
+            "min_unit_price": row.min_unit_price,
+            "max_unit_price": row.max_unit_price,
+            "list_value": round(list_value, 2),
+            "price_variance": round(variance, 2),
+            "price_variance_pct": round(variance / list_value * 100, 2) if list_value else None,
+        })
+    return {"items": items, "next_cursor": encode_cursor([items[-1]["product_id"]]) if len(rows) > limit else None}
+
+
+def product_supplier_ids(db, product_id):
+    """Suppliers that delivered a product (whose variance moves with its price)."""
+    return db.scalars(select(stats.c.supplier_id).where(stats.c.product_id == product_id)).all()
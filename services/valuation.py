@@ -0,0 +1,222 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func, select, union_all
+
+from config.database import SessionLocal
+from models.product import Product
+from models.productStockLevel import ProductStockLevel
+from models.productDailyMovement import ProductDailyMovement
+from models.stockEntry import StockEntry
+from models.stockEntryArchive import StockEntryArchive
+from models.stockEntrySnapshot import StockEntrySnapshot
+from utils.cache import cache
+
+VALUATION_BATCH_SIZE = 100_000
+LAYER_PRODUCT_BATCH = 500  # Products per IN (...) query when loading cost layers
+VALUATION_CACHE_TTL = 3600.0  # Ledger writes invalidate it; the TTL only bounds missed invalidations
+
+_compute_lock = threading.Lock()
+
+
+def _product_totals(db):
+    """Per-product received quantity and spend as aligned arrays sorted by product id.
+
+    Read from the daily rollup (about one row per product and day) rather than
+    aggregating the raw ledger; undated ledger rows, which the rollup leaves
+    out, are added from an index lookup.
+    """
+    rows = db.execute(
+        select(
+            ProductDailyMovement.product_id,
+            func.sum(ProductDailyMovement.quantity),
+            func.sum(ProductDailyMovement.spend),
+            func.sum(ProductDailyMovement.entry_count),
+        ).group_by(ProductDailyMovement.product_id)
+    ).all()
+    rows += db.execute(
+        select(
+            StockEntry.product_id,
+            func.sum(StockEntry.quantity),
+            func.sum(StockEntry.quantity * StockEntry.unit_price),
+            func.count(StockEntry.id),
+        ).where(StockEntry.date_added.is_(None)).group_by(StockEntry.product_id)
+    ).all()
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+
+    totals = np.array([tuple(row) for row in rows], dtype=np.float64)
+    ids, position = np.unique(totals[:, 0].astype(np.int64), return_inverse=True)
+    received = np.bincount(position, weights=totals[:, 1]).round().astype(np.int64)
+    spend = np.bincount(position, weights=totals[:, 2])
+    entries = np.bincount(position, weights=totals[:, 3])
+    # Products whose entries were all deleted leave zeroed rollup rows behind
+    keep = entries > 0
+    return ids[keep], received[keep], spend[keep]
+
+
+def _load_layers(db, product_ids, archived=False, batch_size=VALUATION_BATCH_SIZE):
+    """Load (product_id, quantity, unit_price) of the stock entries of `product_ids` into NumPy arrays.
+
+    Rows come grouped by product, newest first (a backward scan of the
+    product/date index), and are fetched `batch_size` at a time straight from
+    the DBAPI cursor as plain tuples, skipping per-row ORM/Row construction.
+    With `archived`, the entries moved to stock_entries_archive by ledger
+    compaction are merged in (sorted rather than read in index order).
+    """
+    layers = StockEntry.__table__
+    if archived:
+        layers = union_all(*(
+            select(table.product_id, table.quantity, table.unit_price, table.date_added, table.id)
+            .where(table.product_id.in_(product_ids))
+            for table in (StockEntry, StockEntryArchive)
+        )).subquery()
+    stmt = select(layers.c.product_id, layers.c.quantity, layers.c.unit_price).where(
+        layers.c.product_id.in_(product_ids)
+    ).order_by(
+        layers.c.product_id.desc(), layers.c.date_added.desc().nulls_last(), layers.c.id.desc()
+    )
+    connection = db.connection()
+    # Only integer ids are bound, so rendering them inline is safe and works with every DBAPI paramstyle
+    sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(sql)
+        chunks = []
+        while rows := cursor.fetchmany(batch_size):
+            chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+    if not chunks:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    layers = np.concatenate(chunks)
+    return layers[:, 0].astype(np.int64), layers[:, 1].astype(np.int64), layers[:, 2]
+
+
+def _fifo_values(db, product_ids, on_hand, archived):
+    """FIFO value of `on_hand` units for each product: its newest cost layers, oldest consumed first.
+
+    Layers of the `archived` products (with compacted entries) are also read
+    from the archive. A product without any layers is valued at 0.
+    """
+    values = np.zeros(len(product_ids), dtype=np.float64)
+    for offset in range(0, len(product_ids), LAYER_PRODUCT_BATCH):
+        batch = product_ids[offset:offset + LAYER_PRODUCT_BATCH]
+        in_archive = np.isin(batch, archived)
+        # Each product's layers stay contiguous, which is all the grouping below needs
+        loaded = [_load_layers(db, batch[in_archive].tolist(), archived=True)] if in_archive.any() else []
+        if not in_archive.all():
+            loaded.append(_load_layers(db, batch[~in_archive].tolist()))
+        layer_products, quantities, unit_prices = (np.concatenate(arrays) for arrays in zip(*loaded))
+        if not len(layer_products):
+            # Rollups that outlived their ledger rows: nothing left to value
+            continue
+
+        # Contiguous per-product groups, then the quantity in newer layers of the same product
+        starts = np.flatnonzero(np.r_[True, layer_products[1:] != layer_products[:-1]])
+        group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(layer_products)]))
+        before = np.cumsum(quantities) - quantities
+        newer = before - before[starts][group]
+
+        # How much of each layer is still on hand
+        position = np.searchsorted(product_ids, layer_products[starts])
+        remaining = np.clip(on_hand[position][group] - newer, 0, quantities)
+        values[position] = np.add.reduceat(remaining * unit_prices, starts)
+    return values
+
+
+def _lookup(db, key_column, value_column, keys, dtype):
+    """Values of `value_column` for sorted `keys` (0 where missing), aligned with `keys`."""
+    rows = db.execute(select(key_column, value_column)).all()
+    if not rows:
+        return np.zeros(len(keys), dtype=dtype)
+    found_keys = np.array([row[0] for row in rows], dtype=np.int64)
+    found_values = np.array([row[1] or 0 for row in rows], dtype=dtype)
+    order = np.argsort(found_keys)
+    found_keys, found_values = found_keys[order], found_values[order]
+    position = np.clip(np.searchsorted(found_keys, keys), 0, len(found_keys) - 1)
+    return np.where(found_keys[position] == keys, found_values[position], 0).astype(dtype)
+
+
+def value_inventory(db):
+    """Value the stock on hand of every product in one vectorized pass.
+
+    - Weighted-average cost (WAC): total spend / total quantity received.
+    - FIFO: the oldest layers are consumed first, so the quantity on hand
+      (from product_stock_levels) is valued at the newest layers' unit prices.
+      A product with everything still on hand is worth its total spend and
+      one with nothing on hand is worth 0, so cost layers are only loaded for
+      partly consumed products.
+    - Retail value and margin use the current Product.price.
+    """
+    ids, received, spend = _product_totals(db)
+    on_hand = np.clip(
+        _lookup(db, ProductStockLevel.product_id, ProductStockLevel.quantity, ids, np.int64), 0, received
+    )
+    prices = _lookup(db, Product.id, Product.price, ids, np.float64)
+
+    fifo_value = np.where(on_hand >= received, spend, 0.0)
+    partial = (on_hand > 0) & (on_hand < received)
+    if partial.any():
+        archived = np.array(db.scalars(select(StockEntrySnapshot.product_id).distinct()).all(), dtype=np.int64)
+        fifo_value[partial] = _fifo_values(db, ids[partial], on_hand[partial], archived)
+
+    wac_unit_cost = np.divide(spend, received, out=np.zeros_like(spend), where=received > 0)
+    fifo_unit_cost = np.divide(fifo_value, on_hand, out=np.zeros_like(fifo_value), where=on_hand > 0)
+    wac_value = on_hand * wac_unit_cost
+    retail_value = on_hand * prices
+    unit_margin = prices - wac_unit_cost
+    margin_pct = np.divide(unit_margin * 100, prices, out=np.zeros_like(prices), where=prices > 0)
+
+    columns = {
+        "product_id": ids,
+        "received_quantity": received,
+        "on_hand_quantity": on_hand,
+        "price": prices,
+        "wac_unit_cost": wac_unit_cost.round(4),
+        "wac_value": wac_value.round(2),
+        "fifo_unit_cost": fifo_unit_cost.round(4),
+        "fifo_value": fifo_value.round(2),
+        "retail_value": retail_value.round(2),
+        "unit_margin": unit_margin.round(4),
+        "margin_pct": margin_pct.round(2),
+    }
+    names = list(columns)
+    products = [dict(zip(names, row)) for row in zip(*(column.tolist() for column in columns.values()))]
+    return {"computed_at": datetime.utcnow().isoformat(), "totals": _totals(products), "products": products}
+
+
+def _totals(products):
+    totals = {
+        "products": len(products),
+        "on_hand_quantity": sum(p["on_hand_quantity"] for p in products),
+        "wac_value": round(sum(p["wac_value"] for p in products), 2),
+        "fifo_value": round(sum(p["fifo_value"] for p in products), 2),
+        "retail_value": round(sum(p["retail_value"] for p in products), 2),
+    }
+    totals["margin_value"] = round(totals["retail_value"] - totals["wac_value"], 2)
+    return totals
+
+
+def cached_valuation():
+    """The cached valuation entry (body + ETag), or None."""
+    return cache.get("valuation", "inventory")
+
+
+def compute_valuation():
+    """Compute and cache the valuation with its own session; meant to run in a worker thread.
+
+    One computation at a time: concurrent misses wait and reuse its result.
+    """
+    with _compute_lock:
+        entry = cached_valuation()
+        if entry is not None:
+            return entry
+        generation = cache.generation("valuation")
+        db = SessionLocal()
+        try:
+            body = value_inventory(db)
+        finally:
+            db.close()
+        return cache.set("valuation", "inventory", body, generation=generation, ttl=VALUATION_CACHE_TTL)
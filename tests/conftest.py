@@ -0,0 +1,156 @@
+"""Shared fixtures: the app against a throwaway SQLite database, in both database modes.
+
+Engines are created when config.database is imported, so DATABASE_URL has
+to point at the test database before anything from the app is imported.
+The `app` fixture is parametrized over DB_ASYNC: "sync" serves requests
+through SyncSessionAdapter (the threadpool), "async" through AsyncSession on
+aiosqlite. Every test starts from empty tables and an empty cache.
+"""
+import dataclasses
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="inventory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'primary.db')}"
+for _name in ("DATABASE_REPLICA_URLS", "DB_ASYNC", "GROUP_COMMIT", "CACHE_BACKEND", "CHANGE_FEED_BACKEND"):
+    os.environ.pop(_name, None)
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import config.database as database
+import config.replicas
+import main
+from config.replicas import ReplicaSelector
+from config.schema import create_schema
+from config.settings import settings
+from models.category import Category
+from models.product import Product
+from utils.cache import MemoryBackend, cache
+
+DB_MODES = ("sync", "async")
+
+
+@pytest.fixture(scope="session")
+def db_dir():
+    return _db_dir
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    create_schema()
+
+
+@pytest.fixture(scope="session")
+def async_engine():
+    # Created once; the app's lifespan disposes its connections after every client
+    return database._async_engine(database.db_url, "pool.async")
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Empty every table (the FTS triggers follow the product deletes) and the response cache."""
+    with database.engine.begin() as connection:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    cache.backend = MemoryBackend(settings.cache_max_entries)
+
+
+@pytest.fixture(params=DB_MODES)
+def db_mode(request, monkeypatch, async_engine):
+    if request.param == "async":
+        monkeypatch.setattr(database, "settings", dataclasses.replace(settings, db_async=True))
+        monkeypatch.setattr(database, "async_engine", async_engine)
+        monkeypatch.setattr(
+            database, "AsyncSessionLocal", async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        )
+    return request.param
+
+
+@pytest.fixture
+def app(db_mode):
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def statements(db_mode, async_engine):
+    """SQL statements run against the primary during the test, in order."""
+    target = async_engine.sync_engine if db_mode == "async" else database.engine
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(target, "before_cursor_execute", record)
+    yield executed
+    event.remove(target, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def catalog(client):
+    """A category, two products and two suppliers; returns their ids."""
+    category = client.post("/category/", json={"name": "Tools"}).json()["id"]
+    products = [
+        client.post("/product/", json={
+            "name": name, "sku": sku, "price": price, "category_id": category, "description": description,
+        }).json()["id"]
+        for name, sku, price, description in (
+            ("Hammer", "TL-001", 20.0, "Steel claw hammer"),
+            ("Screwdriver", "TL-002", 8.0, "Flat head screwdriver"),
+        )
+    ]
+    suppliers = [
+        client.post("/supplier/", json={"name": name, "phone": phone, "contact_info": "sales"}).json()["id"]
+        for name, phone in (("Acme", "+15550000001"), ("Globex", "+15550000002"))
+    ]
+    return {"category": category, "products": products, "suppliers": suppliers}
+
+
+@pytest.fixture
+def replica(db_mode, db_dir, monkeypatch, request):
+    """One replica in its own SQLite file, holding a single category and product ("Replica Hammer")."""
+    url = f"sqlite:///{os.path.join(db_dir, f'replica-{request.node.name}.db')}"
+    sync_engine = database._sync_engine(url, "pool.replica0.sync")
+    create_schema(sync_engine)
+    with sync_engine.begin() as connection:
+        connection.execute(insert(Category).values(id=1, name="Replicated"))
+        connection.execute(insert(Product).values(id=1, name="Replica Hammer", sku="R-1", price=1.0, category_id=1))
+
+    if db_mode == "async":
+        engine = database._async_engine(url, "pool.replica0.async")
+        factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    else:
+        engine = sync_engine
+        factory = sessionmaker(autoflush=False, autocommit=False, expire_on_commit=False, bind=engine)
+    selector = ReplicaSelector(1, "round_robin")
+    monkeypatch.setattr(
+        config.replicas, "settings", dataclasses.replace(settings, database_replica_urls=(url,), db_read_your_writes=5.0)
+    )
+    monkeypatch.setattr(config.replicas, "replicas", selector)
+    monkeypatch.setattr(database, "replicas", selector)
+    monkeypatch.setattr(database, "ReplicaSessionLocals", [factory])
+    # Disposed by the app's lifespan, like the configured replicas
+    monkeypatch.setattr(database, "replica_engines", [engine])
+    yield selector
+    sync_engine.dispose()
+
+
+def add_entries(client, product_id, supplier_id, count, quantity=1, unit_price=2.5):
+    """POST `count` stock entries; returns their ids."""
+    ids = []
+    for _ in range(count):
+        response = client.post("/stock_entries/", json={
+            "product_id": product_id, "supplier_id": supplier_id, "quantity": quantity, "unit_price": unit_price,
+        })
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
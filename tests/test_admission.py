@@ -0,0 +1,110 @@
+"""Admission control: bounded lanes, bounded queues, load shedding and the reserved slots."""
+import asyncio
+import dataclasses
+
+import pytest
+
+import utils.admission
+from config.settings import settings
+from routes.product import lookups
+from utils.admission import AdmissionController, AdmissionLane, Overloaded, HIGH, LOW, NORMAL
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    """A controller of its own with 3 slots, 1 of them reserved, and Retry-After: 7."""
+    monkeypatch.setattr(utils.admission, "settings", dataclasses.replace(
+        settings, admission_control=True, admission_max_concurrency=3, admission_reserved=1, admission_retry_after=7,
+    ))
+    controller = AdmissionController()
+    monkeypatch.setattr(utils.admission, "admission", controller)
+    return controller
+
+
+async def _waiting(controller, lane):
+    """Start acquiring a slot in `lane` and return the task once it is queued."""
+    task = asyncio.ensure_future(controller.acquire(lane))
+    await asyncio.sleep(0)
+    assert not task.done()
+    return task
+
+
+def test_full_queue_is_shed(admission):
+    lane = AdmissionLane("scans", limit=1, queue=1, timeout=5.0, priority=LOW)
+
+    async def run():
+        await admission.acquire(lane)
+        queued = await _waiting(admission, lane)
+        with pytest.raises(Overloaded) as shed:
+            await admission.acquire(lane)
+        admission.release(lane)
+        await queued
+        return shed.value
+
+    shed = asyncio.run(run())
+    assert (shed.status_code, shed.headers["Retry-After"]) == (503, "7")
+    assert (lane.active, lane.queued, lane.admitted, lane.shed_queue_full) == (1, 0, 2, 1)
+
+
+def test_queue_wait_times_out(admission):
+    lane = AdmissionLane("scans", limit=1, queue=4, timeout=0.05)
+
+    async def run():
+        await admission.acquire(lane)
+        with pytest.raises(Overloaded):
+            await admission.acquire(lane)
+
+    asyncio.run(run())
+    assert (lane.active, lane.queued, lane.shed_timeout) == (1, 0, 1)
+    assert admission.snapshot()["queued"] == 0
+
+
+def test_reserved_slots_admit_high_lanes(admission):
+    writes = AdmissionLane("writes", limit=10, queue=4, timeout=5.0, priority=NORMAL)
+    reads = AdmissionLane("reads", limit=10, queue=4, timeout=5.0, priority=HIGH)
+
+    async def run():
+        await admission.acquire(writes)
+        await admission.acquire(writes)
+        # The last slot is reserved: a write waits, a read gets in
+        queued_write = await _waiting(admission, writes)
+        await admission.acquire(reads)
+        assert admission.active == 3
+
+        # A freed slot goes to a waiting read before the older waiting write
+        queued_read = await _waiting(admission, reads)
+        admission.release(writes)
+        await queued_read
+        assert not queued_write.done()
+        admission.release(reads)
+        admission.release(reads)
+        await queued_write
+
+    asyncio.run(run())
+    assert (writes.admitted, reads.admitted) == (3, 2)
+
+
+def test_disabled_admission_control_admits_everything(admission, monkeypatch):
+    monkeypatch.setattr(utils.admission, "settings", dataclasses.replace(settings, admission_control=False))
+    lane = AdmissionLane("scans", limit=1, queue=0)
+
+    async def run():
+        for _ in range(3):
+            await anext(lane.__call__())
+
+    asyncio.run(run())
+    assert lane.admitted == lane.active == 0
+
+
+def test_full_lane_returns_503(client, catalog, monkeypatch):
+    product_id = catalog["products"][0]
+    assert client.get(f"/product/{product_id}").status_code == 200
+
+    # Every slot of the lookup lane taken, and no room to queue
+    monkeypatch.setattr(lookups, "active", lookups.limit)
+    monkeypatch.setattr(lookups, "queue", 0)
+    response = client.get(f"/product/{product_id}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.admission_retry_after)
+    # Other lanes are unaffected
+    assert client.get("/product/").status_code == 200
@@ -0,0 +1,103 @@
+"""Catalog batch lookups: the request-scoped CatalogLoader and the /batch routes."""
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+import config.database as database
+from models.category import Category
+from models.product import Product
+from models.supplier import Supplier
+from services.catalog import CatalogLoader
+from utils.batch import MAX_BATCH_SIZE
+
+
+def _selects(statements, table):
+    return [
+        statement for statement in statements
+        if statement.lstrip().startswith("SELECT") and f"FROM {table}" in statement
+    ]
+
+
+@pytest.fixture
+def rows():
+    """Catalog rows written straight to the database, so no client (and no event loop) is involved."""
+    with database.engine.begin() as connection:
+        connection.execute(insert(Category).values(id=1, name="Tools"))
+        connection.execute(insert(Product), [
+            {"id": 1, "name": "Hammer", "sku": "TL-001", "price": 20.0, "category_id": 1},
+            {"id": 2, "name": "Screwdriver", "sku": "TL-002", "price": 8.0, "category_id": 1},
+        ])
+        connection.execute(insert(Supplier).values(id=1, name="Acme", phone="+15550000001", contact_info="sales"))
+
+
+def test_loader_resolves_each_id_once(db_mode, async_engine, statements, rows):
+    async def load():
+        async with database.open_session() as db:
+            loader = CatalogLoader(db)
+            first = await loader.load_many("product", [2, 1, 99, 2])
+            queries = len(statements)
+            again = await loader.load_many("product", [1, 99])
+            single = await loader.load("product", 2)
+            cached = len(statements) - queries
+            existing = await db.run_sync(loader.existing_ids, "supplier", [1, 99, 1])
+            known = await db.run_sync(loader.existing_ids, "product", [1, 99])
+        # Its connections belong to this event loop
+        await async_engine.dispose()
+        return first, again, single, cached, existing, known
+
+    statements.clear()
+    first, again, single, cached, existing, known = asyncio.run(load())
+    assert list(first) == [2, 1, 99]
+    assert first[1]["body"]["name"] == "Hammer" and first[2]["body"]["category"]["name"] == "Tools"
+    assert first[99] is None
+    # One IN query for the three distinct ids, nothing for ids the request already resolved
+    (query,) = _selects(statements, "products")
+    assert " IN " in query
+    assert again == {1: first[1], 99: None} and single is first[2]
+    assert cached == 0
+    assert existing == {1}
+    # Already loaded rows (and missing ids) are not checked again
+    assert known == {1}
+    assert len(_selects(statements, "suppliers")) == 1
+    assert len(_selects(statements, "products")) == 1
+
+
+def test_product_batch(client, catalog, statements):
+    hammer, screwdriver = catalog["products"]
+    statements.clear()
+    response = client.get("/product/batch", params={"ids": f"{screwdriver},999999,{hammer},{screwdriver}"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["name"] if item else None for item in body["items"]] == ["Screwdriver", None, "Hammer", "Screwdriver"]
+    assert body["items"][0]["category"]["name"] == "Tools"
+    assert body["missing"] == [999999]
+    assert len(_selects(statements, "products")) == 1
+
+    # Served from the cache the first request filled
+    statements.clear()
+    assert client.get("/product/batch", params={"ids": f"{hammer},{screwdriver}"}).json()["missing"] == []
+    assert _selects(statements, "products") == []
+
+    projected = client.get("/product/batch", params={"ids": f"{hammer},999999", "fields": "sku"}).json()
+    assert projected == {"items": [{"sku": "TL-001"}, None], "missing": [999999]}
+
+
+@pytest.mark.parametrize("namespace, name", [("category", "Tools"), ("supplier", "Acme")])
+def test_category_and_supplier_batch(client, catalog, statements, namespace, name):
+    id_ = catalog[namespace] if namespace == "category" else catalog["suppliers"][0]
+    statements.clear()
+    body = client.get(f"/{namespace}/batch", params={"ids": f"{id_},0,{id_}"}).json()
+    assert [item["name"] if item else None for item in body["items"]] == [name, None, name]
+    assert body["missing"] == [0]
+    table = "categories" if namespace == "category" else "suppliers"
+    assert len(_selects(statements, table)) == 1
+
+
+def test_batch_ids_are_validated(client, catalog):
+    assert client.get("/product/batch", params={"ids": ",".join(["1"] * MAX_BATCH_SIZE)}).status_code == 200
+    too_many = client.get("/product/batch", params={"ids": ",".join(["1"] * (MAX_BATCH_SIZE + 1))})
+    assert (too_many.status_code, too_many.json()["detail"]) == (400, f"At most {MAX_BATCH_SIZE} ids per batch")
+    assert client.get("/product/batch", params={"ids": "1,two"}).status_code == 400
+    assert client.get("/product/batch", params={"ids": " , "}).status_code == 400
+    assert client.get("/product/batch").status_code == 422
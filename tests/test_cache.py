@@ -0,0 +1,91 @@
+"""Catalog cache: a namespace or row invalidated while a miss is being loaded does not get the old row back."""
+import pytest
+from sqlalchemy import event
+
+import config.database as database
+from conftest import add_entries
+from utils.cache import Cache, MemoryBackend, cache
+
+
+def _listen_for_product_select(db_mode, async_engine, invalidate):
+    """Run `invalidate()` as the next product SELECT runs; yields the statements it fired on."""
+    target = async_engine.sync_engine if db_mode == "async" else database.engine
+    fired = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if not fired and statement.lstrip().startswith("SELECT products."):
+            fired.append(statement)
+            invalidate()
+
+    event.listen(target, "before_cursor_execute", listener)
+    yield fired
+    event.remove(target, "before_cursor_execute", listener)
+
+
+@pytest.fixture
+def invalidate_during_select(db_mode, async_engine):
+    """Invalidate the product namespace as the next product SELECT runs, like a concurrent category update."""
+    yield from _listen_for_product_select(db_mode, async_engine, lambda: cache.invalidate_namespace("product"))
+
+
+@pytest.fixture
+def update_during_select(db_mode, async_engine, catalog):
+    """Invalidate the first product as the next product SELECT runs, like a concurrent PUT or DELETE of it."""
+    product_id = catalog["products"][0]
+    yield from _listen_for_product_select(db_mode, async_engine, lambda: cache.invalidate("product", product_id))
+
+
+def test_product_lookup_keeps_invalidation(client, catalog, invalidate_during_select):
+    product_id = catalog["products"][0]
+    cache.invalidate_namespace("product")
+    assert client.get(f"/product/{product_id}").json()["name"] == "Hammer"
+    assert invalidate_during_select
+    assert cache.get("product", product_id) is None
+
+
+def test_nested_product_load_keeps_invalidation(client, catalog, invalidate_during_select):
+    product_id = catalog["products"][0]
+    entry_id = add_entries(client, product_id, catalog["suppliers"][0], 1)[0]
+    cache.invalidate_namespace("product")
+    invalidate_during_select.clear()
+    assert client.get(f"/stock_entries/{entry_id}").json()["product"]["name"] == "Hammer"
+    assert invalidate_during_select
+    assert cache.get("product", product_id) is None
+
+
+def test_product_lookup_fills_the_cache(client, catalog):
+    product_id = catalog["products"][0]
+    cache.invalidate_namespace("product")
+    body = client.get(f"/product/{product_id}").json()
+    assert cache.get("product", product_id)["body"] == body
+
+
+def test_product_lookup_keeps_row_invalidation(client, catalog, update_during_select):
+    product_id = catalog["products"][0]
+    cache.invalidate_namespace("product")
+    assert client.get(f"/product/{product_id}").json()["name"] == "Hammer"
+    assert update_during_select
+    assert cache.get("product", product_id) is None
+    # Loads that start after the update cache again
+    client.get(f"/product/{product_id}")
+    assert cache.get("product", product_id) is not None
+
+
+def test_batch_load_keeps_row_invalidation(client, catalog, update_during_select):
+    hammer, screwdriver = catalog["products"]
+    cache.invalidate_namespace("product")
+    response = client.get("/product/batch", params={"ids": f"{hammer},{screwdriver}"})
+    assert [item["name"] for item in response.json()["items"]] == ["Hammer", "Screwdriver"]
+    assert update_during_select
+    assert cache.get("product", hammer) is None
+    assert cache.get("product", screwdriver) is not None
+
+
+def test_invalidate_between_mark_and_set():
+    local = Cache(MemoryBackend())
+    mark = local.mark("product", 1)
+    local.invalidate("product", 1)
+    local.set("product", 1, {"name": "old"}, mark=mark)
+    assert local.get("product", 1) is None
+    local.set("product", 1, {"name": "new"}, mark=local.mark("product", 1))
+    assert local.get("product", 1)["body"] == {"name": "new"}
@@ -0,0 +1,78 @@
+"""Change feed streams: subscribers are registered by the stream itself, and always unregistered."""
+import asyncio
+
+from services.stockFeed import entry_subscription
+from utils.changeFeed import ChangeFeed, MemoryBroker, change_feed
+
+
+def _feed(**options):
+    return ChangeFeed(MemoryBroker(), heartbeat=5.0, **options)
+
+
+def _event(product_id):
+    return "stock_entry.created", {"product_id": product_id}, [("product", product_id)]
+
+
+def test_unsent_stream_registers_nothing():
+    feed = _feed()
+
+    async def run():
+        stream = feed.stream(*entry_subscription())
+        assert feed.subscribers == 0
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert feed.subscribers == 0
+
+
+def test_stream_delivers_and_unsubscribes():
+    feed = _feed()
+
+    async def run():
+        stream = feed.stream(*entry_subscription(product_id=1))
+        assert await anext(stream) == "retry: 3000\n\n"
+        assert feed.subscribers == 1
+        await feed.publish(_event(2), _event(1))
+        message = await anext(stream)
+        await stream.aclose()
+        return message
+
+    message = asyncio.run(run())
+    assert message.splitlines()[1:3] == ["event: stock_entry.created", 'data: {"product_id":1}']
+    assert feed.subscribers == 0
+
+
+def test_stream_resumes_after_last_event_id():
+    feed = _feed()
+
+    async def run():
+        await feed.publish(_event(1), _event(2), _event(3))
+        first = (await feed.broker.since(f"{feed.broker.epoch}-0"))[0].id
+        stream = feed.stream(*entry_subscription(), last_event_id=first)
+        await anext(stream)
+        messages = [await anext(stream), await anext(stream)]
+        await stream.aclose()
+        return messages
+
+    messages = asyncio.run(run())
+    assert [message.splitlines()[2] for message in messages] == ['data: {"product_id":2}', 'data: {"product_id":3}']
+
+
+def test_stream_of_a_full_worker_ends():
+    feed = _feed(max_subscribers=1)
+
+    async def run():
+        first = feed.stream(*entry_subscription())
+        await anext(first)
+        second = [message async for message in feed.stream(*entry_subscription())]
+        await first.aclose()
+        return second
+
+    assert asyncio.run(run()) == ["retry: 3000\n\n"]
+    assert feed.subscribers == 0
+
+
+def test_full_worker_is_503(client, monkeypatch):
+    monkeypatch.setattr(change_feed, "max_subscribers", 0)
+    assert client.get("/stock_entries/feed").status_code == 503
+    assert change_feed.subscribers == 0
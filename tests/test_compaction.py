@@ -0,0 +1,142 @@
+"""Ledger compaction: archived entries keep their ids for good, and every derived total stays the same."""
+import os
+from datetime import datetime
+
+from sqlalchemy import insert, select, text
+
+import config.database as database
+from config.schema import create_schema
+from config.settings import settings
+from models.productDailyMovement import ProductDailyMovement
+from models.productStockLevel import ProductStockLevel
+from models.stockEntryArchive import StockEntryArchive
+from models.supplierProductStat import SupplierProductStat
+from models.supplierStat import SupplierStat
+from services.compaction import compact_ledger
+from services.movements import find_movement_drift
+from services.stockLevels import find_stock_level_drift
+from services.supplierStats import find_supplier_stat_drift
+from utils.cache import MemoryBackend, cache
+
+HORIZON = datetime(2010, 1, 1)
+DERIVED_TABLES = (ProductStockLevel, ProductDailyMovement, SupplierStat, SupplierProductStat)
+
+
+def _add(client, product_id, supplier_id, date_added, quantity=5, unit_price=2.0):
+    response = client.post("/stock_entries/", json={
+        "product_id": product_id, "supplier_id": supplier_id, "quantity": quantity, "unit_price": unit_price,
+        "date_added": date_added,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _compact():
+    return compact_ledger(database.SessionLocal, HORIZON)["archived"]
+
+
+def _archived_ids():
+    with database.engine.connect() as connection:
+        return connection.scalars(select(StockEntryArchive.id).order_by(StockEntryArchive.id)).all()
+
+
+def _derived_rows():
+    with database.engine.connect() as connection:
+        return {
+            model.__tablename__: sorted(tuple(row) for row in connection.execute(select(model.__table__)))
+            for model in DERIVED_TABLES
+        }
+
+
+def test_archived_ids_are_not_handed_out_again(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    first = _add(client, product_id, supplier_id, "2000-01-01T00:00:00")
+    assert _compact() == 1
+
+    # The newest entry was archived: the next one must not take its id
+    second = _add(client, product_id, supplier_id, "2001-01-01T00:00:00")
+    assert second > first
+    assert _compact() == 1
+    assert _archived_ids() == [first, second]
+    assert client.get(f"/stock_entries/{first}").status_code == 404
+
+
+def test_compaction_keeps_every_total(client, catalog):
+    (hammer, screwdriver), (acme, globex) = catalog["products"], catalog["suppliers"]
+    for product_id, supplier_id, date_added, quantity, unit_price in (
+        (hammer, acme, "2001-03-01T10:00:00", 10, 2.0),
+        (hammer, globex, "2002-05-01T10:00:00", 4, 3.5),
+        (hammer, acme, "2020-01-01T10:00:00", 6, 2.5),
+        (screwdriver, globex, "2003-01-01T10:00:00", 8, 1.0),
+        (screwdriver, globex, "2021-06-01T10:00:00", 2, 1.5),
+    ):
+        _add(client, product_id, supplier_id, date_added, quantity, unit_price)
+    client.post("/stock/issues", json={"product_id": hammer, "quantity": 12})
+    client.post("/stock/reservations", json={"product_id": screwdriver, "quantity": 3})
+
+    paths = [
+        f"/stock/levels/{hammer}", f"/stock/levels/{screwdriver}", "/valuation/",
+        f"/analytics/products/{hammer}/movements", f"/analytics/suppliers/{globex}",
+        f"/analytics/suppliers/{acme}/products", f"/stock_entries/by-product/{hammer}",
+    ]
+
+    def responses():
+        bodies = {}
+        for path in paths:
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.text)
+            body = response.json()
+            body.pop("computed_at", None)
+            if "stock_entries" in body:
+                # The listing itself loses the archived entries; its total does not
+                body = body["total_stock"]
+            bodies[path] = body
+        return bodies
+
+    before_rows, before = _derived_rows(), responses()
+    assert _compact() == 3
+    # Compaction invalidates no cache entry: drop them, so the responses are computed again
+    cache.backend = MemoryBackend(settings.cache_max_entries)
+    assert _derived_rows() == before_rows
+    assert responses() == before
+
+    with database.SessionLocal() as db:
+        assert find_stock_level_drift(db) == []
+        assert find_movement_drift(db) == []
+        assert find_supplier_stat_drift(db) == []
+
+
+def test_tables_without_autoincrement_are_rebuilt(db_dir):
+    engine = database._sync_engine(f"sqlite:///{os.path.join(db_dir, 'legacy.db')}", "pool.legacy")
+    create_schema(engine)
+    with engine.begin() as connection:
+        # stock_entries as created before it asked for AUTOINCREMENT
+        connection.execute(text("DROP TABLE stock_entries"))
+        connection.execute(text(
+            "CREATE TABLE stock_entries (id INTEGER NOT NULL, product_id INTEGER NOT NULL, "
+            "supplier_id INTEGER NOT NULL, quantity INTEGER NOT NULL, unit_price FLOAT NOT NULL, "
+            "date_added DATETIME, version INTEGER DEFAULT 1 NOT NULL, PRIMARY KEY (id))"
+        ))
+        connection.execute(text("CREATE INDEX ix_stock_entries_id ON stock_entries (id)"))
+        connection.execute(text(
+            "INSERT INTO stock_entries (id, product_id, supplier_id, quantity, unit_price) VALUES (1, 1, 1, 2, 1.0)"
+        ))
+        connection.execute(insert(StockEntryArchive), [{
+            "id": 7, "product_id": 1, "supplier_id": 1, "quantity": 1, "unit_price": 1.0,
+            "date_added": datetime(2000, 1, 1), "version": 1, "archived_at": datetime(2024, 1, 1),
+        }])
+
+    create_schema(engine)
+    with engine.begin() as connection:
+        sql = connection.execute(text("SELECT sql FROM sqlite_master WHERE name = 'stock_entries'")).scalar()
+        assert "AUTOINCREMENT" in sql
+        assert connection.execute(text("SELECT id, quantity FROM stock_entries")).all() == [(1, 2)]
+        indexes = {row[0] for row in connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'stock_entries' AND sql IS NOT NULL"
+        ))}
+        assert "ix_stock_entries_product_date_added_id" in indexes
+        connection.execute(text(
+            "INSERT INTO stock_entries (product_id, supplier_id, quantity, unit_price) VALUES (1, 1, 1, 1.0)"
+        ))
+        assert connection.execute(text("SELECT max(id) FROM stock_entries")).scalar() == 8
+    engine.dispose()
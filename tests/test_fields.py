@@ -0,0 +1,104 @@
+"""Sparse fieldsets: `fields=` parsing, the narrowed schemas, and projection on list and detail routes."""
+import pytest
+from fastapi import HTTPException
+
+import config.database as database
+from conftest import add_entries
+from models.category import Category
+from models.product import Product
+from schemas.product import ProductResponse
+from schemas.stockEntry import StockEntryResponse
+from utils.fields import dump_sparse, parse_fields, project_entry, sparse_schema
+from utils.loading import select_for_response
+
+
+def test_parse_fields():
+    assert parse_fields(None, ProductResponse) is None
+    # Schema order and no duplicates, however the request spells it
+    assert parse_fields(" sku, name,sku,", ProductResponse) == ("name", "sku")
+    assert parse_fields("name,sku", ProductResponse) == parse_fields("sku,name", ProductResponse)
+    with pytest.raises(HTTPException) as raised:
+        parse_fields("name,colour,weight", ProductResponse)
+    assert (raised.value.status_code, raised.value.detail) == (400, "Unknown fields: colour, weight")
+    with pytest.raises(HTTPException) as raised:
+        parse_fields(" , ", ProductResponse)
+    assert raised.value.status_code == 400
+
+
+def test_sparse_schema_and_dump():
+    assert sparse_schema(ProductResponse, None) is ProductResponse
+    narrowed = sparse_schema(ProductResponse, ("id", "category"))
+    assert list(narrowed.model_fields) == ["id", "category"]
+    # Built once per field set
+    assert sparse_schema(ProductResponse, ("id", "category")) is narrowed
+
+    with database.SessionLocal() as db:
+        db.add(Category(id=1, name="Tools"))
+        db.add(Product(id=1, name="Hammer", sku="TL-001", price=20.0, category_id=1))
+        db.flush()
+        rows = db.scalars(select_for_response(Product, ProductResponse, ("name", "price"))).all()
+        assert dump_sparse(ProductResponse, ("name", "price"), rows) == [{"name": "Hammer", "price": 20.0}]
+        db.rollback()
+
+
+def test_project_entry():
+    entry = {"etag": '"full"', "body": {"id": 1, "name": "Hammer", "sku": "TL-001"}}
+    assert project_entry(entry, None) is entry
+    projected = project_entry(entry, ("id", "sku"))
+    assert projected["body"] == {"id": 1, "sku": "TL-001"}
+    # Each field set has an ETag of its own
+    assert projected["etag"] not in (entry["etag"], project_entry(entry, ("id",))["etag"])
+
+
+@pytest.mark.parametrize(
+    "path", ["/product/", "/product/{id}", "/product/search", "/stock_entries/", "/valuation/products"],
+)
+def test_unknown_field_is_rejected(client, catalog, path):
+    response = client.get(path.format(id=catalog["products"][0]), params={"fields": "name,colour"})
+    assert response.status_code == 400
+    assert "colour" in response.json()["detail"]
+
+
+def test_products_list_and_detail(client, catalog, statements):
+    hammer = catalog["products"][0]
+    statements.clear()
+    page = client.get("/product/", params={"fields": "sku,id"}).json()
+    assert page["items"] == [{"id": hammer, "sku": "TL-001"}, {"id": hammer + 1, "sku": "TL-002"}]
+    # The category is not asked for, so it is not joined
+    assert not any("categories" in statement for statement in statements)
+
+    detail = client.get(f"/product/{hammer}", params={"fields": "name,category"})
+    assert detail.json() == {"name": "Hammer", "category": client.get(f"/category/{catalog['category']}").json()}
+    assert client.get(f"/product/{hammer}", params={"fields": "name"}).headers["etag"] != detail.headers["etag"]
+
+    found = client.get("/product/search", params={"sku_prefix": "TL-", "fields": "name"}).json()
+    assert found["items"] == [{"name": "Hammer"}, {"name": "Screwdriver"}]
+
+
+def test_nested_fields_of_stock_entries(client, catalog):
+    (hammer, _), (acme, _) = catalog["products"], catalog["suppliers"]
+    (entry,) = add_entries(client, hammer, acme, 1, quantity=3)
+
+    body = client.get(f"/stock_entries/{entry}", params={"fields": "quantity,product"}).json()
+    assert list(body) == ["quantity", "product"]
+    assert body["product"]["name"] == "Hammer"
+    # A nested row comes whole, its own nested rows included
+    assert body["product"]["category"]["name"] == "Tools"
+
+    page = client.get("/stock_entries/", params={"fields": "id,supplier"}).json()
+    assert page["items"] == [{"id": entry, "supplier": client.get(f"/supplier/{acme}").json()}]
+
+    # Fields of a nested row can not be picked one by one
+    assert client.get(f"/stock_entries/{entry}", params={"fields": "product.name"}).status_code == 400
+
+
+def test_every_field_can_be_requested(client, catalog):
+    hammer = catalog["products"][0]
+    (entry,) = add_entries(client, hammer, catalog["suppliers"][0], 1)
+    everything = ",".join(StockEntryResponse.model_fields)
+    assert client.get(f"/stock_entries/{entry}", params={"fields": everything}).json() == (
+        client.get(f"/stock_entries/{entry}").json()
+    )
+    assert client.get(f"/product/{hammer}", params={"fields": ",".join(ProductResponse.model_fields)}).json() == (
+        client.get(f"/product/{hammer}").json()
+    )
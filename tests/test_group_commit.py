@@ -0,0 +1,47 @@
+"""GroupCommit: concurrent items share a commit, and a cancelled group task does not wedge the next one."""
+import asyncio
+
+import pytest
+
+from utils.groupCommit import GroupCommit
+
+
+def test_concurrent_items_share_a_commit():
+    groups = []
+
+    async def commit(items):
+        groups.append(items)
+        return [ValueError(item) if item < 0 else item * 10 for item in items]
+
+    group_commit = GroupCommit(commit, interval=0.01, max_items=3)
+
+    async def run():
+        return await asyncio.gather(*(group_commit.submit(item) for item in (1, 2, -3, 4)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[:2] == [10, 20] and isinstance(results[2], ValueError) and results[3] == 40
+    assert groups == [[1, 2, -3], [4]]
+    assert group_commit._task is None
+
+
+def test_cancelled_group_task_is_replaced():
+    async def run():
+        blocked = asyncio.Event()
+        committed = []
+
+        async def commit(items):
+            if not committed:
+                committed.append(None)
+                await blocked.wait()  # The first group hangs until its task is cancelled
+            return items
+
+        group_commit = GroupCommit(commit, interval=0, max_items=10)
+        first = asyncio.ensure_future(group_commit.submit("first"))
+        await asyncio.sleep(0.01)
+        group_commit._task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(first, 1)
+        assert group_commit._task is None
+        return await asyncio.wait_for(group_commit.submit("second"), 1)
+
+    assert asyncio.run(run()) == "second"
@@ -0,0 +1,44 @@
+"""Serializing nested response models costs a fixed number of queries, whatever the page size."""
+import pytest
+
+from conftest import add_entries
+from config.settings import settings
+from utils.cache import MemoryBackend, cache
+
+
+def _count(client, statements, path, **params):
+    # A cached body would hide the loads being measured
+    cache.backend = MemoryBackend(settings.cache_max_entries)
+    statements.clear()
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+@pytest.fixture
+def ledger(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    add_entries(client, catalog["products"][1], catalog["suppliers"][1], 5)
+    return {"product": product_id, "supplier": supplier_id, "entries": add_entries(client, product_id, supplier_id, 25)}
+
+
+@pytest.mark.parametrize("path", [
+    "/stock_entries/",
+    "/product/",
+    "/stock_entries/by-product/{product}",
+    "/stock_entries/by-supplier/{supplier}",
+])
+def test_list_query_count_does_not_grow_with_page_size(client, statements, ledger, path):
+    path = path.format(**ledger)
+    small = _count(client, statements, path, limit=2)
+    large = _count(client, statements, path, limit=20)
+    assert small == large
+    assert large <= 4
+
+
+@pytest.mark.parametrize("path", ["/stock_entries/{id}", "/product/{id}"])
+def test_detail_query_count(client, statements, ledger, catalog, path):
+    ids = ledger["entries"] if path.startswith("/stock_entries") else catalog["products"]
+    counts = {_count(client, statements, path.format(id=id_)) for id_ in ids[:2]}
+    assert len(counts) == 1
+    assert counts.pop() <= 3
@@ -0,0 +1,67 @@
+"""Reservations and issues, and the ledger writes that must not take their units back."""
+from sqlalchemy import func, select
+
+import config.database as database
+from conftest import add_entries
+from models.stockIssue import StockIssue
+from models.stockReservation import StockReservation
+
+
+def _count(model):
+    with database.engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+
+def _level(client, product_id):
+    body = client.get(f"/stock/levels/{product_id}").json()
+    return body["on_hand"], body["reserved"], body["available"]
+
+
+def test_unknown_product_is_404_without_a_ledger_row(client):
+    assert client.post("/stock/reservations", json={"product_id": 999999, "quantity": 1}).status_code == 404
+    assert client.post("/stock/issues", json={"product_id": 999999, "quantity": 1}).status_code == 404
+    assert _count(StockReservation) == _count(StockIssue) == 0
+
+
+def test_reserve_issue_and_release(client, catalog):
+    product_id = catalog["products"][0]
+    add_entries(client, product_id, catalog["suppliers"][0], 1, quantity=10)
+
+    reservation = client.post("/stock/reservations", json={"product_id": product_id, "quantity": 4}).json()
+    assert _level(client, product_id) == (10, 4, 6)
+    assert client.post("/stock/reservations", json={"product_id": product_id, "quantity": 7}).status_code == 409
+
+    assert client.post("/stock/issues", json={"product_id": product_id, "quantity": 6}).status_code == 200
+    assert _level(client, product_id) == (4, 4, 0)
+    assert client.post(f"/stock/reservations/{reservation['id']}/release").json()["status"] == "released"
+    assert _level(client, product_id) == (4, 0, 4)
+
+
+def test_product_without_stock_is_409(client, catalog):
+    response = client.post("/stock/issues", json={"product_id": catalog["products"][1], "quantity": 1})
+    assert response.status_code == 409
+
+
+def test_stock_entry_delete_keeps_reserved_units(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    kept, deleted = add_entries(client, product_id, supplier_id, 2, quantity=5)
+    client.post("/stock/reservations", json={"product_id": product_id, "quantity": 7})
+
+    assert client.delete(f"/stock_entries/{deleted}").status_code == 409
+    assert client.get(f"/stock_entries/{deleted}").status_code == 200
+    assert _level(client, product_id) == (10, 7, 3)
+
+
+def test_stock_entry_update_keeps_issued_units(client, catalog):
+    (first, second), supplier_id = catalog["products"], catalog["suppliers"][0]
+    entry_id = add_entries(client, first, supplier_id, 1, quantity=5)[0]
+    client.post("/stock/issues", json={"product_id": first, "quantity": 3})
+
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 3}).status_code == 200
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 2}).status_code == 409
+    assert client.put(f"/stock_entries/{entry_id}", json={"product_id": second}).status_code == 409
+    assert _level(client, first) == (0, 0, 0)
+    assert client.get(f"/stock_entries/{entry_id}").json()["quantity"] == 3
+    # Raising it is always allowed
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 4}).status_code == 200
+    assert _level(client, first) == (1, 0, 1)
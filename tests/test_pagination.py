@@ -0,0 +1,55 @@
+"""Keyset pagination walks every row exactly once, undated legacy stock entries included."""
+import pytest
+from sqlalchemy import update
+
+import config.database as database
+from conftest import add_entries
+from models.stockEntry import StockEntry as StockEntryModel
+from utils.pagination import encode_cursor
+
+
+def _walk(client, path, limit, items="items"):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        response = client.get(path, params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids += [row["id"] for row in body[items]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture
+def ledger(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    ids = add_entries(client, product_id, supplier_id, 7)
+    # Rows written before date_added had a default
+    with database.engine.begin() as connection:
+        connection.execute(
+            update(StockEntryModel).where(StockEntryModel.id.in_(ids[2:5])).values(date_added=None)
+        )
+    return {"product": product_id, "supplier": supplier_id, "ids": ids}
+
+
+@pytest.mark.parametrize("path, items", [
+    ("/stock_entries/", "items"),
+    ("/stock_entries/by-product/{product}", "stock_entries"),
+    ("/stock_entries/by-supplier/{supplier}", "stock_entries"),
+])
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_cover_undated_entries(client, ledger, path, items, limit):
+    ids = _walk(client, path.format(**ledger), limit, items)
+    assert sorted(ids) == ledger["ids"]
+    # Undated entries come first, in id order
+    assert ids[:3] == ledger["ids"][2:5]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(["yesterday", 1]), encode_cursor([None])])
+def test_invalid_cursor_is_400(client, cursor):
+    assert client.get("/stock_entries/", params={"cursor": cursor}).status_code == 400
+
+
+def test_null_id_cursor_is_400(client):
+    assert client.get("/product/", params={"cursor": encode_cursor([None])}).status_code == 400
@@ -0,0 +1,98 @@
+"""Request profiling: the Server-Timing header and the per-route histograms."""
+import dataclasses
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+import utils.profiling
+from config.settings import settings
+
+SLOW = 0.05
+
+
+def _timings(response):
+    """Server-Timing as {name: (milliseconds, description)}, in header order."""
+    timings = {}
+    for part in response.headers["server-timing"].split(", "):
+        name, *params = part.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        timings[name] = (float(params["dur"]), params.get("desc"))
+    return timings
+
+
+def _route(client, key):
+    return client.get("/internal/metrics/").json()["routes"].get(key)
+
+
+def _count(client, key, histogram="latency"):
+    route = _route(client, key)
+    return route[histogram]["count"] if route is not None else 0
+
+
+def test_server_timing_parts(client, catalog):
+    response = client.get("/product/", params={"fields": "name"})
+    timings = _timings(response)
+    assert list(timings) == ["db", "db-slowest", "endpoint", "serialize", "app"]
+    milliseconds, description = timings["db"]
+    assert description == '"1 queries"'
+    assert timings["db-slowest"][0] <= milliseconds <= timings["app"][0]
+    assert timings["endpoint"][0] <= timings["app"][0]
+
+    # A cached lookup runs no query: no slowest statement to report
+    client.get(f"/product/{catalog['products'][0]}")
+    timings = _timings(client.get(f"/product/{catalog['products'][0]}"))
+    assert timings["db"][1] == '"0 queries"'
+    assert "db-slowest" not in timings
+
+
+def test_serialization_in_the_handler_is_timed(client, catalog, monkeypatch):
+    def slow_render(self, content):
+        time.sleep(SLOW)
+        return original(self, content)
+
+    original = JSONResponse.render
+    monkeypatch.setattr(JSONResponse, "render", slow_render)
+    # The handler builds its JSONResponse itself, before the endpoint returns
+    timings = _timings(client.get("/product/batch", params={"ids": ",".join(map(str, catalog["products"]))}))
+    assert timings["serialize"][0] >= SLOW * 1000
+    assert timings["endpoint"][0] >= timings["serialize"][0]
+
+
+def test_sparse_dump_is_timed(client, catalog, monkeypatch):
+    def slow_dump(self, *args, **kwargs):
+        time.sleep(SLOW)
+        return original(self, *args, **kwargs)
+
+    original = TypeAdapter.dump_python
+    monkeypatch.setattr(TypeAdapter, "dump_python", slow_dump)
+    timings = _timings(client.get("/product/", params={"fields": "name,sku"}))
+    assert timings["serialize"][0] >= SLOW * 1000
+
+
+def test_server_timing_can_be_turned_off(client, catalog, monkeypatch):
+    monkeypatch.setattr(utils.profiling, "settings", dataclasses.replace(settings, server_timing=False))
+    before = _count(client, "GET /product/")
+    response = client.get("/product/")
+    assert "server-timing" not in response.headers
+    # Still collected
+    assert _count(client, "GET /product/") == before + 1
+
+
+@pytest.mark.parametrize("requests", [1, 3])
+def test_route_histograms(client, catalog, requests):
+    key = "GET /product/{id}"
+    histograms = ("latency", "db_seconds", "queries", "serialize_seconds")
+    counts = {histogram: _count(client, key, histogram) for histogram in histograms}
+    unmatched = _count(client, "GET <unmatched>")
+    for _ in range(requests):
+        assert client.get(f"/product/{catalog['products'][0]}").status_code == 200
+    client.get("/no/such/path")
+
+    route = _route(client, key)
+    for histogram, count in counts.items():
+        assert route[histogram]["count"] == count + requests, histogram
+    assert route["queries"]["buckets"]["+Inf"] == route["queries"]["count"]
+    assert "SELECT" in route["slowest_statement"]["statement"]
+    assert _count(client, "GET <unmatched>") == unmatched + 1
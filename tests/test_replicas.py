@@ -0,0 +1,46 @@
+"""Read/write routing against a primary and a replica, two separate SQLite files.
+
+The replica (the `replica` fixture) is never written by the app, so which
+file answered a read shows where it was routed.
+"""
+from config.replicas import READ_YOUR_WRITES_COOKIE
+
+
+def _product_names(client):
+    return [item["name"] for item in client.get("/product/").json()["items"]]
+
+
+def test_reads_go_to_the_replica(client, catalog, replica):
+    assert _product_names(client) == ["Replica Hammer"]
+    assert client.get("/product/search", params={"sku_prefix": "R-"}).json()["items"][0]["name"] == "Replica Hammer"
+    assert replica.sessions == [2]
+    assert replica.active == [0]
+
+
+def test_writes_go_to_the_primary_and_pin_reads(client, catalog, replica):
+    client.cookies.clear()
+    response = client.put(f"/product/{catalog['products'][0]}", json={"price": 30.0})
+    assert response.status_code == 200
+    assert READ_YOUR_WRITES_COOKIE in response.cookies
+    # The client sees its own write, then the replica again once the cookie is gone
+    assert _product_names(client) == ["Hammer", "Screwdriver"]
+    assert replica.primary_reads == 1
+    client.cookies.clear()
+    assert _product_names(client) == ["Replica Hammer"]
+    assert replica.sessions == [1]
+
+
+def test_failed_writes_do_not_pin_reads(client, catalog, replica):
+    client.cookies.clear()
+    response = client.put("/product/999999", json={"price": 30.0})
+    assert response.status_code == 404
+    assert READ_YOUR_WRITES_COOKIE not in response.cookies
+    assert _product_names(client) == ["Replica Hammer"]
+
+
+def test_expired_cookie_reads_the_replica(client, catalog, replica):
+    client.cookies.clear()
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, "1000.0")
+    assert _product_names(client) == ["Replica Hammer"]
+    client.cookies.set(READ_YOUR_WRITES_COOKIE, "not-a-time")
+    assert _product_names(client) == ["Replica Hammer"]
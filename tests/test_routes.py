@@ -0,0 +1,64 @@
+"""Route-level smoke tests, run once per database mode (sync adapter and AsyncSession)."""
+from conftest import add_entries
+
+
+def test_catalog_crud(client, catalog):
+    product_id = catalog["products"][0]
+
+    response = client.get(f"/product/{product_id}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Hammer"
+    assert response.json()["category"]["name"] == "Tools"
+
+    response = client.put(f"/product/{product_id}", json={"price": 22.5})
+    assert response.status_code == 200
+    assert response.json()["price"] == 22.5
+    assert response.json()["version"] == 2
+
+    assert [item["id"] for item in client.get("/product/").json()["items"]] == catalog["products"]
+    assert client.get("/supplier/").json()["items"][1]["name"] == "Globex"
+    assert client.get("/category/").json()["items"][0]["name"] == "Tools"
+
+    assert client.delete(f"/product/{catalog['products'][1]}").status_code == 200
+    assert client.get(f"/product/{catalog['products'][1]}").status_code == 404
+
+
+def test_stock_entry_lifecycle(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    entry_id = add_entries(client, product_id, supplier_id, 1, quantity=5)[0]
+
+    assert client.get(f"/stock/levels/{product_id}").json()["on_hand"] == 5
+    assert client.get(f"/stock_entries/{entry_id}").json()["quantity"] == 5
+
+    response = client.put(f"/stock_entries/{entry_id}", json={"quantity": 3})
+    assert response.status_code == 200
+    assert client.get(f"/stock/levels/{product_id}").json()["on_hand"] == 3
+
+    low = client.get("/stock_entries/low-stock", params={"threshold": 4}).json()
+    assert [(row["product_id"], row["current_stock"]) for row in low] == [(product_id, 3)]
+
+    history = client.get(f"/stock_entries/by-product/{product_id}").json()
+    assert history["total_stock"] == 3
+    assert [entry["id"] for entry in history["stock_entries"]] == [entry_id]
+
+    assert client.delete(f"/stock_entries/{entry_id}").status_code == 200
+    assert client.get(f"/stock_entries/{entry_id}").status_code == 404
+    assert client.get(f"/stock/levels/{product_id}").json()["on_hand"] == 0
+
+
+def test_bulk_ingestion(client, catalog):
+    product_id, supplier_id = catalog["products"][1], catalog["suppliers"][1]
+    body = "\n".join(
+        f'{{"product_id": {product_id}, "supplier_id": {supplier_id}, "quantity": 2, "unit_price": 1.5}}'
+        for _ in range(3)
+    ) + '\n{"product_id": 999999, "supplier_id": 1, "quantity": 1, "unit_price": 1.0}'
+    response = client.post("/stock_entries/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 3, "errors": [{"row": 4, "error": "Product not found"}]}
+    assert client.get(f"/stock/levels/{product_id}").json()["on_hand"] == 6
+
+
+def test_missing_rows_are_404(client):
+    assert client.get("/product/999999").status_code == 404
+    assert client.get("/supplier/999999").status_code == 404
+    assert client.get("/stock_entries/999999").status_code == 404
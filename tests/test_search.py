@@ -0,0 +1,86 @@
+"""Product search criteria, and the SQLite FTS5 indexes kept in sync with the products table."""
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services.search import _escape_like, _filters
+
+
+@pytest.fixture
+def products(client, catalog):
+    """The catalog's two tools plus products whose names and SKUs hold LIKE wildcards."""
+    ids = {"Hammer": catalog["products"][0], "Screwdriver": catalog["products"][1]}
+    for name, sku, description in (
+        ("50% Off Wrench", "WR_1", "Adjustable steel wrench"),
+        ("500 Off Wrench", "WRX1", "Adjustable chrome wrench"),
+        ("Flat_Bar", "BAR-1", "Pry bar"),
+        ("FlatXBar", "BAR-2", None),
+    ):
+        response = client.post("/product/", json={
+            "name": name, "sku": sku, "price": 5.0, "category_id": catalog["category"], "description": description,
+        })
+        ids[name] = response.json()["id"]
+    return ids
+
+
+def _names(client, **params):
+    response = client.get("/product/search", params=params)
+    assert response.status_code == 200, response.text
+    return sorted(item["name"] for item in response.json()["items"])
+
+
+def test_sku(client, products):
+    assert _names(client, sku="TL-002") == ["Screwdriver"]
+    assert _names(client, sku="TL") == []
+
+
+def test_sku_prefix(client, products):
+    assert _names(client, sku_prefix="TL-") == ["Hammer", "Screwdriver"]
+    # The wildcard is a literal underscore
+    assert _names(client, sku_prefix="WR_") == ["50% Off Wrench"]
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("hammer", ["Hammer"]),       # FTS trigram match, case-insensitive
+    ("ench", ["50% Off Wrench", "500 Off Wrench"]),
+    ("0%", ["50% Off Wrench"]),   # Too short for trigrams: LIKE, with % escaped
+    ("t_", ["Flat_Bar"]),         # and _ escaped
+])
+def test_name(client, products, name, expected):
+    assert _names(client, name=name) == expected
+
+
+def test_full_text(client, products):
+    assert _names(client, q="wrench") == ["50% Off Wrench", "500 Off Wrench"]
+    assert _names(client, q="steel") == ["50% Off Wrench", "Hammer"]
+    # Every word must match; stemming matches "wrenches" to "wrench"
+    assert _names(client, q="steel wrenches") == ["50% Off Wrench"]
+    # FTS5 syntax in user input is searched for literally
+    assert _names(client, q='steel" OR "chrome') == []
+
+
+def test_combined_criteria_and_paging(client, products, catalog):
+    assert _names(client, q="adjustable", max_price=10) == ["50% Off Wrench", "500 Off Wrench"]
+    assert _names(client, q="steel", min_price=10) == ["Hammer"]
+    first = client.get("/product/search", params={"q": "adjustable", "limit": 1}).json()
+    second = client.get("/product/search", params={"q": "adjustable", "limit": 1, "cursor": first["next_cursor"]}).json()
+    assert [first["items"][0]["name"], second["items"][0]["name"]] == ["50% Off Wrench", "500 Off Wrench"]
+    assert second["next_cursor"] is None
+
+
+def test_indexes_follow_updates_and_deletes(client, products):
+    client.put(f"/product/{products['Hammer']}", json={"name": "Mallet", "description": "Rubber mallet"})
+    assert _names(client, name="hammer") == []
+    assert _names(client, q="steel") == ["50% Off Wrench"]
+    assert _names(client, name="mallet") == _names(client, q="rubber") == ["Mallet"]
+
+    client.delete(f"/product/{products['50% Off Wrench']}")
+    assert _names(client, q="wrench") == ["500 Off Wrench"]
+    assert _names(client, name="wrench") == ["500 Off Wrench"]
+
+
+def test_postgresql_patterns_are_escaped():
+    assert _escape_like(r"50%_a\b") == r"50\%\_a\\b"
+    filters = _filters("postgresql", None, "WR_", "50%", [], None, None, None, name_indexed=False)
+    compiled = [clause.compile(dialect=postgresql.dialect()) for clause in filters]
+    assert [list(clause.params.values()) for clause in compiled] == [["WR\\_%"], ["%50\\%%"]]
+    assert all("ESCAPE" in str(clause) for clause in compiled)
@@ -0,0 +1,47 @@
+"""Group-committed stock entries: each caller gets back the row of the entry it sent."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import config.database as database
+from services.stockEntries import add_stock_entry_grouped, commit_stock_entry_group, stock_entry_commits
+
+
+def _group(catalog):
+    (hammer, screwdriver), (acme, globex) = catalog["products"], catalog["suppliers"]
+    # Values the database does not hand back as sent: an aware datetime is stored naive,
+    # and float prices need not survive the round trip bit for bit on every backend
+    return [
+        {"product_id": hammer, "supplier_id": acme, "quantity": 1, "unit_price": 0.1 + 0.2,
+         "date_added": datetime(2024, 1, 1, tzinfo=timezone.utc)},
+        {"product_id": screwdriver, "supplier_id": globex, "quantity": 2, "unit_price": 1 / 3,
+         "date_added": datetime(2024, 1, 1, 5, tzinfo=timezone(timedelta(hours=5)))},
+        {"product_id": hammer, "supplier_id": globex, "quantity": 3, "unit_price": 2.5,
+         "date_added": datetime(2024, 1, 2)},
+    ]
+
+
+def test_rows_come_back_in_group_order(client, catalog):
+    group = _group(catalog)
+    with database.SessionLocal() as db:
+        results, levels = commit_stock_entry_group(db, group)
+
+    assert [(row.product_id, row.supplier_id, row.quantity) for row in results] == [
+        (values["product_id"], values["supplier_id"], values["quantity"]) for values in group
+    ]
+    assert len({row.id for row in results}) == 3
+    assert client.get(f"/stock/levels/{catalog['products'][0]}").json()["on_hand"] == 4
+    assert client.get(f"/stock/levels/{catalog['products'][1]}").json()["on_hand"] == 2
+
+
+def test_concurrent_callers_share_a_group(client, catalog, monkeypatch):
+    monkeypatch.setattr(stock_entry_commits, "interval", 0.05)
+    groups_before = stock_entry_commits.groups
+
+    async def run():
+        return await asyncio.gather(*(add_stock_entry_grouped(values) for values in _group(catalog)))
+
+    rows = asyncio.run(run())
+    assert stock_entry_commits.groups == groups_before + 1
+    assert [row.quantity for row in rows] == [1, 2, 3]
+    for row in rows:
+        assert client.get(f"/stock_entries/{row.id}").json()["quantity"] == row.quantity
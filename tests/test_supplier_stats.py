@@ -0,0 +1,128 @@
+"""Supplier analytics: the incrementally kept rollups against a rebuild, the routes and the drift check."""
+import json
+
+from sqlalchemy import select, update
+
+import config.database as database
+from conftest import add_entries
+from models.supplierProductStat import SupplierProductStat
+from models.supplierStat import SupplierStat
+from services.supplierStats import find_supplier_stat_drift, rebuild_supplier_stats
+
+
+def _rollups(db):
+    # Rows a write emptied may stay behind with zero counts; a rebuild never creates them
+    return {
+        model.__tablename__: sorted(
+            tuple(row) for row in db.execute(select(model.__table__).where(model.entry_count > 0))
+        )
+        for model in (SupplierStat, SupplierProductStat)
+    }
+
+
+def _assert_matches_rebuild():
+    with database.SessionLocal() as db:
+        assert find_supplier_stat_drift(db) == []
+        incremental = _rollups(db)
+        rebuild_supplier_stats(db)
+        assert _rollups(db) == incremental
+        db.rollback()
+
+
+def test_incremental_stats_match_a_rebuild(client, catalog):
+    (hammer, screwdriver), (acme, globex) = catalog["products"], catalog["suppliers"]
+    first, second = add_entries(client, hammer, acme, 2, quantity=4, unit_price=2.5)
+    add_entries(client, screwdriver, globex, 1, quantity=3, unit_price=1.25)
+    _assert_matches_rebuild()
+
+    # Moved to the other product and supplier, at another price
+    response = client.put(f"/stock_entries/{first}", json={"product_id": screwdriver, "supplier_id": globex, "unit_price": 0.75})
+    assert response.status_code == 200, response.text
+    _assert_matches_rebuild()
+
+    assert client.put(f"/stock_entries/{second}", json={"quantity": 9}).status_code == 200
+    _assert_matches_rebuild()
+
+    # The last entry of a supplier and product goes
+    assert client.delete(f"/stock_entries/{second}").status_code == 200
+    _assert_matches_rebuild()
+
+    body = "\n".join(json.dumps({
+        "product_id": product_id, "supplier_id": supplier_id, "quantity": quantity, "unit_price": unit_price,
+    }) for product_id, supplier_id, quantity, unit_price in (
+        (hammer, acme, 5, 3.0), (hammer, globex, 2, 4.5), (screwdriver, acme, 1, 0.5), (hammer, acme, 1, 2.0),
+    ))
+    response = client.post("/stock_entries/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.json() == {"inserted": 4, "errors": []}
+    _assert_matches_rebuild()
+
+
+def test_supplier_stats_routes(client, catalog):
+    (hammer, screwdriver), (acme, globex) = catalog["products"], catalog["suppliers"]
+    add_entries(client, hammer, acme, 2, quantity=4, unit_price=25.0)
+    add_entries(client, screwdriver, acme, 1, quantity=2, unit_price=6.0)
+
+    page = client.get("/analytics/suppliers").json()
+    assert page == {"items": [{
+        "supplier_id": acme, "supplier_name": "Acme", "products": 2, "deliveries": 3, "quantity": 10, "spend": 212.0,
+    }], "next_cursor": None}
+    assert client.get(f"/analytics/suppliers/{acme}").json() == page["items"][0]
+
+    products = client.get(f"/analytics/suppliers/{acme}/products", params={"limit": 1}).json()
+    assert products["items"] == [{
+        "product_id": hammer, "product_name": "Hammer", "price": 20.0, "deliveries": 2, "quantity": 8,
+        "spend": 200.0, "avg_unit_price": 25.0, "min_unit_price": 25.0, "max_unit_price": 25.0,
+        "list_value": 160.0, "price_variance": 40.0, "price_variance_pct": 25.0,
+    }]
+    rest = client.get(f"/analytics/suppliers/{acme}/products", params={"cursor": products["next_cursor"]}).json()
+    assert [item["product_id"] for item in rest["items"]] == [screwdriver]
+    assert rest["items"][0]["price_variance"] == -4.0
+    assert rest["next_cursor"] is None
+
+    assert client.get(f"/analytics/suppliers/{globex}").json()["detail"] == "No stock entries for this supplier"
+    assert client.get(f"/analytics/suppliers/{globex}/products").json()["items"] == []
+    assert client.get("/analytics/suppliers/999999").status_code == 404
+    assert client.get("/analytics/suppliers/999999/products").status_code == 404
+
+
+def test_writes_refresh_the_cached_stats(client, catalog):
+    hammer, (acme, globex) = catalog["products"][0], catalog["suppliers"]
+    (entry,) = add_entries(client, hammer, acme, 1, quantity=4, unit_price=2.5)
+    assert client.get(f"/analytics/suppliers/{acme}").json()["quantity"] == 4
+    assert client.get("/analytics/suppliers").json()["items"][0]["supplier_id"] == acme
+
+    assert client.put(f"/stock_entries/{entry}", json={"supplier_id": globex}).status_code == 200
+    assert client.get(f"/analytics/suppliers/{acme}").status_code == 404
+    assert client.get(f"/analytics/suppliers/{globex}").json()["quantity"] == 4
+    assert [item["supplier_id"] for item in client.get("/analytics/suppliers").json()["items"]] == [globex]
+
+    # A new list price moves the variance of every supplier that delivered the product
+    assert client.put(f"/product/{hammer}", json={"price": 2.0}).status_code == 200
+    assert client.get(f"/analytics/suppliers/{globex}/products").json()["items"][0]["price_variance"] == 2.0
+
+
+def test_supplier_stats_are_read_from_the_primary(client, catalog, replica):
+    acme = catalog["suppliers"][0]
+    add_entries(client, catalog["products"][0], acme, 1)
+    client.cookies.clear()
+    # The replica has no stock entries; what is cached for everyone must come from the primary
+    assert [item["supplier_id"] for item in client.get("/analytics/suppliers").json()["items"]] == [acme]
+    assert client.get(f"/analytics/suppliers/{acme}").status_code == 200
+    assert len(client.get(f"/analytics/suppliers/{acme}/products").json()["items"]) == 1
+    assert replica.sessions == [0]
+
+
+def test_drift_is_reported_and_rebuilt(client, catalog):
+    hammer, acme = catalog["products"][0], catalog["suppliers"][0]
+    add_entries(client, hammer, acme, 2, quantity=3)
+    with database.SessionLocal() as db:
+        db.execute(update(SupplierProductStat).values(quantity=SupplierProductStat.quantity + 1))
+        db.execute(update(SupplierStat).values(spend=SupplierStat.spend + 1.0))
+        drift = find_supplier_stat_drift(db)
+        assert [(row["supplier_id"], row["product_id"]) for row in drift] == [(acme, hammer), (acme, None)]
+        assert drift[0]["expected"][0] == 6 and drift[0]["actual"][0] == 7
+        # Within the tolerance
+        assert find_supplier_stat_drift(db, tolerance=2.0)[0]["product_id"] == hammer
+
+        rebuild_supplier_stats(db)
+        assert find_supplier_stat_drift(db) == []
@@ -0,0 +1,78 @@
+"""Partial updates: explicit nulls, constraint clashes, business rules and versions."""
+import pytest
+
+from conftest import add_entries
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/product/{product}", {"name": None}),
+    ("/product/{product}", {"price": None}),
+    ("/supplier/{supplier}", {"phone": None}),
+    ("/category/{category}", {"name": None}),
+    ("/stock_entries/{entry}", {"quantity": None}),
+    ("/stock_entries/{entry}", {"supplier_id": None}),
+])
+def test_null_for_required_field_is_422(client, catalog, path, body):
+    ids = {
+        "product": catalog["products"][0], "supplier": catalog["suppliers"][0], "category": catalog["category"],
+        "entry": add_entries(client, catalog["products"][0], catalog["suppliers"][0], 1)[0],
+    }
+    assert client.put(path.format(**ids), json=body).status_code == 422
+
+
+def test_nullable_fields_can_still_be_cleared(client, catalog):
+    response = client.put(f"/product/{catalog['products'][0]}", json={"description": None})
+    assert response.status_code == 200
+    assert response.json()["description"] is None
+
+
+def test_unique_clash_is_409(client, catalog):
+    response = client.put(f"/product/{catalog['products'][1]}", json={"sku": "TL-001"})
+    assert response.status_code == 409
+    response = client.put(f"/supplier/{catalog['suppliers'][1]}", json={"phone": "+15550000001"})
+    assert response.status_code == 409
+
+
+def test_missing_row_is_404(client, catalog):
+    assert client.put("/product/999999", json={"price": 1.0}).status_code == 404
+    assert client.put("/supplier/999999", json={"name": "Initech"}).status_code == 404
+    assert client.put("/stock_entries/999999", json={"quantity": 1}).status_code == 404
+
+
+def test_stock_entry_update_is_validated(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    entry_id = add_entries(client, product_id, supplier_id, 1, quantity=4)[0]
+
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 0}).status_code == 400
+    assert client.put(f"/stock_entries/{entry_id}", json={"unit_price": -1.0}).status_code == 400
+    response = client.put(f"/stock_entries/{entry_id}", json={"product_id": 999999})
+    assert (response.status_code, response.json()["detail"]) == (404, "Product not found")
+    response = client.put(f"/stock_entries/{entry_id}", json={"supplier_id": 999999})
+    assert (response.status_code, response.json()["detail"]) == (404, "Supplier not found")
+
+    # Nothing was written
+    entry = client.get(f"/stock_entries/{entry_id}").json()
+    assert (entry["product_id"], entry["supplier_id"], entry["quantity"], entry["version"]) == (
+        product_id, supplier_id, 4, 1,
+    )
+    assert client.get(f"/stock/levels/{product_id}").json()["on_hand"] == 4
+
+
+def test_stock_entry_update_moves_the_ledger(client, catalog):
+    (first, second), supplier_id = catalog["products"], catalog["suppliers"][0]
+    entry_id = add_entries(client, first, supplier_id, 1, quantity=4)[0]
+
+    response = client.put(f"/stock_entries/{entry_id}", json={"product_id": second, "quantity": 6})
+    assert response.status_code == 200
+    assert client.get(f"/stock/levels/{first}").json()["on_hand"] == 0
+    assert client.get(f"/stock/levels/{second}").json()["on_hand"] == 6
+
+
+def test_stock_entry_version(client, catalog):
+    entry_id = add_entries(client, catalog["products"][0], catalog["suppliers"][0], 1)[0]
+
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 2, "version": 1}).json()["version"] == 2
+    response = client.put(f"/stock_entries/{entry_id}", json={"quantity": 3, "version": 1})
+    assert response.status_code == 409
+    # Without a version the update is last-writer-wins
+    assert client.put(f"/stock_entries/{entry_id}", json={"quantity": 3}).json()["version"] == 3
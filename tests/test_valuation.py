@@ -0,0 +1,39 @@
+"""Inventory valuation: weighted-average and FIFO cost of the stock on hand."""
+from sqlalchemy import delete
+
+import config.database as database
+from conftest import add_entries
+from models.stockEntry import StockEntry as StockEntryModel
+from utils.cache import cache
+
+
+def _valuation(client, product_id):
+    cache.invalidate_namespace("valuation")
+    response = client.get(f"/valuation/products/{product_id}")
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_fifo_values_the_newest_layers(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    add_entries(client, product_id, supplier_id, 1, quantity=10, unit_price=2.0)
+    add_entries(client, product_id, supplier_id, 1, quantity=10, unit_price=4.0)
+    client.post("/stock/issues", json={"product_id": product_id, "quantity": 15})
+
+    valuation = _valuation(client, product_id)
+    assert (valuation["received_quantity"], valuation["on_hand_quantity"]) == (20, 5)
+    assert valuation["wac_value"] == 15.0
+    # The 5 units left are from the newest layer
+    assert valuation["fifo_value"] == 20.0
+
+
+def test_product_without_layers_is_valued_at_zero(client, catalog):
+    product_id, supplier_id = catalog["products"][0], catalog["suppliers"][0]
+    add_entries(client, product_id, supplier_id, 2, quantity=5)
+    client.post("/stock/issues", json={"product_id": product_id, "quantity": 3})
+    # Ledger rows gone behind the rollups' back: the only partly consumed product has no layers
+    with database.engine.begin() as connection:
+        connection.execute(delete(StockEntryModel).where(StockEntryModel.product_id == product_id))
+
+    assert _valuation(client, product_id)["fifo_value"] == 0.0
+    assert client.get("/valuation/").status_code == 200
@@ -0,0 +1,205 @@
+"""Per-route admission control: bounded concurrency, bounded wait queues and load shedding.
+
+Every admitted request holds one of the worker's slots (by default as many
+as the connection pool has connections, overflow included) until its
+response is sent, streaming included. Routers put their routes in lanes:
+
+    scans = AdmissionLane("stock_entries.scans", limit=3, queue=8, timeout=1.0, priority=LOW)
+    router = APIRouter(..., route_class=AdmittedRoute, dependencies=[Depends(writes)])
+
+    @router.get("/low-stock", dependencies=[Depends(scans)])
+
+A lane runs at most `limit` requests at once. Up to `queue` more wait, each
+for at most `timeout` seconds. Anything beyond that gets a 503 with
+Retry-After instead of piling onto the connection pool. A freed slot goes
+to the oldest waiter of the highest-priority lane with room. The last
+ADMISSION_RESERVED slots only go to HIGH lanes, so lookups still get in
+while the scans are saturated.
+
+A route's own lane replaces its router's. UNMETERED routes, such as
+long-lived streams that hold no connection, bypass admission.
+State is per worker and lives on the event loop, so it needs no locks.
+"""
+import asyncio
+import time
+from itertools import count
+
+from fastapi import HTTPException
+
+from config.settings import settings
+from utils import metrics
+from utils.metrics import Histogram
+from utils.profiling import ProfiledRoute
+
+# Lane priorities: freed slots go to higher ones first, reserved slots only to HIGH
+LOW, NORMAL, HIGH = 0, 1, 2
+
+
+class Overloaded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(settings.admission_retry_after)},
+        )
+
+
+class AdmissionLane:
+    """A group of routes with its own concurrency limit and wait queue. Used as a dependency."""
+
+    def __init__(self, name, limit, queue=0, timeout=1.0, priority=NORMAL):
+        self.name = name
+        self.limit = limit  # None: not admission controlled
+        self.queue = queue
+        self.timeout = timeout
+        self.priority = priority
+        self.active = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait_seconds = Histogram()
+        if limit is not None:
+            admission.lanes[name] = self
+
+    async def __call__(self):
+        if self.limit is None or not settings.admission_control:
+            yield
+            return
+        await admission.acquire(self)
+        try:
+            yield
+        finally:
+            admission.release(self)
+
+    def snapshot(self):
+        return {
+            "priority": self.priority,
+            "limit": self.limit,
+            "queue": self.queue,
+            "timeout_seconds": self.timeout,
+            "active": self.active,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+
+class _Waiter:
+    __slots__ = ("lane", "order", "future")
+
+    def __init__(self, lane, order, future):
+        self.lane = lane
+        self.order = order
+        self.future = future
+
+
+class AdmissionController:
+    """The worker's slots, shared by every lane."""
+
+    def __init__(self):
+        self.lanes = {}
+        self.active = 0
+        self._waiters = []
+        self._order = count()
+
+    @property
+    def capacity(self):
+        return settings.admission_max_concurrency or settings.db_pool_size + settings.db_max_overflow
+
+    def _has_room(self, lane):
+        if lane.active >= lane.limit:
+            return False
+        free = self.capacity - self.active
+        return free > (0 if lane.priority >= HIGH else settings.admission_reserved)
+
+    def _dispatch(self):
+        # Few waiters at a time (bounded by the lanes' queues), so a sort per slot is cheap
+        for waiter in sorted(self._waiters, key=lambda waiter: (-waiter.lane.priority, waiter.order)):
+            if self.active >= self.capacity:
+                break
+            lane = waiter.lane
+            if not self._has_room(lane):
+                continue
+            self._waiters.remove(waiter)
+            lane.queued -= 1
+            lane.active += 1
+            lane.admitted += 1
+            self.active += 1
+            waiter.future.set_result(None)
+
+    def _withdraw(self, waiter):
+        self._waiters.remove(waiter)
+        waiter.lane.queued -= 1
+
+    async def acquire(self, lane):
+        """Wait for a slot in `lane`; raises Overloaded when its queue is full or the wait times out."""
+        waiter = _Waiter(lane, next(self._order), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        lane.queued += 1
+        self._dispatch()
+        if waiter.future.done():
+            lane.wait_seconds.observe(0.0)
+            return
+        if lane.queued > lane.queue:
+            self._withdraw(waiter)
+            lane.shed_queue_full += 1
+            raise Overloaded()
+
+        lane.peak_queued = max(lane.peak_queued, lane.queued)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), lane.timeout)
+        except asyncio.TimeoutError:
+            # A slot handed over just as the wait ran out is still taken
+            if not waiter.future.done():
+                self._withdraw(waiter)
+                lane.shed_timeout += 1
+                raise Overloaded()
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if waiter.future.done():
+                self.release(lane)
+            else:
+                self._withdraw(waiter)
+            raise
+        finally:
+            lane.wait_seconds.observe(time.perf_counter() - started)
+
+    def release(self, lane):
+        lane.active -= 1
+        self.active -= 1
+        self._dispatch()
+
+    def snapshot(self):
+        return {
+            "enabled": settings.admission_control,
+            "capacity": self.capacity,
+            "reserved": settings.admission_reserved,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "lanes": {name: lane.snapshot() for name, lane in sorted(self.lanes.items())},
+        }
+
+
+admission = AdmissionController()
+metrics.register("admission", admission.snapshot)
+
+# For routes that must never be queued or shed (e.g. event streams holding no connection)
+UNMETERED = AdmissionLane("unmetered", limit=None)
+
+
+class AdmittedRoute(ProfiledRoute):
+    """ProfiledRoute admitted through one lane: the route's own if it declares one, else its router's."""
+
+    def __init__(self, path, endpoint, dependencies=None, **kwargs):
+        dependencies = list(dependencies or ())
+        # Router dependencies come first, so the last lane is the most specific
+        lanes = [depends for depends in dependencies if isinstance(depends.dependency, AdmissionLane)]
+        for depends in lanes[:-1]:
+            dependencies.remove(depends)
+        super().__init__(path, endpoint, dependencies=dependencies, **kwargs)
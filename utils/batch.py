@@ -0,0 +1,16 @@
+from fastapi import HTTPException, Query
+
+MAX_BATCH_SIZE = 1000
+
+
+def batch_ids(ids: str = Query(..., description=f"Comma-separated ids, at most {MAX_BATCH_SIZE}")):
+    """Dependency parsing `ids=1,2,3` into a list of ints, in request order."""
+    try:
+        parsed = [int(id) for id in ids.split(",") if id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids must name at least one id")
+    if len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per batch")
+    return parsed
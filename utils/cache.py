@@ -0,0 +1,183 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import Response
+
+from config.settings import settings
+from utils import metrics
+from utils.profiling import ProfiledJSONResponse as JSONResponse
+
+
+class MemoryBackend:
+    """Bounded LRU cache with per-entry TTL, local to this worker.
+
+    Also serves as the in-memory stand-in for a shared backend such as Redis.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        # One MGET round trip for the whole batch
+        return [json.loads(value) if value is not None else None for value in self._client.mget(keys)] if keys else []
+
+    def set(self, key, value, ttl):
+        self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+
+MISSING = object()
+
+
+class Cache:
+    """Read-through cache of JSON response bodies with ETags.
+
+    Keys are namespaced ("product", "supplier", ...). Each namespace has a
+    generation counter, so a whole namespace can be dropped with one increment.
+    Invalidating a single id also leaves a mark (a random token, kept for the
+    TTL) that a load started before it sees when it stores its row.
+    """
+
+    def __init__(self, backend, ttl=60.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, namespace):
+        return self.backend.counter(f"gen:{namespace}")
+
+    def _key(self, namespace, id, generation=None):
+        if generation is None:
+            generation = self.generation(namespace)
+        return f"{namespace}:{generation}:{id}"
+
+    def get(self, namespace, id):
+        entry = self.backend.get(self._key(namespace, id))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def get_many(self, namespace, ids):
+        """Cached entries of `ids` as {id: entry}; ids that are not cached are left out."""
+        generation = self.generation(namespace)
+        values = self.backend.get_many([self._key(namespace, id, generation) for id in ids])
+        entries = {id: entry for id, entry in zip(ids, values) if entry is not None}
+        self.hits += len(entries)
+        self.misses += len(ids) - len(entries)
+        return entries
+
+    def _mark_key(self, namespace, id):
+        return f"mark:{namespace}:{id}"
+
+    def marks(self, namespace, ids):
+        """Invalidation marks of `ids` as {id: mark}; read them, like the generation, before loading the rows."""
+        return dict(zip(ids, self.backend.get_many([self._mark_key(namespace, id) for id in ids])))
+
+    def mark(self, namespace, id):
+        return self.backend.get(self._mark_key(namespace, id))
+
+    def set(self, namespace, id, body, generation=None, ttl=None, mark=MISSING):
+        """Store `body`; pass the `generation` (and `mark`) read before computing it so a concurrent invalidation wins."""
+        payload = json.dumps(body, sort_keys=True, separators=(",", ":"))
+        entry = {"etag": '"' + hashlib.sha1(payload.encode()).hexdigest() + '"', "body": body}
+        key = self._key(namespace, id, generation)
+        self.backend.set(key, entry, ttl or self.ttl)
+        # Checked after storing: invalidate() marks before it deletes, so either its delete
+        # comes after this set or its mark is seen here
+        if mark is not MISSING and self.mark(namespace, id) != mark:
+            self.backend.delete(key)
+        return entry
+
+    def invalidate(self, namespace, id):
+        self.backend.set(self._mark_key(namespace, id), uuid.uuid4().hex, self.ttl)
+        self.backend.delete(self._key(namespace, id))
+
+    def invalidate_namespace(self, namespace):
+        self.backend.incr(f"gen:{namespace}")
+
+
+def cached_response(request, entry):
+    """Serve a cache entry, answering 304 when the client already has this version."""
+    headers = {"ETag": entry["etag"]}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(entry["body"], headers=headers)
+
+
+def _build_backend():
+    if settings.cache_backend == "redis":
+        return RedisBackend(settings.cache_url)
+    return MemoryBackend(settings.cache_max_entries)
+
+
+cache = Cache(_build_backend(), ttl=settings.cache_ttl)
+metrics.register("cache", lambda: {"hits": cache.hits, "misses": cache.misses, "backend": settings.cache_backend})
@@ -0,0 +1,336 @@
+"""Change feed: committed changes pushed to subscribers over Server-Sent Events.
+
+Writers `publish()` events after their transaction commits. The broker gives
+each event an ordered id ("<epoch ms>-<sequence>"), keeps the most recent
+`retention` of them so a reconnecting client can resume after its
+`Last-Event-ID`, and hands new events to this worker's `ChangeFeed`, which
+fans them out to its subscribers.
+
+A subscriber is a bounded queue and a render function, indexed by the one
+key it filters on (e.g. ("product", 7)), so an event is only offered to
+the subscribers of its own keys plus the unfiltered ones. An idle
+subscriber costs its queue and a parked coroutine: no thread, task or
+database connection. A subscriber that falls `queue_size` events behind is
+disconnected; its client reconnects and resumes from the retained events.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import defaultdict, deque
+
+from config.settings import settings
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+REDIS_STREAM = "change_feed"
+RETRY_MS = 3000  # Reconnection delay sent to EventSource clients
+
+
+def event_order(event_id):
+    """Sort key of an event id, or None if it is not one."""
+    try:
+        epoch, sequence = event_id.split("-")
+        return int(epoch), int(sequence)
+    except (AttributeError, ValueError):
+        return None
+
+
+class FeedEvent:
+    """One published change: `type`, JSON-able `data` and the filter `keys` it is delivered under."""
+
+    __slots__ = ("id", "type", "data", "keys", "_encoded")
+
+    def __init__(self, id, type, data, keys=()):
+        self.id = id
+        self.type = type
+        self.data = data
+        self.keys = tuple(tuple(key) for key in keys)
+        self._encoded = None
+
+    def encoded(self):
+        # Serialized once, however many subscribers receive the event
+        if self._encoded is None:
+            self._encoded = json.dumps(self.data, separators=(",", ":"))
+        return self._encoded
+
+    def to_json(self):
+        return json.dumps({"type": self.type, "data": self.data, "keys": self.keys})
+
+    @classmethod
+    def from_json(cls, id, payload):
+        event = json.loads(payload)
+        return cls(id, event["type"], event["data"], event["keys"])
+
+
+def sse_message(event_id, name, data):
+    """One Server-Sent Events message; `data` is a JSON string."""
+    lines = [f"event: {name}", f"data: {data}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return "\n".join(lines) + "\n\n"
+
+
+class MemoryBroker:
+    """Ring buffer of the latest events, local to this worker.
+
+    The local stand-in for a shared broker: subscribers only see writes
+    served by their own worker, and ids restart (with a new epoch) when it
+    restarts.
+    """
+
+    def __init__(self, retention=10000):
+        self.epoch = int(time.time() * 1000)
+        self._sequence = itertools.count(1)
+        self._events = deque(maxlen=retention)
+        self._last = 0
+        self.deliver = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, events):
+        batch = []
+        for type, data, keys in events:
+            self._last = next(self._sequence)
+            event = FeedEvent(f"{self.epoch}-{self._last}", type, data, keys)
+            self._events.append(event)
+            batch.append(event)
+        self.deliver(batch)
+
+    async def latest_id(self):
+        return f"{self.epoch}-{self._last}"
+
+    async def since(self, event_id):
+        """Retained events after `event_id`; None if it is unknown or already evicted."""
+        order = event_order(event_id)
+        if order is None or order[0] != self.epoch or order[1] > self._last:
+            return None
+        oldest = self._last - len(self._events) + 1
+        if order[1] < oldest - 1:
+            return None
+        # Sequences are contiguous, so the position in the ring follows from the id
+        return list(itertools.islice(self._events, order[1] - oldest + 1, None))
+
+
+class RedisBroker:
+    """Redis stream shared by every worker: all subscribers see every write and can resume on any worker.
+
+    Each worker reads the stream with one blocking XREAD loop and fans the
+    events out locally, however many subscribers it has.
+    """
+
+    def __init__(self, url, retention=10000):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CHANGE_FEED_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self.retention = retention
+        self._reader = None
+        self.deliver = None
+
+    async def start(self):
+        """Start this worker's stream reader (on the first subscriber)."""
+        if self._reader is None or self._reader.done():
+            last = await self.latest_id()
+            self._reader = asyncio.get_running_loop().create_task(self._read(last))
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        await self._client.aclose()
+
+    async def publish(self, events):
+        async with self._client.pipeline(transaction=False) as pipe:
+            for type, data, keys in events:
+                pipe.xadd(
+                    REDIS_STREAM, {"event": FeedEvent(None, type, data, keys).to_json()},
+                    maxlen=self.retention, approximate=True,
+                )
+            await pipe.execute()
+
+    async def _read(self, last):
+        while True:
+            try:
+                response = await self._client.xread({REDIS_STREAM: last}, block=5000, count=1000)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change feed stream read failed; retrying")
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response:
+                batch = [FeedEvent.from_json(id.decode(), fields[b"event"]) for id, fields in entries]
+                last = batch[-1].id
+                self.deliver(batch)
+
+    async def latest_id(self):
+        newest = await self._client.xrevrange(REDIS_STREAM, count=1)
+        return newest[0][0].decode() if newest else "0-0"
+
+    async def since(self, event_id):
+        """Retained events after `event_id`; None if it is unknown or may have been trimmed."""
+        order = event_order(event_id)
+        if order is None:
+            return None
+        oldest = await self._client.xrange(REDIS_STREAM, count=1)
+        if not oldest or event_order(oldest[0][0].decode()) > order or order > event_order(await self.latest_id()):
+            return None
+        entries = await self._client.xrange(REDIS_STREAM, min=f"({event_id}", count=self.retention)
+        return [FeedEvent.from_json(id.decode(), fields[b"event"]) for id, fields in entries]
+
+
+class Subscriber:
+    """One SSE client: the key it filters on (None for all events) and how it renders an event.
+
+    `render(event)` returns (event name, JSON data) or None to skip the event;
+    the queue holds (event id, rendered) pairs.
+    """
+
+    def __init__(self, key, render, queue_size):
+        self.key = key
+        self.render = render
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+
+class ChangeFeed:
+    def __init__(self, broker, queue_size=1000, max_subscribers=10000, heartbeat=15.0):
+        self.broker = broker
+        broker.deliver = self._deliver
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self._subscribers = defaultdict(set)  # key (None: unfiltered) -> subscribers
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.disconnected = 0  # Subscribers dropped for falling behind
+        self.publish_errors = 0
+
+    async def publish(self, *events):
+        """Publish (type, data, keys) events; the write is already committed, so failures are only logged."""
+        if not events:
+            return
+        try:
+            await self.broker.publish(events)
+            self.published += len(events)
+        except Exception:
+            self.publish_errors += 1
+            logger.exception("Could not publish %d change feed events", len(events))
+
+    def _deliver(self, batch):
+        for event in batch:
+            for subscriber in self._subscribers[None].union(*(self._subscribers.get(key, ()) for key in event.keys)):
+                if subscriber.overflowed:
+                    continue
+                rendered = subscriber.render(event)
+                if rendered is None:
+                    continue
+                try:
+                    subscriber.queue.put_nowait((event.id, rendered))
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    subscriber.overflowed = True
+                    self.disconnected += 1
+
+    def full(self):
+        return self.subscribers >= self.max_subscribers
+
+    async def subscribe(self, key, render):
+        """Register a subscriber; returns None when this worker is at `max_subscribers`."""
+        if self.full():
+            return None
+        await self.broker.start()
+        subscriber = Subscriber(key, render, self.queue_size)
+        self._subscribers[subscriber.key].add(subscriber)
+        self.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self._subscribers.get(subscriber.key)
+        if subscribers is not None and subscriber in subscribers:
+            subscribers.discard(subscriber)
+            if not subscribers and subscriber.key is not None:
+                del self._subscribers[subscriber.key]
+            self.subscribers -= 1
+
+    async def stream(self, key, render, last_event_id=None):
+        """SSE text for a new subscriber: missed events after `last_event_id`, then live ones, with heartbeats.
+
+        If the missed events are no longer retained, a `reset` event (carrying
+        the current id) tells the client to reload its state before applying
+        further events. The subscriber is registered here, once the response
+        starts, and unregistered when the client disconnects, so a response
+        that is never sent cannot leave one behind. If the worker filled up
+        in between, the stream ends and the client retries.
+        """
+        subscriber = await self.subscribe(key, render)
+        if subscriber is None:
+            yield f"retry: {RETRY_MS}\n\n"
+            return
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            last = None
+            if last_event_id:
+                missed = await self.broker.since(last_event_id)
+                if missed is None:
+                    last = await self.broker.latest_id()
+                    yield sse_message(last, "reset", json.dumps({"last_event_id": last_event_id}))
+                else:
+                    for event in missed:
+                        last = event.id
+                        rendered = subscriber.render(event)
+                        if rendered is not None:
+                            yield sse_message(event.id, *rendered)
+            last = event_order(last)
+            while True:
+                if subscriber.overflowed and subscriber.queue.empty():
+                    return
+                try:
+                    event_id, rendered = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                # Events read back during the resume may also have arrived live
+                if last is not None and event_order(event_id) <= last:
+                    continue
+                yield sse_message(event_id, *rendered)
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def close(self):
+        await self.broker.close()
+
+    def snapshot(self):
+        return {
+            "backend": settings.change_feed_backend,
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "delivered": self.delivered,
+            "disconnected": self.disconnected,
+            "publish_errors": self.publish_errors,
+        }
+
+
+def _build_broker():
+    if settings.change_feed_backend == "redis":
+        return RedisBroker(settings.change_feed_url, settings.change_feed_retention)
+    return MemoryBroker(settings.change_feed_retention)
+
+
+change_feed = ChangeFeed(
+    _build_broker(),
+    queue_size=settings.change_feed_queue_size,
+    max_subscribers=settings.change_feed_max_subscribers,
+    heartbeat=settings.change_feed_heartbeat,
+)
+metrics.register("change_feed", change_feed.snapshot)
@@ -0,0 +1,71 @@
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from pydantic import ConfigDict, TypeAdapter, create_model
+
+from utils.profiling import serializing
+
+
+def parse_fields(fields, schema):
+    """Turn a `fields=a,b` query value into a tuple of `schema` field names (None means all)."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - schema.model_fields.keys())
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if not requested:
+        raise HTTPException(status_code=400, detail="fields must name at least one field")
+    # Schema order, so every spelling of the same set shares one cached model
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+def field_selection(schema):
+    """Dependency parsing the `fields` query parameter of routes serializing through `schema`."""
+    def dependency(
+        fields: Optional[str] = Query(None, description=f"Comma-separated {schema.__name__} fields to return"),
+    ):
+        return parse_fields(fields, schema)
+    return dependency
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema, fields):
+    """`schema` narrowed to `fields`, built once per field set."""
+    if fields is None:
+        return schema
+    definitions = {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in fields}
+    return create_model(
+        f"{schema.__name__}_{'_'.join(fields)}",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=256)
+def _list_adapter(schema, fields):
+    return TypeAdapter(list[sparse_schema(schema, fields)])
+
+
+def dump_sparse(schema, fields, rows):
+    """JSON-ready dicts of ORM `rows` holding only `fields` of `schema`."""
+    adapter = _list_adapter(schema, fields)
+    with serializing():
+        return adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+
+
+def project(body, fields):
+    """Keep only `fields` of an already serialized body (None keeps everything)."""
+    if fields is None:
+        return body
+    return {name: body[name] for name in fields if name in body}
+
+
+def project_entry(entry, fields):
+    """A cache entry narrowed to `fields`, with an ETag of its own."""
+    if fields is None:
+        return entry
+    etag = '"' + hashlib.sha1(f"{entry['etag']}:{','.join(fields)}".encode()).hexdigest() + '"'
+    return {"etag": etag, "body": project(entry["body"], fields)}
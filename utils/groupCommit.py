@@ -0,0 +1,99 @@
+"""Group commit: writes submitted concurrently are committed together.
+
+Callers `submit()` one item each and wait. A background task collects
+items for up to `interval` seconds (or until `max_items` are queued) and
+hands the whole group to `commit`, which writes it in one transaction and
+returns one result per item, in order: the caller's value, or an exception
+raised to that caller only. One group is committed at a time per worker;
+items arriving meanwhile form the next group, which is committed as soon as
+the previous one is done.
+"""
+import asyncio
+import contextvars
+
+
+class GroupCommit:
+    def __init__(self, commit, interval, max_items):
+        self.commit = commit  # async fn(items) -> [result or exception per item]
+        self.interval = interval
+        self.max_items = max_items
+        self._loop = None
+        self._pending = []
+        self._task = None
+        self._full = None
+        self.groups = 0
+        self.items = 0
+
+    async def submit(self, item):
+        """Queue `item` for the next group commit and return its result (or raise its error)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures and tasks belong to one event loop (e.g. a fresh asyncio.run in a script)
+            self._loop, self._pending, self._task, self._full = loop, [], None, asyncio.Event()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_items:
+            self._full.set()
+        if self._task is None:
+            # A fresh context: the group's queries are not charged to the request that started it
+            self._task = contextvars.Context().run(loop.create_task, self._run())
+        # A cancelled caller does not cancel the group: its item is still committed
+        return await asyncio.shield(future)
+
+    async def drain(self):
+        """Wait until everything queued so far is committed (call on shutdown)."""
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._full.set()
+            await self._task
+
+    async def _run(self):
+        idle = True
+        try:
+            while self._pending:
+                if idle and len(self._pending) < self.max_items:
+                    # Give concurrent callers up to `interval` to join, unless the group fills up first.
+                    # Later groups have already waited: they filled up while the previous one committed.
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.interval)
+                    except asyncio.TimeoutError:
+                        pass
+                idle = False
+                self._full.clear()
+                group = self._pending[:self.max_items]
+                del self._pending[:self.max_items]
+                await self._commit_group(group)
+        finally:
+            # Also when cancelled, or the next submit() would wait for a task that is gone.
+            # A task of an earlier event loop must not clear the current loop's.
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def _commit_group(self, group):
+        try:
+            results = await self.commit([item for item, _ in group])
+        except Exception as e:
+            results = [e] * len(group)
+        except BaseException:
+            # Cancelled mid-commit: the group's callers get the cancellation rather than wait forever
+            for _, future in group:
+                future.cancel()
+            raise
+        self.groups += 1
+        self.items += len(group)
+        for (_, future), result in zip(group, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self):
+        return {
+            "interval_ms": self.interval * 1000,
+            "max_items": self.max_items,
+            "queued": len(self._pending),
+            "groups": self.groups,
+            "items": self.items,
+            "mean_group_size": round(self.items / self.groups, 2) if self.groups else None,
+        }
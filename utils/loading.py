@@ -0,0 +1,69 @@
+from functools import lru_cache
+from typing import get_args
+
+from pydantic import BaseModel
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from utils.fields import sparse_schema
+
+
+def _nested_schema(annotation):
+    """Return the Pydantic model inside Optional[...] / list[...] annotations, if any."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        nested = _nested_schema(arg)
+        if nested is not None:
+            return nested
+    return None
+
+
+def _loader_options(model, schema, parent=None):
+    relationships = inspect(model).relationships
+    options = []
+    for name, field in schema.model_fields.items():
+        if name not in relationships:
+            continue
+        nested = _nested_schema(field.annotation)
+        if nested is None:
+            continue
+
+        relationship = relationships[name]
+        attribute = getattr(model, name)
+        # Collections are loaded with one extra IN query, many-to-one with a JOIN
+        if relationship.uselist:
+            loader = parent.selectinload(attribute) if parent is not None else selectinload(attribute)
+        else:
+            loader = parent.joinedload(attribute) if parent is not None else joinedload(attribute)
+
+        options.append(loader)
+        options.extend(_loader_options(relationship.mapper.class_, nested, loader))
+    return options
+
+
+@lru_cache(maxsize=None)
+def eager_options(model, schema):
+    """Build the loader options needed to serialize `model` rows through `schema`.
+
+    Every relationship the response schema nests is eagerly loaded, so
+    serializing a page costs a fixed number of queries instead of one lazy
+    load per row and relationship.
+    """
+    return tuple(_loader_options(model, schema))
+
+
+def select_for_response(model, schema, fields=None, include=()):
+    """SELECT `model` with everything `schema` serializes already loaded.
+
+    With `fields`, only those columns (plus the `include` columns, e.g. the
+    pagination keys) are selected and relationships outside `fields` are not
+    loaded at all.
+    """
+    stmt = select(model).options(*eager_options(model, sparse_schema(schema, fields)))
+    if fields is None:
+        return stmt
+    mapper = inspect(model)
+    columns = [getattr(model, name) for name in fields if name in mapper.column_attrs]
+    primary_key = [getattr(model, column.key) for column in mapper.primary_key]
+    return stmt.options(load_only(*columns, *primary_key, *include))
@@ -0,0 +1,44 @@
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds (upper bounds)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_collectors = {}
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+
+def register(name, collector):
+    """Expose `collector()` (returning a JSON-able dict) under `name` on the metrics endpoint."""
+    _collectors[name] = collector
+
+
+def collect():
+    return {name: collector() for name, collector in _collectors.items()}
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row into an opaque cursor."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into sort-key values typed like `columns`."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError
+        values = []
+        for column, value in zip(columns, payload):
+            if value is None and column.nullable:
+                pass  # Undated row
+            elif column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = column.type.python_type(value)
+            values.append(value)
+        return values
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(columns, values):
+    """Rows past `values` in `ORDER BY columns`, NULLs first."""
+    if None not in values:
+        # A row value comparison also leaves out NULL keys, which all sort before the cursor
+        if len(columns) == 1:
+            return columns[0] > values[0]
+        return tuple_(*columns) > tuple_(*values)
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column.is_not(None)
+    if value is None:
+        return or_(column.is_not(None), and_(column.is_(None), _after(columns[1:], values[1:])))
+    return or_(column > value, and_(column == value, _after(columns[1:], values[1:])))
+
+
+def _order(column):
+    # Explicit, so every backend agrees with _after (PostgreSQL sorts NULLs last by default)
+    return column.asc().nulls_first() if column.nullable else column
+
+
+async def paginate(db, stmt, columns, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one keyset page of `stmt` ordered by `columns`, plus the next cursor.
+
+    Rows are fetched with `WHERE (keys) > (cursor) ORDER BY keys LIMIT n + 1`,
+    so every page is an index range scan no matter how deep it is. Nullable
+    keys (undated legacy stock entries) sort first and are encoded as null.
+    """
+    if cursor is not None:
+        stmt = stmt.where(_after(columns, decode_cursor(cursor, columns)))
+
+    rows = (await db.scalars(stmt.order_by(*map(_order, columns)).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
@@ -0,0 +1,280 @@
+"""Per-request profiling: SQL counters, Server-Timing headers and per-route histograms.
+
+- `instrument_queries(engine)` hooks the engine's cursor events and charges
+  every statement to the request that issued it.
+- `ProfiledRoute` (the routers' route class) splits a request into
+  dependency, endpoint and serialization time. Handlers that serialize
+  themselves charge it with `serializing()` (dump_sparse and
+  ProfiledJSONResponse do), and whatever FastAPI serializes after the
+  endpoint returns is added to it.
+- `ProfilingMiddleware` emits the numbers as a Server-Timing header, folds
+  them into per-route histograms (served under "routes" on
+  /internal/metrics/) and, when sampling is enabled, dumps a cProfile of
+  sampled requests slower than the threshold.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from config.settings import settings
+from utils import metrics
+from utils.metrics import Histogram
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+MAX_STATEMENT_LENGTH = 500
+
+_current = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Timings of one request. Mutated in place, so threadpool hops (which copy the context) share it."""
+
+    def __init__(self):
+        self.route = None  # Path template, set once a route matched
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.endpoint_seconds = None
+        self.endpoint_finished = None
+        self.serialize_seconds = None  # None until something was serialized
+        self._lock = threading.Lock()
+
+    def add_query(self, statement, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            if seconds > self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_statement = statement
+
+    def add_serialize(self, seconds):
+        with self._lock:
+            self.serialize_seconds = (self.serialize_seconds or 0.0) + seconds
+
+
+# -- SQL hooks --
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = conn.info.get("query_started")
+    if profile is not None and started:
+        profile.add_query(statement, time.perf_counter() - started.pop())
+
+
+def instrument_queries(engine):
+    """Charge every statement run on `engine` (a sync Engine) to the current request's profile."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -- Route timings --
+
+def _timed_endpoint(endpoint):
+    # Keeps the endpoint's signature (FastAPI follows __wrapped__) and its sync/async kind
+    if iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _record_endpoint(started)
+    else:
+        @wraps(endpoint)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _record_endpoint(started)
+    return timed
+
+
+def _record_endpoint(started):
+    profile = _current.get()
+    if profile is not None:
+        profile.endpoint_finished = time.perf_counter()
+        profile.endpoint_seconds = profile.endpoint_finished - started
+
+
+@contextmanager
+def serializing():
+    """Charge the time spent in the block to the current request's serialization time."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_serialize(time.perf_counter() - started)
+
+
+class ProfiledJSONResponse(JSONResponse):
+    """JSONResponse whose encoding (done when a handler builds it) counts as serialization time."""
+
+    def render(self, content):
+        with serializing():
+            return super().render(content)
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that records the route template, endpoint time and response serialization time."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request):
+            profile = _current.get()
+            if profile is None:
+                return await handler(request)
+            profile.route = self.path_format
+            response = await handler(request)
+            # Response model validation, encoding and rendering of a returned object happen after the endpoint
+            if profile.endpoint_finished is not None:
+                profile.add_serialize(time.perf_counter() - profile.endpoint_finished)
+            return response
+
+        return profiled_handler
+
+
+# -- Aggregation --
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.db_seconds = Histogram()
+        self.serialize_seconds = Histogram()
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self._lock = threading.Lock()
+
+    def observe(self, profile, seconds):
+        self.latency.observe(seconds)
+        self.db_seconds.observe(profile.db_seconds)
+        self.queries.observe(profile.queries)
+        if profile.serialize_seconds is not None:
+            self.serialize_seconds.observe(profile.serialize_seconds)
+        with self._lock:
+            if profile.slowest_seconds > self.slowest_seconds:
+                self.slowest_seconds = profile.slowest_seconds
+                self.slowest_statement = profile.slowest_statement[:MAX_STATEMENT_LENGTH]
+
+    def snapshot(self):
+        return {
+            "latency": self.latency.snapshot(),
+            "db_seconds": self.db_seconds.snapshot(),
+            "serialize_seconds": self.serialize_seconds.snapshot(),
+            "queries": self.queries.snapshot(),
+            "slowest_statement": {"seconds": self.slowest_seconds, "statement": self.slowest_statement},
+        }
+
+
+_routes = {}
+_routes_lock = threading.Lock()
+_profiler_lock = threading.Lock()
+_profiler_counts = {"sampled": 0, "dumped": 0}
+
+
+def _route_stats(key):
+    stats = _routes.get(key)
+    if stats is None:
+        with _routes_lock:
+            stats = _routes.setdefault(key, RouteStats())
+    return stats
+
+
+def _server_timing(profile, app_seconds):
+    parts = [f'db;dur={profile.db_seconds * 1000:.2f};desc="{profile.queries} queries"']
+    if profile.queries:
+        parts.append(f"db-slowest;dur={profile.slowest_seconds * 1000:.2f}")
+    if profile.endpoint_seconds is not None:
+        parts.append(f"endpoint;dur={profile.endpoint_seconds * 1000:.2f}")
+    if profile.serialize_seconds is not None:
+        parts.append(f"serialize;dur={profile.serialize_seconds * 1000:.2f}")
+    parts.append(f"app;dur={app_seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def _dump_profile(profiler, method, route, seconds):
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    name = (route or "unmatched").strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(settings.profile_dir, f"{time.strftime('%Y%m%dT%H%M%S')}_{method}_{name}_{seconds * 1000:.0f}ms.prof")
+    profiler.dump_stats(path)
+    _profiler_counts["dumped"] += 1
+
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting a RequestProfile for every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+
+        profiler = None
+        # cProfile hooks the whole thread, so only one sampled request is profiled at a time
+        if settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate:
+            if _profiler_lock.acquire(blocking=False):
+                profiler = cProfile.Profile()
+                _profiler_counts["sampled"] += 1
+                profiler.enable()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.server_timing:
+                header = _server_timing(profile, time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - started
+            _current.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _profiler_lock.release()
+                if seconds >= settings.profile_threshold:
+                    _dump_profile(profiler, scope["method"], profile.route, seconds)
+            _route_stats(f"{scope['method']} {profile.route or '<unmatched>'}").observe(profile, seconds)
+
+
+def _routes_snapshot():
+    with _routes_lock:
+        routes = dict(_routes)
+    return {key: stats.snapshot() for key, stats in sorted(routes.items())}
+
+
+metrics.register("routes", _routes_snapshot)
+metrics.register("profiling", lambda: {
+    "sample_rate": settings.profile_sample_rate,
+    "threshold_seconds": settings.profile_threshold,
+    **_profiler_counts,
+})
@@ -0,0 +1,53 @@
+"""Single-statement writes: INSERT, UPDATE and DELETE ... RETURNING the written row.
+
+Every UPDATE bumps the row's version. An update or delete given the version
+the client last read only matches that version, so a concurrent write is
+reported as a 409 instead of being silently overwritten.
+"""
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, update
+
+
+def insert_returning(model, values):
+    """INSERT one row of `model`, returning all of its columns."""
+    table = model.__table__
+    return insert(table).values(**values).returning(*table.columns)
+
+
+def update_returning(model, id, values, version=None):
+    """UPDATE only the columns in `values` of row `id` (at `version`, if given), returning the new row."""
+    table = model.__table__
+    stmt = update(table).where(table.c.id == id)
+    if version is not None:
+        stmt = stmt.where(table.c.version == version)
+    return stmt.values(**values, version=table.c.version + 1).returning(*table.columns)
+
+
+def delete_returning(model, id, version=None, referenced_by=()):
+    """DELETE row `id` (at `version`, if given), returning the deleted row.
+
+    The row is kept while any foreign key column in `referenced_by` still
+    points at it, whether or not the database enforces the constraint.
+    """
+    table = model.__table__
+    stmt = delete(table).where(table.c.id == id)
+    if version is not None:
+        stmt = stmt.where(table.c.version == version)
+    for column in referenced_by:
+        stmt = stmt.where(~select(column).where(column == id).exists())
+    return stmt.returning(*table.columns)
+
+
+async def rejected_write(db, model, id, version, not_found, referenced=None):
+    """HTTPException for an UPDATE or DELETE ... RETURNING that matched no row.
+
+    Only the failure path looks the row up again: it is missing (404), at
+    another version than the client read (409), or still referenced (500
+    with the `referenced` message).
+    """
+    current = await db.scalar(select(model.version).where(model.id == id))
+    if current is None:
+        return HTTPException(status_code=404, detail=not_found)
+    if referenced is not None and (version is None or current == version):
+        return HTTPException(status_code=500, detail=referenced)
+    return HTTPException(status_code=409, detail=f"Version conflict: current version is {current}")